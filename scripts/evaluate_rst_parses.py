@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""
+Evaluate predicted RST annotations against gold annotations
+
+Every node of an annotation is a constituent spanning the EDUs from its first
+to its last one, which is optionally labeled with its nuclearity, its
+relation, or both (see `rst.parseval').  Predicted annotations should use the
+segmentation of the gold annotations.  Precision, recall, and F1 of all four
+metrics are printed for the whole corpus (micro-averaged and, optionally,
+macro-averaged over files) and, optionally, for every single file.
+
+USAGE:
+script_name [OPTIONS] src_dir gold_dir pred_dir
+"""
+
+##################################################################
+# Libraries
+from rst import RSTCache, RSTCorpus, RSTParseval, FIELD_SEP, METRICS, \
+    TREE_ALL, TREE_EXTERNAL, TREE_INTERNAL, XML_FMT
+
+import argparse
+import glob
+import os
+import sys
+
+##################################################################
+# Variables and Constants
+INTERNAL = "internal"
+EXTERNAL = "external"
+ALL = "all"
+NODE_TYPES = {INTERNAL: TREE_INTERNAL, EXTERNAL: TREE_EXTERNAL,
+              ALL: TREE_ALL}
+
+
+##################################################################
+# Methods
+def output_scores(a_name, a_scores):
+    """
+    Print scores of all metrics.
+
+    @param a_name - name of the scored file or average
+    @param a_scores - dictionary mapping metrics to 3-tuples with precision,
+                      recall, and F1
+
+    @return \c void
+    """
+    for imetric in METRICS:
+        print FIELD_SEP.join([a_name, imetric] + \
+                                 ["{:.4f}".format(iscore) \
+                                      for iscore in a_scores[imetric]])
+
+
+def main(argv):
+    """
+    Main method for evaluating predicted RST annotations.
+
+    @param argv - command line parameters
+
+    @return \c 0 on SUCCESS non \c 0 otherwise
+    """
+    # define command line arguments
+    argparser = argparse.ArgumentParser(description = """Evaluate predicted
+RST annotations against gold annotations""")
+    # optional arguments
+    argparser.add_argument("--anno-sfx", help = """suffix of annotation files""", \
+                               type = str, default = ".rst.xml")
+    argparser.add_argument("--cache-dir", help = """directory for caching parsed
+files between runs""", type = str)
+    argparser.add_argument("-m", "--macro", help = """additionally output scores
+macro-averaged over files""", action = "store_true")
+    argparser.add_argument("-n", "--nodes", help = """nodes which should be
+evaluated""", choices = sorted(NODE_TYPES), default = ALL)
+    argparser.add_argument("--no-terminals", help = """do not evaluate terminal
+nodes""", action = "store_true")
+    argparser.add_argument("-v", "--verbose", help = """output scores of every
+file""", action = "store_true")
+    # mandatory arguments
+    argparser.add_argument("src_dir", help = "directory with source files of corpus")
+    argparser.add_argument("gold_dir", help = "directory with gold annotation files")
+    argparser.add_argument("pred_dir", help = "directory with predicted annotation files")
+    args = argparser.parse_args(argv)
+
+    cache = None
+    if args.cache_dir:
+        cache = RSTCache(args.cache_dir)
+    corpus = RSTCorpus(XML_FMT, cache)
+    parseval = RSTParseval(NODE_TYPES[args.nodes], not args.no_terminals)
+
+    # iterate over each source file in `source` directory and find
+    # corresponding gold and predicted annotation files
+    src_fname_base = gold_fname = pred_fname = ""
+    scores = None
+    for src_fname in sorted(glob.iglob(os.path.join(args.src_dir, "*.xml"))):
+        if not os.path.isfile(src_fname) or not os.access(src_fname, os.R_OK):
+            continue
+        src_fname_base = os.path.splitext(os.path.basename(src_fname))[0]
+        gold_fname = os.path.join(args.gold_dir, src_fname_base + args.anno_sfx)
+        pred_fname = os.path.join(args.pred_dir, src_fname_base + args.anno_sfx)
+        if not os.path.isfile(gold_fname) or not os.access(gold_fname, os.R_OK):
+            continue
+        if not os.path.isfile(pred_fname) or not os.access(pred_fname, os.R_OK):
+            print >> sys.stderr, "WARNING: No prediction for file '{:s}'".format(
+                gold_fname)
+            continue
+        print >> sys.stderr, "Processing file: '{:s}'".format(src_fname)
+        scores = parseval.update(corpus.get_forrest(src_fname, gold_fname), \
+                                     corpus.get_forrest(src_fname, pred_fname))
+        if args.verbose:
+            output_scores(pred_fname, scores)
+    output_scores("micro", parseval.get_scores())
+    if args.macro:
+        output_scores("macro", parseval.get_scores(True))
+    return 0
+
+##################################################################
+# Main
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+"""
+Export all nodes and relations of the corpus as typed columns
+
+Every node of every annotation file becomes one row of the table `nodes',
+whose columns are integers (or booleans) which can be read directly by
+analysis or training code without parsing trees or texts again.  Relations
+are stored along with their satellites (or multinuclear nuclei): the column
+`relcode' holds the code of the relation connecting a node to the node in
+column `parent'.  Rows are written in chunks of bounded size, either as
+NumPy `.npz' archives (one per chunk) or appended to a single CSV file.
+
+The output directory contains:
+
+  nodes.csv or nodes.NNNNN.npz - the columns of COLUMNS
+  node_ids.txt - original id of the node of every row (one per line)
+  files.txt - names of annotation files (indexed by column `filecode')
+  messages.txt - message ids (indexed by column `msgcode')
+  relations.txt - relation names (indexed by column `relcode')
+
+Missing parents, messages, and relations are encoded as -1.
+
+USAGE:
+script_name [OPTIONS] src_dir anno_dir out_dir
+"""
+
+##################################################################
+# Libraries
+from rst import RSTCache, RSTCorpus, RSTForrestArrays, RELATIONS, ENCODING, \
+    XML_FMT
+from rst.forrestarrays import NO_CODE
+
+from collections import OrderedDict
+import argparse
+import csv
+import glob
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+##################################################################
+# Variables and Constants
+CSV = "csv"
+NPZ = "npz"
+FORMATS = (NPZ, CSV)
+DFLT_CHUNK_SIZE = 100000
+COLUMNS = ("node", "filecode", "msgcode", "discid", "parent", "depth", "relcode", \
+               "nucleus", "terminal", "external", "start_discid", "start", \
+               "end_discid", "end", "t_start_discid", "t_start", \
+               "t_end_discid", "t_end")
+NODES = "nodes"
+NODE_IDS_FNAME = "node_ids.txt"
+FILES_FNAME = "files.txt"
+MESSAGES_FNAME = "messages.txt"
+RELATIONS_FNAME = "relations.txt"
+
+
+##################################################################
+# Class
+class ChunkWriter(object):
+    """
+    Writer of columns in chunks of bounded size.
+
+    Rows are buffered until at least `chunk_size` of them are available and
+    are then written as one chunk, so that at most one chunk and the rows of
+    a single forrest are kept in memory.
+
+    Methods:
+    add - add rows to the output
+    close - write remaining rows and close output files
+
+    """
+
+    def __init__(self, a_out_dir, a_fmt = NPZ, a_chunk_size = DFLT_CHUNK_SIZE, \
+                     a_compress = False):
+        """
+        Class constructor.
+
+        @param a_out_dir - output directory
+        @param a_fmt - output format (NPZ or CSV)
+        @param a_chunk_size - number of rows in a chunk
+        @param a_compress - compress NPZ archives
+        """
+        self._out_dir = a_out_dir
+        self._fmt = a_fmt
+        self._chunk_size = a_chunk_size
+        self._compress = a_compress
+        self._buffer = []
+        self._n_buffered = 0
+        self._n_chunks = 0
+        self._ids_file = open(os.path.join(a_out_dir, NODE_IDS_FNAME), "w")
+        self._csv_file = self._csv = None
+        if self._fmt == CSV:
+            self._csv_file = open(os.path.join(a_out_dir, NODES + '.' + CSV), "wb")
+            self._csv = csv.writer(self._csv_file)
+            self._csv.writerow(COLUMNS)
+
+    def add(self, a_columns, a_ids):
+        """
+        Add rows to the output.
+
+        @param a_columns - dictionary mapping column names to arrays of
+                           equal length
+        @param a_ids - original ids of the nodes of the rows
+
+        @return \c void
+        """
+        for iid in a_ids:
+            self._ids_file.write(iid.encode(ENCODING) \
+                                     if isinstance(iid, unicode) else iid)
+            self._ids_file.write("\n")
+        self._buffer.append(a_columns)
+        self._n_buffered += len(a_ids)
+        while self._n_buffered >= self._chunk_size:
+            self._write_chunk(self._chunk_size)
+
+    def close(self):
+        """
+        Write remaining rows and close output files.
+
+        @return \c void
+        """
+        if self._n_buffered:
+            self._write_chunk(self._n_buffered)
+        self._ids_file.close()
+        if self._csv_file is not None:
+            self._csv_file.close()
+
+    def _write_chunk(self, a_n_rows):
+        """
+        Write first rows of the buffer as a single chunk.
+
+        @param a_n_rows - number of rows to be written
+
+        @return \c void
+        """
+        columns = dict((icol, np.concatenate([ibuf[icol] for ibuf in self._buffer])) \
+                           for icol in COLUMNS)
+        chunk = dict((icol, icolumn[:a_n_rows]) for icol, icolumn in columns.iteritems())
+        self._n_buffered -= a_n_rows
+        self._buffer = [dict((icol, icolumn[a_n_rows:]) \
+                                 for icol, icolumn in columns.iteritems())] \
+                                 if self._n_buffered else []
+        if self._fmt == CSV:
+            self._csv.writerows(zip(*[chunk[icol].astype(np.int64).tolist() \
+                                          for icol in COLUMNS]))
+        else:
+            fname = os.path.join(self._out_dir, "{:s}.{:05d}.{:s}".format( \
+                    NODES, self._n_chunks, NPZ))
+            if self._compress:
+                np.savez_compressed(fname, **chunk)
+            else:
+                np.savez(fname, **chunk)
+        self._n_chunks += 1
+
+
+##################################################################
+# Methods
+def _get_codes(a_keys, a_key2code):
+    """
+    Return export-wide codes of keys, assigning new codes to unknown keys.
+
+    @param a_keys - list of keys
+    @param a_key2code - dictionary mapping known keys to their codes
+
+    @return array of integer codes
+    """
+    for ikey in a_keys:
+        if ikey not in a_key2code:
+            a_key2code[ikey] = len(a_key2code)
+    return np.array([a_key2code[ikey] for ikey in a_keys], dtype = np.int32)
+
+
+def get_columns(a_forrest, a_file_code, a_node_base, a_msgid2code):
+    """
+    Return columns describing all nodes of a forrest.
+
+    @param a_forrest - RST forrest
+    @param a_file_code - code of the annotation file of the forrest
+    @param a_node_base - number of rows exported before this forrest
+    @param a_msgid2code - dictionary mapping message ids to export-wide codes
+                          (updated with new messages)
+
+    @return 2-tuple of dictionary mapping column names to arrays, and list
+            of original node ids
+    """
+    arrays = RSTForrestArrays(a_forrest)
+    n = len(arrays)
+    # forrest-local codes of messages and rows are mapped to export-wide ones
+    # (missing messages index the appended last element)
+    msgcodes = np.append(_get_codes(arrays.msgids, a_msgid2code), NO_CODE)
+    ret = OrderedDict()
+    ret["node"] = np.arange(a_node_base, a_node_base + n, dtype = np.int64)
+    ret["filecode"] = np.full(n, a_file_code, dtype = np.int32)
+    ret["msgcode"] = msgcodes[arrays.msgcode]
+    ret["discid"] = arrays.discid
+    ret["parent"] = np.where(arrays.parent == NO_CODE, NO_CODE, \
+                                 arrays.parent.astype(np.int64) + a_node_base)
+    ret["depth"] = arrays.get_depths()
+    ret["relcode"] = arrays.relcode
+    for icol in COLUMNS[COLUMNS.index("nucleus"):]:
+        ret[icol] = getattr(arrays, icol)
+    return (ret, [itree.id for itree in arrays.nodes])
+
+
+def _write_vocab(a_fname, a_keys):
+    """
+    Write keys one per line.
+
+    @param a_fname - name of the output file
+    @param a_keys - iterable of strings (line number is the code of the key)
+
+    @return \c void
+    """
+    with open(a_fname, "w") as ofile:
+        for ikey in a_keys:
+            ofile.write(ikey.encode(ENCODING) if isinstance(ikey, unicode) else ikey)
+            ofile.write("\n")
+
+
+def main(argv):
+    """
+    Main method for exporting nodes of RST corpus.
+
+    @param argv - command line parameters
+
+    @return \c 0 on SUCCESS non \c 0 otherwise
+    """
+    # define command line arguments
+    argparser = argparse.ArgumentParser(description = """Export nodes and relations
+of RST corpus as typed columns""")
+    # optional arguments
+    argparser.add_argument("--anno-sfx", help = """suffix of annotation files""", \
+                               type = str, default = ".rst.xml")
+    argparser.add_argument("--cache-dir", help = """directory for caching parsed
+files between runs""", type = str)
+    argparser.add_argument("--chunk-size", help = """number of rows written at once""", \
+                               type = int, default = DFLT_CHUNK_SIZE)
+    argparser.add_argument("--compress", help = """compress NPZ archives""", \
+                               action = "store_true")
+    argparser.add_argument("-f", "--format", help = """output format""", \
+                               choices = FORMATS, default = NPZ)
+    # mandatory arguments
+    argparser.add_argument("src_dir", help = "directory with source files of corpus")
+    argparser.add_argument("anno_dir", help = "directory with annotation files of corpus")
+    argparser.add_argument("out_dir", help = "directory for output files")
+    args = argparser.parse_args(argv)
+    if np is None:
+        argparser.error("export requires NumPy")
+    if args.chunk_size <= 0:
+        argparser.error("chunk size should be positive")
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+
+    cache = None
+    if args.cache_dir:
+        cache = RSTCache(args.cache_dir)
+    corpus = RSTCorpus(XML_FMT, cache)
+    writer = ChunkWriter(args.out_dir, args.format, args.chunk_size, args.compress)
+
+    # iterate over each source file in `source` directory and find
+    # corresponding annotation files
+    src_fname_base = anno_fname = ""
+    anno_fnames = []
+    msgid2code = {}
+    n_nodes = 0
+    columns = ids = None
+    for src_fname in sorted(glob.iglob(os.path.join(args.src_dir, "*.xml"))):
+        if not os.path.isfile(src_fname) or not os.access(src_fname, os.R_OK):
+            continue
+        src_fname_base = os.path.splitext(os.path.basename(src_fname))[0]
+        anno_fname = os.path.join(args.anno_dir, src_fname_base + args.anno_sfx)
+        if not os.path.isfile(anno_fname) or not os.access(anno_fname, os.R_OK):
+            continue
+        print >> sys.stderr, "Processing file: '{:s}'".format(src_fname)
+        columns, ids = get_columns(corpus.get_forrest(src_fname, anno_fname), \
+                                       len(anno_fnames), n_nodes, msgid2code)
+        anno_fnames.append(anno_fname)
+        n_nodes += len(ids)
+        writer.add(columns, ids)
+    writer.close()
+
+    # vocabularies are only complete after all files have been read
+    _write_vocab(os.path.join(args.out_dir, FILES_FNAME), anno_fnames)
+    _write_vocab(os.path.join(args.out_dir, MESSAGES_FNAME), \
+                     sorted(msgid2code, key = msgid2code.get))
+    _write_vocab(os.path.join(args.out_dir, RELATIONS_FNAME), \
+                     (RELATIONS.get_name(i) for i in xrange(len(RELATIONS))))
+    return 0
+
+##################################################################
+# Main
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+"""
+Find RST trees matching a structural query in the corpus
+
+Queries are written in the tgrep-like language of `rst.query', e.g.:
+
+  Contrast[nucleus][messages>=2]
+  r-InfoAnswer[!nucleus] < List[nucleus]
+  Evidence >> Elaboration
+
+USAGE:
+script_name [OPTIONS] src_dir anno_dir query
+"""
+
+##################################################################
+# Libraries
+from rst import RSTBadFormat, RSTCache, RSTCorpus, RSTNodeIndex, RSTQuery, \
+    ENCODING, FIELD_SEP, XML_FMT
+
+import argparse
+import glob
+import os
+import re
+import sys
+
+##################################################################
+# Variables and Constants
+# line breaks and indentation of minimal tree representations
+INDENT_RE = re.compile(r"\n\s*")
+
+
+##################################################################
+# Methods
+def find_trees(query, src_fname, anno_fname, corpus=None):
+    """
+    Find RST trees of an annotation file matching query.
+
+    @param query - compiled query (RSTQuery)
+    @param src_fname - name of source file with original text
+    @param anno_fname - name of the annotation file
+    @param corpus - loader of source and annotation files (RSTCorpus)
+
+    @return list of matching RST trees
+    """
+    print >> sys.stderr, "Processing file: '{:s}'".format(src_fname)
+    if corpus is None:
+        corpus = RSTCorpus()
+    return query.match(RSTNodeIndex(corpus.get_forrest(src_fname, anno_fname)))
+
+
+def main(argv):
+    """
+    Main method for finding RST trees matching query.
+
+    @param argv - command line parameters
+
+    @return \c 0 on SUCCESS non \c 0 otherwise
+    """
+    # define command line arguments
+    argparser = argparse.ArgumentParser(description = """Find RST trees
+matching a structural query in RST corpus""")
+    # optional arguments
+    argparser.add_argument("--anno-sfx", help = """suffix of annotation files""", \
+                               type = str, default = ".rst.xml")
+    argparser.add_argument("--cache-dir", help = """directory for caching parsed
+files between runs""", type = str)
+    argparser.add_argument("-c", "--count", help = """only output number of matching
+trees in every file""", action = "store_true")
+    # mandatory arguments
+    argparser.add_argument("src_dir", help = "directory with source files of corpus")
+    argparser.add_argument("anno_dir", help = "directory with annotation files of corpus")
+    argparser.add_argument("query", help = "query to be searched for")
+    args = argparser.parse_args(argv)
+
+    try:
+        query = RSTQuery(args.query)
+    except RSTBadFormat as exc:
+        argparser.error(str(exc))
+
+    cache = None
+    if args.cache_dir:
+        cache = RSTCache(args.cache_dir)
+    corpus = RSTCorpus(XML_FMT, cache)
+
+    # iterate over each source file in `source` directory and find
+    # corresponding annotation files
+    src_fname_base = anno_fname = ""
+    trees = []
+    for src_fname in sorted(glob.iglob(os.path.join(args.src_dir, "*.xml"))):
+        if not os.path.isfile(src_fname) or not os.access(src_fname, os.R_OK):
+            continue
+        src_fname_base = os.path.splitext(os.path.basename(src_fname))[0]
+        anno_fname = os.path.join(args.anno_dir, src_fname_base + args.anno_sfx)
+        if not os.path.isfile(anno_fname) or not os.access(anno_fname, os.R_OK):
+            continue
+
+        trees = find_trees(query, src_fname, anno_fname, corpus)
+        if args.count:
+            print FIELD_SEP.join((anno_fname, str(len(trees))))
+            continue
+        for itree in trees:
+            print FIELD_SEP.join((anno_fname, itree.msgid or "", itree.id, \
+                                      itree.relname or "", \
+                                      INDENT_RE.sub(u' ', itree.unicode_min()).encode(ENCODING)))
+    return 0
+
+##################################################################
+# Main
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
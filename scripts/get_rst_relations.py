@@ -1,15 +1,20 @@
 #!/usr/bin/env python
 
 """
-Extract RST relations with a given relation name from the corpus
+Extract RST relations with given relation names from the corpus
+
+All relations of an annotation file are indexed in a single pass, so that
+any number of relation names (or shell-style patterns such as `r-*') can be
+extracted at once.  If a cache directory is given, the indices of single
+files are persisted, and subsequent runs do not parse unchanged files.
 
 USAGE:
-script_name [OPTIONS] src_dir anno_dir relation_name
+script_name [OPTIONS] src_dir anno_dir relation_name [relation_name ...]
 """
 
 ##################################################################
 # Libraries
-from rst import RSTForrest, FIELD_SEP, TREE_EXTERNAL, TREE_INTERNAL, TREE_ALL, XML_FMT
+from rst import RSTCache, RSTCorpus, RSTRelIndex, FIELD_SEP, TREE_EXTERNAL, TREE_INTERNAL, TREE_ALL, XML_FMT
 
 from collections import defaultdict, Counter
 from itertools import chain
@@ -17,7 +22,6 @@ import argparse
 import glob
 import os
 import sys
-import xml.etree.ElementTree as ET
 
 reload(sys)
 sys.setdefaultencoding('utf8')
@@ -25,6 +29,9 @@ sys.setdefaultencoding('utf8')
 ##################################################################
 # Variables and Constants
 ENCODING = "utf-8"
+# version of cached relation indices (change it whenever the records of
+# RSTRelIndex change)
+INDEX_CACHE_VERSION = 2
 
 # indices used for copmputing kappa statistics
 CONFUSION_IDX = 0
@@ -54,34 +61,6 @@ def _get_subtrees(a_rsttrees):
     return ret
 
 
-def _get_messages(a_thread, a_start_id, a_msgid2txt, a_msgid2discid):
-    """
-    Populate dictionary of messages
-
-    @param a_thread - XML element representing whole thread
-    @param a_start_id - serial number to start the numbering of
-                        messages from
-    @param a_msgid2txt - dictionary in which to store the text of the
-                         messages
-    @param a_msgid2discid - dictionary for storing mapping from message
-                        id's to their serial numbers in the discussions
-
-    @return \c next serial message number to use
-    """
-    txt = ""
-    msgid = None
-    for imsg in a_thread.findall('msg'):
-        # remember current message
-        msgid = imsg.get("id")
-        txt = imsg.find("text").text.encode(ENCODING).strip()
-        a_msgid2txt[msgid] = txt
-        a_msgid2discid[msgid] = a_start_id
-        a_start_id += 1
-        # recursively process children
-        a_start_id = _get_messages(imsg, a_start_id, a_msgid2txt,
-                                   a_msgid2discid)
-    return a_start_id
-
 # def find_rels(relation, tree, rels):
 #     if tree.relname == relation:
 #         rels.append(tree.str_min())
@@ -90,35 +69,63 @@ def _get_messages(a_thread, a_start_id, a_msgid2txt, a_msgid2discid):
 #         find_rels(relation, st, rels)
 
 
-def extract_relations(relation_name, src_fname, anno_fname):
-    rels = []
+def index_relations(src_fname, anno_fname, corpus=None):
+    """
+    Index all relations of an annotation file.
+
+    @param src_fname - name of source file with original text
+    @param anno_fname - name of the annotation file
+    @param corpus - loader of source and annotation files (RSTCorpus)
 
-    start_id = 0
-    messages = {}
-    msgid2discid = {}
+    @return RSTRelIndex
+    """
     print "Processing file: '{:s}'".format(src_fname)
-    srctree = ET.parse(src_fname).getroot()
-    for ithread in srctree.iter('thread'):
-        start_id = _get_messages(ithread, start_id, messages, msgid2discid)
-    # read first annotation file
-    rstForrest = RSTForrest(XML_FMT, messages, msgid2discid)
-    rstForrest.parse(anno_fname)
-
-    nuc = sat = None
-    processed_subtrees = set()
-    for itree in rstForrest.trees:
-        #        find_rels(relation_name,itree,rels)
-        subtrees = itree.get_subtrees(a_flag=TREE_ALL)
-        for st in subtrees:
-            if st in processed_subtrees:
-                continue
-            processed_subtrees.add(st)
-            #print st.relname
-            if st.relname == relation_name:
-                nuc = st.parent
-                sat = st
-                rels.append((nuc.str_min(), sat.str_min()))
-    return rels
+    if corpus is None:
+        corpus = RSTCorpus()
+
+    def _compute():
+        ret = RSTRelIndex()
+        ret.add_forrest(corpus.get_forrest(src_fname, anno_fname), anno_fname)
+        return ret
+
+    if corpus.cache is None:
+        return _compute()
+    return corpus.cache.get_result("relations", (anno_fname, src_fname), \
+                                       _compute, str(INDEX_CACHE_VERSION))
+
+
+def _get_forrest(a_anno_fname, a_anno2src, a_anno2forrest, a_corpus):
+    """
+    Return RST forrest of annotation file reading it at most once.
+
+    @param a_anno_fname - name of the annotation file
+    @param a_anno2src - dictionary mapping annotation files to source files
+    @param a_anno2forrest - dictionary of forrests which have been read
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+
+    @return RSTForrest
+    """
+    if a_anno_fname not in a_anno2forrest:
+        a_anno2forrest[a_anno_fname] = a_corpus.get_forrest(
+            a_anno2src[a_anno_fname], a_anno_fname)
+    return a_anno2forrest[a_anno_fname]
+
+
+def extract_relations(relation_name, src_fname, anno_fname, corpus=None):
+    """
+    Extract relations with the given name from an annotation file.
+
+    @param relation_name - name of the relation
+    @param src_fname - name of source file with original text
+    @param anno_fname - name of the annotation file
+    @param corpus - loader of source and annotation files (RSTCorpus)
+
+    @return list of 2-tuples with representations of nuclei and satellites
+    """
+    if corpus is None:
+        corpus = RSTCorpus()
+    return index_relations(src_fname, anno_fname, corpus).get_texts( \
+        relation_name, lambda fname: corpus.get_forrest(src_fname, fname))
 
 
 def main(argv):
@@ -132,17 +139,29 @@ def main(argv):
     global ENCODING
     # define command line arguments
     argparser = argparse.ArgumentParser(description = """Extract relations from RST corpus""")
+    # optional arguments
+    argparser.add_argument("--cache-dir", help = """directory for caching parsed
+files between runs""", type = str)
     # mandatory arguments
     argparser.add_argument("src_dir", help = "directory with source files of corpus")
     argparser.add_argument("anno_dir", help = "directory with annotation files of corpus")
-    argparser.add_argument("relation_name", help = "relation to be searched for")
+    argparser.add_argument("relation_names", help = """relations to be searched for
+(shell-style patterns such as `r-*' are allowed)""", nargs = "+")
     args = argparser.parse_args(argv)
 
     # iterate over each source file in `source` directory and find
     # corresponding annotation files
     anno1_fname = ""
     src_fname_base = ""
-    rels = []
+    rel_index = RSTRelIndex()
+    # source files of annotation files and forrests of the files whose
+    # relations are output (needed for rendering relations)
+    anno2src = {}
+    anno2forrest = {}
+    cache = None
+    if args.cache_dir:
+        cache = RSTCache(args.cache_dir)
+    corpus = RSTCorpus(XML_FMT, cache)
 
     for src_fname in glob.iglob(os.path.join(args.src_dir, "*.xml")):
         if not os.path.isfile(src_fname) or not os.access(src_fname, os.R_OK):
@@ -157,13 +176,23 @@ def main(argv):
         if not os.path.isfile(anno1_fname) or not os.access(anno1_fname, os.R_OK):
             continue
 
-        # find relations with given name
-        rels.extend(extract_relations(args.relation_name, src_fname, anno1_fname))
-    with open(args.relation_name + "-twit.txt", "w") as outfile:
-        for nuc, sat in rels:
-            outfile.write("Nucleus:" + nuc + "\n")
-            outfile.write("Sattelite:" + sat + "\n")
-            outfile.write("=" * 66 + "\n")
+        # index all relations of the file
+        rel_index.update(index_relations(src_fname, anno1_fname, corpus))
+        anno2src[anno1_fname] = src_fname
+
+    # output relations matching the given names
+    for ipattern in args.relation_names:
+        if not rel_index.get_relnames((ipattern,)):
+            print >> sys.stderr, \
+                "WARNING: No relation matches '{:s}'".format(ipattern)
+    for relname in rel_index.get_relnames(args.relation_names):
+        with open(relname + "-twit.txt", "w") as outfile:
+            for nuc, sat in rel_index.get_texts(relname, \
+                    lambda fname: _get_forrest(fname, anno2src, anno2forrest,
+                                               corpus)):
+                outfile.write("Nucleus:" + nuc + "\n")
+                outfile.write("Sattelite:" + sat + "\n")
+                outfile.write("=" * 66 + "\n")
     return 0
 
 ##################################################################
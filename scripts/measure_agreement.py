@@ -4,20 +4,29 @@
 Script for measuring agreeement on RST corpus.
 
 USAGE:
-script_name [OPTIONS] src_dir anno_dir1 anno_dir2
+script_name [OPTIONS] src_dir anno_dir1 anno_dir2 [anno_dir3 ...]
 """
 
 ##################################################################
 # Libraries
-from rst import RSTForrest, FIELD_SEP, TREE_EXTERNAL, TREE_INTERNAL, XML_FMT
+from rst import DIFF_FORMATS, DIFF_TSV, MSG_IDS, PRJ_SFX, RSTDiffReport, get_attr_diff, \
+    get_segment_diff, RSTCache, RSTCorpus, RSTProject, RSTTokenIndex, FIELD_SEP, TREE_EXTERNAL, TREE_INTERNAL, XML_FMT, TSV_FMT
 
+from bisect import bisect_right
 from collections import defaultdict, Counter
 from itertools import chain
+from StringIO import StringIO
 import argparse
 import glob
+import multiprocessing
 import os
 import sys
-import xml.etree.ElementTree as ET
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 ##################################################################
 # Variables and Constants
@@ -26,18 +35,38 @@ ENCODING = "utf-8"
 # indices used for copmputing kappa statistics
 CONFUSION_IDX = 0
 DIFF_IDX = 1
+UNITS_IDX = 2
 NONE = "none"
 SEG = "segment"
 NONSEG = "nonsegment"
 NUCLEUS = "nucleus"
 RELNAME = "relname"
 
+# formats of annotation files
+FILE_FORMATS = {"xml": XML_FMT, "tsv": TSV_FMT}
+
 # auxiliary function used for creating initial statistics list
-# confusion matrix, list of differences
-KAPPA_GEN = lambda: [defaultdict(lambda: Counter()), []]
+# confusion matrix, list of differences (records of disagreements of a
+# single file, which are not merged into total statistics), list of
+# confusion matrices of single messages or discussions (only collected for
+# bootstrapping)
+KAPPA_GEN = lambda: [defaultdict(lambda: Counter()), [], []]
+
+# default confidence level of bootstrap intervals
+DFLT_CONFIDENCE = 0.95
 
 # statistics dictionaries
 KAPPA_STAT = defaultdict(KAPPA_GEN)  # total kappa statistics
+# total statistics of multiple annotators (tables mapping tuples of values
+# assigned to an item by each annotator to the number of such items)
+MULTI_STAT = defaultdict(Counter)
+
+# loader of source and annotation files of the current process
+WORKER_CORPUS = None
+
+# version of cached statistics of files (should be increased whenever the
+# computation of statistics changes)
+STAT_CACHE_VERSION = 5
 
 # constants specifying which RST elements should be tested
 SEGMENTS = "segments"
@@ -54,10 +83,27 @@ CHCK_DRELATIONS = 16
 CHCK_RELATIONS = CHCK_MRELATIONS | CHCK_DRELATIONS
 ALL = "all"
 CHCK_ALL = 31
+# order in which statistics of elements are output
+ELEMENTS = (SEGMENTS, MNUCLEARITY, DNUCLEARITY, MRELATIONS, DRELATIONS)
 
 
 ##################################################################
 # Methods
+def _get_elements(a_stat):
+    """
+    Return names of elements of statistics in output order.
+
+    Elements are output in a fixed order, so that the output does not
+    depend on the order in which statistics were collected or merged.
+
+    @param a_stat - dictionary mapping element names to their statistics
+
+    @return list of element names
+    """
+    return sorted(a_stat, key = lambda elname: (ELEMENTS.index(elname) \
+                                                    if elname in ELEMENTS \
+                                                    else len(ELEMENTS), elname))
+
 def _merge_stat(a_trg_stat, a_src_stat):
     """
     Update statistics of a_trg_stat with a_src_stat.
@@ -77,7 +123,7 @@ def _merge_stat(a_trg_stat, a_src_stat):
         for confusion_key2, confusion_stat2 in confusion2.iteritems():
             # print >> sys.stderr, "confusion1[confusion_key2]", repr(confusion1[confusion_key2])
             confusion1[confusion_key2].update(confusion_stat2)
-        stat1[DIFF_IDX] += stat2[DIFF_IDX]
+        stat1[UNITS_IDX] += stat2[UNITS_IDX]
 
 def _compute_kappa(a_overlap, a_marginals1, a_marginals2, a_total):
     """Compute Cohen's Kappa.
@@ -107,13 +153,92 @@ def _compute_kappa(a_overlap, a_marginals1, a_marginals2, a_total):
     assert kappa <= 1.0, "Invalid kappa value: '{:.2f}'".format(kappa)
     return kappa
 
-def output_stat(a_stat = KAPPA_STAT, a_ostream = sys.stderr, a_header = ""):
+def _bootstrap_kappa(a_units, a_n_bootstrap, a_confidence = DFLT_CONFIDENCE, a_rng = None):
+    """
+    Compute bootstrap confidence interval of Cohen's Kappa.
+
+    Confusion matrices of units (messages or discussions) are stacked into a
+    tensor, from which the overlap, the total, and the marginals of each unit
+    are obtained.  Replicates are represented by the numbers of times each
+    unit was drawn, so that the statistics of all replicates are computed by
+    a single matrix product.
+
+    @param a_units - list of confusion matrices of single units
+    @param a_n_bootstrap - number of bootstrap replicates
+    @param a_confidence - confidence level of the interval
+    @param a_rng - random number generator (numpy.random.RandomState)
+
+    @return 2-tuple with lower and upper bound of the interval
+    """
+    n_units = len(a_units)
+    if n_units == 0:
+        return (0.0, 0.0)
+    if a_rng is None:
+        a_rng = np.random
+    # assign indices to categories
+    cat2idx = {}
+    for iunit in a_units:
+        for k, v in iunit.iteritems():
+            cat2idx.setdefault(k, len(cat2idx))
+            for k2 in v:
+                cat2idx.setdefault(k2, len(cat2idx))
+    n_cats = len(cat2idx)
+    confusion = np.zeros((n_units, n_cats, n_cats))
+    for i, iunit in enumerate(a_units):
+        for k, v in iunit.iteritems():
+            for k2, cnt in v.iteritems():
+                confusion[i, cat2idx[k], cat2idx[k2]] = cnt
+    marginals1 = confusion.sum(axis = 2)
+    marginals2 = confusion.sum(axis = 1)
+    features = np.hstack((np.einsum("ijj->i", confusion)[:, None], \
+                              marginals1.sum(axis = 1)[:, None], marginals1, marginals2))
+    # draw replicates and count how often each unit was drawn in them
+    draws = a_rng.randint(0, n_units, (a_n_bootstrap, n_units))
+    draws += np.arange(a_n_bootstrap)[:, None] * n_units
+    weights = np.bincount(draws.ravel(), minlength = a_n_bootstrap * n_units)
+    weights = weights.reshape(a_n_bootstrap, n_units).astype(float)
+    replicates = weights.dot(features)
+    overlap = replicates[:, 0]
+    total = replicates[:, 1]
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        observed = overlap / total
+        chance = (replicates[:, 2:2 + n_cats] * replicates[:, 2 + n_cats:]).sum(axis = 1) \
+            / total**2
+        kappa = np.where((total > 0) & (chance < 1.0), \
+                             (observed - chance) / (1.0 - chance), 0.0)
+    alpha = (1.0 - a_confidence) / 2.0
+    low, high = np.percentile(kappa, [100. * alpha, 100. * (1.0 - alpha)])
+    return (low, high)
+
+def _get_rng(a_seed, a_stream):
+    """
+    Return random number generator of a bootstrap stream.
+
+    Totals use stream 0 and the i-th file uses stream i + 1, so that
+    intervals of single files do not change the intervals of the totals.
+
+    @param a_seed - seed of the run (\c None for unseeded generators)
+    @param a_stream - number of the stream
+
+    @return numpy.random.RandomState
+    """
+    if a_seed is None:
+        return np.random.RandomState()
+    return np.random.RandomState(a_seed + a_stream)
+
+def output_stat(a_stat = KAPPA_STAT, a_ostream = sys.stderr, a_header = "", \
+                    a_n_bootstrap = 0, a_confidence = DFLT_CONFIDENCE, a_rng = None):
     """
     Output agreement statistics.
 
     @param a_stat - dictionary containing agreement statistics
     @param a_ostream - output file stream for statistics
     @param a_header - optional header to print before actual statistics
+    @param a_n_bootstrap - number of bootstrap replicates used for computing
+                      confidence intervals of Kappa (no intervals are
+                      computed if \c 0)
+    @param a_confidence - confidence level of the intervals
+    @param a_rng - random number generator (numpy.random.RandomState)
 
     @return void
     """
@@ -122,12 +247,14 @@ def output_stat(a_stat = KAPPA_STAT, a_ostream = sys.stderr, a_header = ""):
 
     print >> a_ostream, \
         "{:25s}{:15s}{:15s}{:15s}{:15s}{:15s}".format("Element", "Overlap", "Markables1", \
-                                                          "Markables2", "Total", "Kappa")
+                                                          "Markables2", "Total", "Kappa") + \
+        ("{:.0%} CI".format(a_confidence) if a_n_bootstrap else "")
     confusion_mtx = None
     marginals1 = Counter()
     marginals2 = Counter()
     total = _total = overlap = mrkbl1 = mrkbl2 = 0
-    for elname, elstat in a_stat.iteritems():
+    for elname in _get_elements(a_stat):
+        elstat = a_stat[elname]
         confusion_mtx = elstat[CONFUSION_IDX]
         marginals1.clear(); marginals2.clear()
         total = overlap = mrkbl1 = mrkbl2 = 0
@@ -145,45 +272,162 @@ def output_stat(a_stat = KAPPA_STAT, a_ostream = sys.stderr, a_header = ""):
         # print >> sys.stderr, "marginals2 =", repr(marginals2)
         kappa = _compute_kappa(overlap, marginals1, marginals2, total)
         print >> a_ostream, "{:25s}{:<15d}{:<15d}{:<15d}{:<15d}{:<15.2%}".format(\
-            elname, overlap, sum(marginals1.values()), sum(marginals2.values()), total, kappa)
-        if elstat[DIFF_IDX]:
-            for d in elstat[DIFF_IDX]:
-                print "#\t" + elname
-                print d.encode(ENCODING)
-
-def _update_segment_diff(a_diff, a_txt, a_bndr1, a_bndr2):
-    """
-    Generate difference on segments.
-
-    @param a_diff - list of differences to be updated
-    @param a_txt - raw text of the trees
-    @param a_bndr1 - set of discourse boundaries from the 1-st annotator
-    @param a_bndr2 - set of discourse boundaries from the 2-nd annotator
-
-    @return \c True if difference was generated, False otherwise
-    """
-    ret = a_msgid + '\t'
-    boundaries = [(b, "<1>") for b in a_bndr1 - a_bndr2]
-    boundaries += [(b, "<2>") for b in a_bndr2 - a_bndr1]
-    if not boundaries:
-        return False
-    boundaries += [(b, "<>") for b in a_bndr1 & a_bndr2]
-    boundaries.sort(key = lambda el: el[0])
-    prev_b = 0
-    for b, tag in boundaries:
-        ret += a_txt[prev_b:b] + tag
-        prev_b = b
-    ret += a_txt[b:]
-    a_diff.append(ret)
-    return True
-
-def _update_segment_stat(a_argmnt_stat, a_txt, a_edus1, a_edus2, a_diff = False, \
+            elname, overlap, sum(marginals1.values()), sum(marginals2.values()), total, kappa) + \
+            ("[{:.2%}, {:.2%}]".format(*_bootstrap_kappa(elstat[UNITS_IDX], a_n_bootstrap, \
+                                                             a_confidence, a_rng)) \
+                 if a_n_bootstrap else "")
+
+def _ordinal(a_i):
+    """
+    Return ordinal form of annotator's number.
+
+    @param a_i - number of annotator (starting from 1)
+
+    @return string
+    """
+    if a_i % 100 not in (11, 12, 13):
+        if a_i % 10 == 1:
+            return "{:d}-st".format(a_i)
+        elif a_i % 10 == 2:
+            return "{:d}-nd".format(a_i)
+        elif a_i % 10 == 3:
+            return "{:d}-rd".format(a_i)
+    return "{:d}-th".format(a_i)
+
+def _merge_multi_stat(a_trg_stat, a_src_stat):
+    """
+    Update statistics of multiple annotators a_trg_stat with a_src_stat.
+
+    @param a_trg_stat - target statistics to be updated
+    @param a_src_stat - statistics from which to update
+
+    @return void
+    """
+    for elname, table in a_src_stat.iteritems():
+        a_trg_stat[elname].update(table)
+
+def _compute_fleiss_kappa(a_table):
+    """
+    Compute Fleiss' Kappa.
+
+    @param a_table - counter mapping tuples of values assigned to an item by
+                     each annotator to the number of such items
+
+    @return float
+    """
+    n_items = sum(a_table.itervalues())
+    if n_items == 0:
+        return 0.0
+    n_annotators = len(next(a_table.iterkeys()))
+    observed = 0.
+    marginals = Counter()
+    for row, cnt in a_table.iteritems():
+        values = Counter(row)
+        marginals.update(dict((k, v * cnt) for k, v in values.iteritems()))
+        observed += cnt * sum(v * (v - 1) for v in values.itervalues())
+    observed /= float(n_items * n_annotators * (n_annotators - 1))
+    total = float(n_items * n_annotators)
+    chance = sum((v / total)**2 for v in marginals.itervalues())
+    if chance < 1.0:
+        return (observed - chance) / (1.0 - chance)
+    return 0.0
+
+def _compute_alpha(a_table):
+    """
+    Compute Krippendorff's Alpha for nominal data.
+
+    @param a_table - counter mapping tuples of values assigned to an item by
+                     each annotator to the number of such items
+
+    @return float
+    """
+    # number of pairable values and number of disagreeing pairs (both
+    # weighted as in the coincidence matrix)
+    n_pairable = 0.
+    disagreement = 0.
+    marginals = Counter()
+    for row, cnt in a_table.iteritems():
+        values = Counter(row)
+        n_values = len(row)
+        marginals.update(dict((k, v * cnt) for k, v in values.iteritems()))
+        n_pairable += cnt * n_values
+        disagreement += cnt * (n_values**2 - sum(v * v for v in values.itervalues())) \
+            / float(n_values - 1)
+    chance = n_pairable**2 - sum(v * v for v in marginals.itervalues())
+    if chance <= 0.:
+        return 0.0
+    return 1.0 - (n_pairable - 1) * disagreement / chance
+
+def _get_pair_confusion(a_table, a_i, a_j):
+    """
+    Obtain confusion matrix of two annotators.
+
+    @param a_table - counter mapping tuples of values assigned to an item by
+                     each annotator to the number of such items
+    @param a_i - index of the 1-st annotator
+    @param a_j - index of the 2-nd annotator
+
+    @return 3-tuple with the number of matches and marginals of both
+            annotators
+    """
+    overlap = 0
+    marginals1 = Counter()
+    marginals2 = Counter()
+    for row, cnt in a_table.iteritems():
+        marginals1[row[a_i]] += cnt
+        marginals2[row[a_j]] += cnt
+        if row[a_i] == row[a_j]:
+            overlap += cnt
+    return (overlap, marginals1, marginals2)
+
+def output_multi_stat(a_stat = MULTI_STAT, a_ostream = sys.stderr, a_header = ""):
+    """
+    Output agreement statistics of multiple annotators.
+
+    @param a_stat - dictionary mapping elements to tables of assigned values
+    @param a_ostream - output file stream for statistics
+    @param a_header - optional header to print before actual statistics
+
+    @return void
+    """
+    if a_header:
+        print >> a_ostream, a_header
+
+    print >> a_ostream, \
+        "{:25s}{:15s}{:15s}{:15s}{:15s}".format("Element", "Items", "Annotators", \
+                                                    "Fleiss' Kappa", "Alpha")
+    n_items = n_annotators = 0
+    for elname in _get_elements(a_stat):
+        table = a_stat[elname]
+        n_items = sum(table.itervalues())
+        n_annotators = len(next(table.iterkeys())) if table else 0
+        print >> a_ostream, "{:25s}{:<15d}{:<15d}{:<15.2%}{:<15.2%}".format(\
+            elname, n_items, n_annotators, _compute_fleiss_kappa(table), _compute_alpha(table))
+    # output matrices of pairwise Cohen's Kappa
+    for elname in _get_elements(a_stat):
+        table = a_stat[elname]
+        if not table:
+            continue
+        n_annotators = len(next(table.iterkeys()))
+        print >> a_ostream, "\nPairwise Kappa on {:s}".format(elname)
+        print >> a_ostream, "{:15s}".format("") + \
+            "".join("{:15s}".format(_ordinal(j + 1)) for j in xrange(n_annotators))
+        for i in xrange(n_annotators):
+            print >> a_ostream, "{:15s}".format(_ordinal(i + 1)) + \
+                "".join("{:<15.2%}".format(_compute_kappa(*_get_pair_confusion(table, i, j) + \
+                                                              (sum(table.itervalues()),))) \
+                            for j in xrange(n_annotators))
+
+def _update_segment_stat(a_argmnt_stat, a_tokens, a_edus1, a_edus2, a_diff = False, \
                              a_strict = False):
     """
     Update agreement statistics about segment boundaries.
 
+    Boundaries are compared on the level of tokens, i.e. every token of the
+    message is a candidate for a segment boundary following it.
+
     @param a_argmnt_stat - list containing relevant agreement statistics
-    @param a_txt - raw text of the trees
+    @param a_tokens - token index of the message text (RSTTokenIndex)
     @param a_edus1 - EDUs from the 1-st annotation
     @param a_edus2 - EDUs from the 2-nd annotation
     @param a_diff - generate differences
@@ -192,8 +436,8 @@ def _update_segment_stat(a_argmnt_stat, a_txt, a_edus1, a_edus2, a_diff = False,
     @return \c void
     """
     # update number of total and overlapping segments
-    bndr1 = set([edu.end[-1] for edu in a_edus1])
-    bndr2 = set([edu.end[-1] for edu in a_edus2])
+    bndr1 = set(a_tokens.get_boundaries(edu.end[-1] for edu in a_edus1))
+    bndr2 = set(a_tokens.get_boundaries(edu.end[-1] for edu in a_edus2))
 
     seg_seg_overlap = len(bndr1 & bndr2)
     total_seg = len(bndr1 | bndr2)
@@ -206,21 +450,28 @@ def _update_segment_stat(a_argmnt_stat, a_txt, a_edus1, a_edus2, a_diff = False,
     # The total number of possible EDU boundaries will depend on the particular
     # scheme.  For strict metric, NONSEG <-> NONSEG is going to be 0.
     if not a_strict:
-        confusion_mtx[NONSEG][NONSEG] += len(a_txt.split()) - total_seg
-    # if a_diff:
-    #     _update_segment_diff(a_argmnt_stat[DIFF_IDX], a_txt, bndr1, bndr2)
+        confusion_mtx[NONSEG][NONSEG] += len(a_tokens) - total_seg
+    if a_diff and bndr1 != bndr2:
+        # differences are reported with character offsets of the boundaries
+        a_argmnt_stat[DIFF_IDX].append(get_segment_diff( \
+                (a_edus1 or a_edus2)[0].msgid, \
+                    set(a_tokens.get_offset(b) for b in bndr1), \
+                    set(a_tokens.get_offset(b) for b in bndr2)))
 
 def _update_attr_stat(a_argmnt_stat, a_attr, a_subsegs, a_segs2trees1, a_segs2trees2, \
-                                a_diff = False):
+                                a_n_empty = 0, a_diff = False, a_flag = TREE_INTERNAL):
     """
     Update agreement statistics about relation types between EDUs.
 
     @param a_argmnt_stat - list containing relevant agreement statistics
     @param a_attr - string representing tree attribute whose agreement should be checked
-    @param a_subsegs - set of all possible subsegments
+    @param a_subsegs - sorted list of subsegments covered by at least one of the annotations
     @param a_segs2trees1 - RST trees from the 1-st annotation
     @param a_segs2trees2 - RST trees from the 2-nd annotation
+    @param a_n_empty - number of possible subsegments covered by neither annotation
     @param a_diff - flag specifying whether differences should be generated
+    @param a_flag - flag indicating which descendants (internal or external)
+                    of the trees were compared
 
     @return \c void
 
@@ -232,17 +483,17 @@ def _update_attr_stat(a_argmnt_stat, a_attr, a_subsegs, a_segs2trees1, a_segs2tr
     # print >> sys.stderr, "_update_attr_stat: a_subsegs =", repr(a_subsegs)
     # print >> sys.stderr, "_update_attr_stat: a_segs2trees1 =", repr(a_segs2trees1)
     # print >> sys.stderr, "_update_attr_stat: a_segs2trees2 =", repr(a_segs2trees2)
+    # subsegments which are not covered by any annotation are only counted
+    if a_n_empty:
+        confusion_mtx[NONE][NONE] += a_n_empty
     for sseg in a_subsegs:
         # print >> sys.stderr, "_update_attr_stat: sseg =", repr(sseg)
-        tree1 = a_segs2trees1[sseg]
-        tree2 = a_segs2trees2[sseg]
+        tree1 = a_segs2trees1.get(sseg)
+        tree2 = a_segs2trees2.get(sseg)
         # print >> sys.stderr, "_update_attr_stat: tree1 =", repr(tree1)
         # print >> sys.stderr, "_update_attr_stat: tree2 =", repr(tree2)
         if not tree1:
-            if not tree2:
-                confusion_mtx[NONE][NONE] += 1
-            else:
-                confusion_mtx[NONE][getattr(tree2, a_attr)] += 1
+            confusion_mtx[NONE][getattr(tree2, a_attr)] += 1
         elif not tree2:
             confusion_mtx[getattr(tree1, a_attr)][NONE] += 1
         else:
@@ -250,67 +501,88 @@ def _update_attr_stat(a_argmnt_stat, a_attr, a_subsegs, a_segs2trees1, a_segs2tr
             attr2 = getattr(tree2, a_attr)
             confusion_mtx[attr1][attr2] += 1
             if a_diff and attr1 != attr2:
-                a_argmnt_stat[DIFF_IDX].append(tree1.minimal_str(TREE_INTERNAL, a_attr) + \
-                                                   "\nvs.\n" + tree2.minimal_str(TREE_INTERNAL, \
-                                                                                     a_attr))
+                a_argmnt_stat[DIFF_IDX].append(get_attr_diff(a_attr, tree1, tree2, a_flag))
 
 def _get_subtrees(a_rsttrees):
     """
     Obtain all subtrees from a given tree.
 
+    Trees are visited in sorted order and their subtrees in pre-order, so
+    that of several subtrees with the same offsets, the most deeply nested
+    one is listed last (and thus kept when the list is converted to a
+    dictionary) regardless of the order of sets.
+
     @param a_rsttrees - RST trees to obtain subtrees from
 
     @return list of 2-tuples with tree offsets and subtrees
     """
     ret = []
-    for irsttree in a_rsttrees:
-        for subtree in irsttree.get_subtrees():
+    for irsttree in sorted(a_rsttrees):
+        for subtree in irsttree.iter_subtrees():
             ret.append(((subtree.start, subtree.end), subtree))
     return ret
 
-def _get_messages(a_thread, a_start_id, a_msgid2txt, a_msgid2discid):
-    """
-    Populate dictionary of messages
-
-    @param a_thread - XML element representing whole thread
-    @param a_start_id - serial number to start the numbering of
-                        messages from
-    @param a_msgid2txt - dictionary in which to store the text of the
-                         messages
-    @param a_msgid2discid - dictionary for storing mapping from message
-                        id's to their serial numbers in the discussions
-
-    @return \c next serial message number to use
-    """
-    txt = ""
-    msgid = None
-    for imsg in a_thread.findall('msg'):
-        # remember current message
-        msgid = imsg.get("id")
-        txt = imsg.find("text").text.encode(ENCODING).strip()
-        a_msgid2txt[msgid] = txt
-        a_msgid2discid[msgid] = a_start_id
-        a_start_id += 1
-        # recursively process children
-        a_start_id = _get_messages(imsg, a_start_id, a_msgid2txt, a_msgid2discid)
-    return a_start_id
-
-def _update_stat(a_argmnt_stat, a_rsttrees1, a_rsttrees2, a_txt, \
-                     a_chck_flags, a_diff, a_sgm_strict):
+def _count_subsegs(a_starts, a_ends):
     """
-    Measure agreement of two RST trees.
+    Count all possible subsegments.
 
-    @param a_argmnt_stat - dictionary with agreement statistics to be updated
-    @param a_rsttrees1 - RST trees from 1-st annotation
-    @param a_rsttrees2 - RST trees from 2-nd annotation
-    @param a_txt - raw text of the trees
-    @param a_chck_flags - flags specifying which elements should be tested
-    @param a_diff - flag specifying whether differences should be generated
-    @param a_sgm_strict - flag indicating whether segment agreement should
-                       apply strict metric
+    @param a_starts - sorted list of start offsets of EDUs
+    @param a_ends - sorted list of end offsets of EDUs
 
-    @return \c void
+    @return number of pairs of start and end offsets in which the end
+            succeeds the start
+    """
+    n_ends = len(a_ends)
+    return sum(n_ends - bisect_right(a_ends, start_i) for start_i in a_starts)
+
+def _get_offsets(a_edus):
+    """
+    Obtain sorted start and end offsets of EDUs.
+
+    @param a_edus - iterable of EDUs from all annotations
+
+    @return 2-tuple of sorted lists with start and end offsets
+    """
+    starts = set()
+    ends = set()
+    for edu in a_edus:
+        starts.add(edu.start)
+        ends.add(edu.end)
+    starts = sorted(starts)
+    ends = sorted(ends)
+    for start_i in starts:
+        assert start_i[0] >= 0, "Invalid start of RSTTree: {:s}".format(repr(start_i))
+    for end_j in ends:
+        assert end_j[0] >= 0 or end_j <= starts[0], \
+            "Invalid end of RSTTree: {:s}".format(repr(end_j))
+    return (starts, ends)
+
+def _get_subsegs(a_starts, a_ends, a_segs2trees):
+    """
+    Obtain possible subsegments covered by at least one of the annotations.
+
+    @param a_starts - sorted list of start offsets of EDUs
+    @param a_ends - sorted list of end offsets of EDUs
+    @param a_segs2trees - list of dictionaries mapping subsegments to RST
+                          trees of each annotation
+
+    @return sorted list of 2-tuples with start and end offsets
+    """
+    starts = set(a_starts)
+    ends = set(a_ends)
+    ret = [sseg for sseg in set().union(*a_segs2trees) \
+               if sseg[0] in starts and sseg[-1] in ends and sseg[0] < sseg[-1]]
+    ret.sort()
+    return ret
+
+def _get_keys(a_chck_flags):
+    """
+    Obtain statistics keys of nuclearity and relations for check flags.
+
+    @param a_chck_flags - flags specifying which elements should be tested
 
+    @return 3-tuple with keys of nuclearity and relations statistics and
+            flag specifying which EDUs should be compared
     """
     # check flags
     assert not a_chck_flags & (CHCK_MRELATIONS | CHCK_MNUCLEARITY) or \
@@ -328,81 +600,311 @@ def _update_stat(a_argmnt_stat, a_rsttrees1, a_rsttrees2, a_txt, \
         nuc_key = DNUCLEARITY
         rel_key = DRELATIONS
         edu_flags = TREE_EXTERNAL
+    return (nuc_key, rel_key, edu_flags)
+
+def _update_stat(a_argmnt_stat, a_rsttrees1, a_rsttrees2, a_tokens, \
+                     a_chck_flags, a_diff, a_sgm_strict):
+    """
+    Measure agreement of two RST trees.
+
+    @param a_argmnt_stat - dictionary with agreement statistics to be updated
+    @param a_rsttrees1 - RST trees from 1-st annotation
+    @param a_rsttrees2 - RST trees from 2-nd annotation
+    @param a_tokens - token index of the message text (RSTTokenIndex or
+                      \c None if segments are not checked)
+    @param a_chck_flags - flags specifying which elements should be tested
+    @param a_diff - flag specifying whether differences should be generated
+    @param a_sgm_strict - flag indicating whether segment agreement should
+                       apply strict metric
+
+    @return \c void
+
+    """
+    nuc_key, rel_key, edu_flags = _get_keys(a_chck_flags)
     edus1 = [edu for rsttree in a_rsttrees1 for edu in rsttree.get_edus(edu_flags)]
     edus2 = [edu for rsttree in a_rsttrees2 for edu in rsttree.get_edus(edu_flags)]
     # estimate agreement on segment boundaries
     if a_chck_flags & CHCK_SEGMENTS:
-        _update_segment_stat(a_argmnt_stat[SEGMENTS], a_txt, edus1, edus2, \
+        _update_segment_stat(a_argmnt_stat[SEGMENTS], a_tokens, edus1, edus2, \
                                       a_diff, a_sgm_strict)
-    subsegs = []
-    # chain(edus1, edus2)
     if a_chck_flags & (CHCK_NUCLEARITY | CHCK_RELATIONS):
         # obtain starts and ends of segments
-        starts = list(set([edu.start for edu in chain(edus1, edus2)]))
-        starts.sort()
-        ends = list(set(edu.end for edu in chain(edus1, edus2)))
-        ends.sort()
-        # generate all possible subsegments
-        j_end = 0
-        # for each start position, create a list of tuples with this start
-        # position as the first element and all succeeding end positions as the
-        # second elements
-        for start_i in starts:
-            assert start_i[0] >= 0, "Invalid start of RSTTree: {:d}".format(repr(start_i))
-            while j_end < len(ends) and ends[j_end] <= start_i:
-                j_end += 1
-            for end_j in ends[j_end:]:
-                assert end_j[0] >= 0, "Invalid start of RSTTree: {:d}".format(repr(end_j))
-                subsegs.append((start_i, end_j))
+        starts, ends = _get_offsets(chain(edus1, edus2))
+        segs2trees1 = dict(_get_subtrees(a_rsttrees1))
+        segs2trees2 = dict(_get_subtrees(a_rsttrees2))
+        # possible subsegments pair every start position with all succeeding
+        # end positions; only those which are covered by one of the
+        # annotations are visited, while the remaining ones, which are
+        # covered by neither annotation, are only counted
+        subsegs = _get_subsegs(starts, ends, [segs2trees1, segs2trees2])
+        n_empty = _count_subsegs(starts, ends) - len(subsegs)
         # print >> sys.stderr, "starts =", starts
         # print >> sys.stderr, "ends =", ends
         # print >> sys.stderr, "subsegs = ", repr(subsegs)
-        segs2trees1 = defaultdict(lambda: None, _get_subtrees(a_rsttrees1))
-        segs2trees2 = defaultdict(lambda: None, _get_subtrees(a_rsttrees2))
-        # print >> sys.stderr, "segs2trees1 = ", repr(segs2trees1)
-        # print >> sys.stderr, "segs2trees2 = ", repr(segs2trees2)
-        # sys.exit(66)
         if a_chck_flags & CHCK_NUCLEARITY:
             _update_attr_stat(a_argmnt_stat[nuc_key], NUCLEUS, subsegs, segs2trees1, \
-                                  segs2trees2, a_diff)
+                                  segs2trees2, n_empty, a_diff, edu_flags)
         if a_chck_flags & CHCK_RELATIONS:
             _update_attr_stat(a_argmnt_stat[rel_key], RELNAME, subsegs, segs2trees1, \
-                                  segs2trees2, a_diff)
+                                  segs2trees2, n_empty, a_diff, edu_flags)
+
+def _update_segment_table(a_table, a_tokens, a_edus, a_strict = False):
+    """
+    Update table of segment boundaries assigned by multiple annotators.
+
+    @param a_table - counter of value tuples to be updated
+    @param a_tokens - token index of the message text (RSTTokenIndex)
+    @param a_edus - list of EDU lists from each annotation
+    @param a_strict - apply strict comparison metric
+
+    @return \c void
+    """
+    bndrs = [set(a_tokens.get_boundaries(edu.end[-1] for edu in edus)) for edus in a_edus]
+    all_bndrs = set().union(*bndrs)
+    for b in all_bndrs:
+        a_table[tuple(SEG if b in ibndr else NONSEG for ibndr in bndrs)] += 1
+    if not a_strict:
+        a_table[(NONSEG,) * len(bndrs)] += len(a_tokens) - len(all_bndrs)
+
+def _update_attr_table(a_table, a_attr, a_subsegs, a_segs2trees, a_n_empty = 0):
+    """
+    Update table of tree attributes assigned by multiple annotators.
+
+    @param a_table - counter of value tuples to be updated
+    @param a_attr - string representing tree attribute whose agreement should be checked
+    @param a_subsegs - sorted list of subsegments covered by at least one of the annotations
+    @param a_segs2trees - list of dictionaries mapping subsegments to RST
+                          trees of each annotation
+    @param a_n_empty - number of possible subsegments covered by no annotation
+
+    @return \c void
+    """
+    if a_n_empty:
+        a_table[(NONE,) * len(a_segs2trees)] += a_n_empty
+    for sseg in a_subsegs:
+        a_table[tuple(NONE if itree is None else getattr(itree, a_attr) \
+                          for itree in (isegs2trees.get(sseg) \
+                                            for isegs2trees in a_segs2trees))] += 1
+
+def _update_multi_stat(a_multi_stat, a_rsttrees, a_tokens, a_chck_flags, a_sgm_strict):
+    """
+    Update tables of values assigned by multiple annotators to RST trees.
+
+    @param a_multi_stat - dictionary with tables to be updated
+    @param a_rsttrees - list of RST tree lists from each annotation
+    @param a_tokens - token index of the message text (RSTTokenIndex or
+                      \c None if segments are not checked)
+    @param a_chck_flags - flags specifying which elements should be tested
+    @param a_sgm_strict - flag indicating whether segment agreement should
+                       apply strict metric
+
+    @return \c void
+    """
+    nuc_key, rel_key, edu_flags = _get_keys(a_chck_flags)
+    edus = [[edu for rsttree in rsttrees for edu in rsttree.get_edus(edu_flags)] \
+                for rsttrees in a_rsttrees]
+    if a_chck_flags & CHCK_SEGMENTS:
+        _update_segment_table(a_multi_stat[SEGMENTS], a_tokens, edus, a_sgm_strict)
+    if a_chck_flags & (CHCK_NUCLEARITY | CHCK_RELATIONS):
+        starts, ends = _get_offsets(chain(*edus))
+        segs2trees = [dict(_get_subtrees(rsttrees)) for rsttrees in a_rsttrees]
+        subsegs = _get_subsegs(starts, ends, segs2trees)
+        n_empty = _count_subsegs(starts, ends) - len(subsegs)
+        if a_chck_flags & CHCK_NUCLEARITY:
+            _update_attr_table(a_multi_stat[nuc_key], NUCLEUS, subsegs, segs2trees, n_empty)
+        if a_chck_flags & CHCK_RELATIONS:
+            _update_attr_table(a_multi_stat[rel_key], RELNAME, subsegs, segs2trees, n_empty)
+
+def _update_unit_stat(a_argmnt_stat, a_units, a_rsttrees1, a_rsttrees2, a_tokens, \
+                          a_chck_flags, a_diff, a_sgm_strict):
+    """
+    Measure agreement of two RST trees and keep statistics of the unit.
+
+    @param a_argmnt_stat - dictionary with agreement statistics to be updated
+    @param a_units - flag indicating whether confusion matrix of the unit
+                     (message or discussion) should be kept
+    @param a_rsttrees1 - RST trees from 1-st annotation
+    @param a_rsttrees2 - RST trees from 2-nd annotation
+    @param a_tokens - token index of the message text (RSTTokenIndex or
+                      \c None if segments are not checked)
+    @param a_chck_flags - flags specifying which elements should be tested
+    @param a_diff - flag specifying whether differences should be generated
+    @param a_sgm_strict - flag indicating whether segment agreement should
+                       apply strict metric
+
+    @return \c void
+    """
+    if not a_units:
+        _update_stat(a_argmnt_stat, a_rsttrees1, a_rsttrees2, a_tokens, \
+                         a_chck_flags, a_diff, a_sgm_strict)
+        return
+    unit_stat = defaultdict(KAPPA_GEN)
+    _update_stat(unit_stat, a_rsttrees1, a_rsttrees2, a_tokens, \
+                     a_chck_flags, a_diff, a_sgm_strict)
+    for elstat in unit_stat.itervalues():
+        elstat[UNITS_IDX].append(dict((k, dict(v)) \
+                                          for k, v in elstat[CONFUSION_IDX].iteritems()))
+    _merge_stat(a_argmnt_stat, unit_stat)
+
+def _load_forrest(a_corpus, a_src_fname, a_anno, a_segments_only):
+    """
+    Load RST forrest of annotation.
+
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+    @param a_src_fname - name of source file with original text
+    @param a_anno - name of annotation file or RST project (RSTProject)
+    @param a_segments_only - flag indicating that only segments are needed
+
+    @return RSTForrest
+    """
+    if isinstance(a_anno, RSTProject):
+        if a_segments_only:
+            return a_anno.segments
+        return a_anno.forrest
+    return a_corpus.get_forrest(a_src_fname, a_anno, a_segments_only)
 
 def update_stat(a_src_fname, a_anno1_fname, a_anno2_fname, a_chck_flags, a_diff = False, \
-                    a_sgm_strict = True, a_file_fmt = XML_FMT, a_verbose = True):
+                    a_sgm_strict = True, a_corpus = None, a_verbose = True, a_units = False, \
+                    a_report = None):
     """
     Measure agreement of two files.
 
     @param a_src_fname - name of source file with original text
-    @param a_anno1_fname - name of the 1-st file containing annotation
-    @param a_anno2_fname - name of the 2-nd file containing annotation
+    @param a_anno1_fname - name of the 1-st file containing annotation (or
+                         RSTProject of the 1-st annotator)
+    @param a_anno2_fname - name of the 2-nd file containing annotation (or
+                         RSTProject of the 2-nd annotator)
     @param a_chck_flags - flags specifying which elements should be tested
     @param a_diff - flag specifying whether differences should be generated
     @param a_sgm_strict - flag indicating whether segment agreement should
                          use strict metric
-    @param a_file_fmt - format of annotation file
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+    @param a_verbose - output statistics for file
+    @param a_units - flag indicating whether confusion matrices of single
+                     messages and discussions should be kept
+    @param a_report - report to which differences should be written
+                     (RSTDiffReport)
+
+    @return \c void
+
+    """
+    if a_corpus is None:
+        a_corpus = RSTCorpus()
+    agrmt_stat = compute_stat(a_src_fname, a_anno1_fname, a_anno2_fname, a_chck_flags, \
+                                  a_diff, a_sgm_strict, a_corpus, a_units)
+    if a_report is not None:
+        write_diffs(a_report, a_src_fname, a_anno1_fname, a_anno2_fname, agrmt_stat, a_corpus)
+    _report_stat(a_src_fname, agrmt_stat, a_verbose)
+
+def write_diffs(a_report, a_src_fname, a_anno1_fname, a_anno2_fname, a_agrmt_stat, \
+                    a_corpus = None):
+    """
+    Write differences recorded in statistics of a file to report.
+
+    Annotations are only re-read (or read from cache) if differing nodes
+    have to be rendered.
+
+    @param a_report - report to which differences should be written
+                     (RSTDiffReport)
+    @param a_src_fname - name of source file with original text
+    @param a_anno1_fname - name of the 1-st file containing annotation (or
+                         RSTProject of the 1-st annotator)
+    @param a_anno2_fname - name of the 2-nd file containing annotation (or
+                         RSTProject of the 2-nd annotator)
+    @param a_agrmt_stat - agreement statistics of the file
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+
+    @return \c void
+    """
+    diffs = [(elname, elstat[DIFF_IDX]) for elname, elstat in sorted(a_agrmt_stat.iteritems()) \
+                 if elstat[DIFF_IDX]]
+    if not diffs:
+        return
+    if a_corpus is None:
+        a_corpus = RSTCorpus()
+    if isinstance(a_anno1_fname, RSTProject):
+        messages = a_anno1_fname.messages
+    else:
+        messages, _ = a_corpus.get_messages(a_src_fname)
+    forrests = None
+    if any(elname != SEGMENTS for elname, _ in diffs):
+        forrests = (_load_forrest(a_corpus, a_src_fname, a_anno1_fname, False), \
+                        _load_forrest(a_corpus, a_src_fname, a_anno2_fname, False))
+    for elname, idiffs in diffs:
+        a_report.write(a_src_fname, elname, idiffs, messages, forrests)
+
+def _report_stat(a_src_fname, a_agrmt_stat, a_verbose, a_multi = False, \
+                     a_n_bootstrap = 0, a_confidence = DFLT_CONFIDENCE, a_rng = None):
+    """
+    Output statistics of a single file and add them to the total statistics.
+
+    @param a_src_fname - name of source file with original text
+    @param a_agrmt_stat - agreement statistics of the file
     @param a_verbose - output statistics for file
+    @param a_multi - flag indicating that statistics are tables of multiple
+                     annotators
+    @param a_n_bootstrap - number of bootstrap replicates used for computing
+                      confidence intervals of Kappa
+    @param a_confidence - confidence level of the intervals
+    @param a_rng - random number generator (numpy.random.RandomState)
 
     @return \c void
+    """
+    global KAPPA_STAT, MULTI_STAT
+
+    # print per file statistics, if necessary
+    header = None
+    if a_verbose:
+        header = "Statistics on file {:s}".format(a_src_fname)
+        if a_multi:
+            output_multi_stat(a_agrmt_stat, sys.stdout, header)
+        else:
+            output_stat(a_agrmt_stat, sys.stdout, header, a_n_bootstrap, a_confidence, a_rng)
+    # merge new statistics with an already computed one
+    if a_multi:
+        _merge_multi_stat(MULTI_STAT, a_agrmt_stat)
+    else:
+        _merge_stat(KAPPA_STAT, a_agrmt_stat)
 
+def compute_stat(a_src_fname, a_anno1_fname, a_anno2_fname, a_chck_flags, a_diff = False, \
+                     a_sgm_strict = True, a_corpus = None, a_units = False):
     """
-    global KAPPA_STAT
+    Compute agreement statistics of two files.
 
+    @param a_src_fname - name of source file with original text
+    @param a_anno1_fname - name of the 1-st file containing annotation (or
+                         RSTProject of the 1-st annotator)
+    @param a_anno2_fname - name of the 2-nd file containing annotation (or
+                         RSTProject of the 2-nd annotator)
+    @param a_chck_flags - flags specifying which elements should be tested
+    @param a_diff - flag specifying whether differences should be generated
+    @param a_sgm_strict - flag indicating whether segment agreement should
+                         use strict metric
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+    @param a_units - flag indicating whether confusion matrices of single
+                     messages and discussions should be kept
+
+    @return dictionary mapping checked elements to their confusion matrices,
+            lists of differences, and lists of confusion matrices of units
+
+    """
     # read messages
     agrmt_stat = defaultdict(KAPPA_GEN)
-    start_id = 0; msgid2discid = {}; messages = {}
     print >> sys.stderr, "Processing file: '{:s}'".format(a_src_fname)
-    srctree = ET.parse(a_src_fname).getroot()
-    for ithread in srctree.iter('thread'):
-        start_id = _get_messages(ithread, start_id, messages, msgid2discid)
+    if a_corpus is None:
+        a_corpus = RSTCorpus()
+    if isinstance(a_anno1_fname, RSTProject):
+        messages = a_anno1_fname.messages
+    else:
+        messages, _ = a_corpus.get_messages(a_src_fname)
+    # spans and relations are only read if they are going to be checked
+    segments_only = not a_chck_flags & ~CHCK_SEGMENTS
     # read first annotation file
-    rstForrest1 = RSTForrest(a_file_fmt, messages, msgid2discid)
-    rstForrest1.parse(a_anno1_fname)
-
+    rstForrest1 = _load_forrest(a_corpus, a_src_fname, a_anno1_fname, segments_only)
     # read second annotation file
-    rstForrest2 = RSTForrest(a_file_fmt, messages, msgid2discid)
-    rstForrest2.parse(a_anno2_fname)
+    rstForrest2 = _load_forrest(a_corpus, a_src_fname, a_anno2_fname, segments_only)
+    if a_chck_flags & CHCK_RELATIONS:
+        _check_relnames((rstForrest1, rstForrest2))
 
     # perform neccessary agreement tests on the level of single messages
     chck_flags = a_chck_flags & (CHCK_SEGMENTS | CHCK_MNUCLEARITY | CHCK_MRELATIONS)
@@ -410,20 +912,22 @@ def update_stat(a_src_fname, a_anno1_fname, a_anno2_fname, a_chck_flags, a_diff
         skip = False
         for msg_id, msg_txt in messages.iteritems():
             skip = False
-            if msg_id not in rstForrest1.msgid2iroots:
+            msg_code = MSG_IDS.get_code(msg_id)
+            if msg_code not in rstForrest1.msgid2iroots:
                 print >> sys.stderr, \
                     """WARNING: Message {:s} was not annotated by the 1-st annotator""".format(msg_id)
                 skip = True
-            if msg_id not in rstForrest2.msgid2iroots:
+            if msg_code not in rstForrest2.msgid2iroots:
                 print >> sys.stderr, \
                     """WARNING: Message {:s} was not annotated by the 2-nd annotator""".format(msg_id)
                 skip = True
             if skip:
                 continue
             # print >> sys.stderr, "msg_id =", msg_id
-            _update_stat(agrmt_stat, rstForrest1.msgid2iroots[msg_id], \
-                             rstForrest2.msgid2iroots[msg_id], \
-                             msg_txt, chck_flags, a_diff, a_sgm_strict)
+            _update_unit_stat(agrmt_stat, a_units, rstForrest1.msgid2iroots[msg_code], \
+                                  rstForrest2.msgid2iroots[msg_code], \
+                                  RSTTokenIndex(msg_txt), chck_flags, a_diff, \
+                                  a_sgm_strict)
 
     # perform neccessary agreement tests on the level of complete discussions
     chck_flags = a_chck_flags & (CHCK_DNUCLEARITY | CHCK_DRELATIONS)
@@ -438,13 +942,351 @@ def update_stat(a_src_fname, a_anno1_fname, a_anno2_fname, a_chck_flags, a_diff
         # perform neccessary agreement tests on the level of complete dicussions
         for _, (trees1, trees2) in msgid2dtree.iteritems():
             # only check nuclearity and relations for external trees
-            _update_stat(agrmt_stat, trees1, trees2, "", chck_flags, a_diff, None)
+            _update_unit_stat(agrmt_stat, a_units, trees1, trees2, None, chck_flags, \
+                                  a_diff, None)
             # sys.exit(66)
-    # print per file statistics, if necessary
-    if a_verbose:
-        output_stat(agrmt_stat, sys.stdout, "Statistics on file {:s}".format(a_src_fname))
-    # merge new statistics with an already computed one
-    _merge_stat(KAPPA_STAT, agrmt_stat)
+    return agrmt_stat
+
+def compute_multi_stat(a_src_fname, a_anno_fnames, a_chck_flags, a_sgm_strict = True, \
+                           a_corpus = None):
+    """
+    Compute tables of values assigned by multiple annotators to a file.
+
+    Every annotation is read only once.  Messages which were not annotated
+    by all annotators are skipped.
+
+    @param a_src_fname - name of source file with original text
+    @param a_anno_fnames - list of names of files containing annotation (or
+                         RSTProjects) of each annotator
+    @param a_chck_flags - flags specifying which elements should be tested
+    @param a_sgm_strict - flag indicating whether segment agreement should
+                         use strict metric
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+
+    @return dictionary mapping checked elements to counters of tuples of
+            values assigned to an item by each annotator
+    """
+    multi_stat = defaultdict(Counter)
+    print >> sys.stderr, "Processing file: '{:s}'".format(a_src_fname)
+    if a_corpus is None:
+        a_corpus = RSTCorpus()
+    if isinstance(a_anno_fnames[0], RSTProject):
+        messages = a_anno_fnames[0].messages
+    else:
+        messages, _ = a_corpus.get_messages(a_src_fname)
+    segments_only = not a_chck_flags & ~CHCK_SEGMENTS
+    forrests = [_load_forrest(a_corpus, a_src_fname, ianno, segments_only) \
+                    for ianno in a_anno_fnames]
+    if a_chck_flags & CHCK_RELATIONS:
+        _check_relnames(forrests)
+
+    # perform neccessary agreement tests on the level of single messages
+    chck_flags = a_chck_flags & (CHCK_SEGMENTS | CHCK_MNUCLEARITY | CHCK_MRELATIONS)
+    if chck_flags:
+        skip = False
+        for msg_id, msg_txt in messages.iteritems():
+            skip = False
+            msg_code = MSG_IDS.get_code(msg_id)
+            for i, iforrest in enumerate(forrests, 1):
+                if msg_code not in iforrest.msgid2iroots:
+                    print >> sys.stderr, \
+                        """WARNING: Message {:s} was not annotated by the {:s} annotator""".format( \
+                        msg_id, _ordinal(i))
+                    skip = True
+            if skip:
+                continue
+            _update_multi_stat(multi_stat, [iforrest.msgid2iroots[msg_code] \
+                                                for iforrest in forrests], \
+                                   RSTTokenIndex(msg_txt), chck_flags, a_sgm_strict)
+
+    # perform neccessary agreement tests on the level of complete discussions
+    chck_flags = a_chck_flags & (CHCK_DNUCLEARITY | CHCK_DRELATIONS)
+    if chck_flags:
+        msgid2dtree = defaultdict(lambda: [list() for _ in forrests])
+        for i, iforrest in enumerate(forrests):
+            for itree in iforrest.trees:
+                msgid2dtree[itree.msgid][i].append(itree)
+        for _, trees in msgid2dtree.iteritems():
+            _update_multi_stat(multi_stat, trees, None, chck_flags, None)
+    return multi_stat
+
+def _check_relnames(a_forrests):
+    """
+    Warn about relations which are not defined by the scheme.
+
+    @param a_forrests - RST forrests of each annotator
+
+    @return \c void
+    """
+    for i, iforrest in enumerate(a_forrests, 1):
+        if iforrest.unknown_relnames:
+            print >> sys.stderr, \
+                "WARNING: The {:s} annotator used relations not defined by the scheme: {:s}".format( \
+                _ordinal(i), ", ".join(sorted(iforrest.unknown_relnames)))
+
+def _get_projects(a_src_fname, a_anno_fnames, a_corpus):
+    """
+    Read project files of all annotators.
+
+    @param a_src_fname - name of source file with original text
+    @param a_anno_fnames - names of the project files of each annotator
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+
+    @return list of RST projects or \c None if projects can't be compared
+    """
+    prjs = [RSTProject(ianno_fname, a_corpus) for ianno_fname in a_anno_fnames]
+    if len(set(iprj.basedata_fname for iprj in prjs)) > 1:
+        print >> sys.stderr, \
+            "WARNING: Projects of file {:s} refer to different basedata".format(a_src_fname)
+        return None
+    if not all(os.path.isfile(iprj.anno_fname) and os.access(iprj.anno_fname, os.R_OK) \
+                   for iprj in prjs):
+        print >> sys.stderr, \
+            "WARNING: Annotation of file {:s} is missing in project".format(a_src_fname)
+        return None
+    return prjs
+
+def _init_worker(a_fmt, a_cache_dir, a_stream):
+    """
+    Initialize worker process.
+
+    @param a_fmt - format of annotation files
+    @param a_cache_dir - directory for caching parsed files (\c None if
+                         files should not be cached)
+    @param a_stream - flag indicating that annotation files should be parsed
+                         incrementally
+
+    @return \c void
+    """
+    global WORKER_CORPUS
+    cache = None
+    if a_cache_dir:
+        cache = RSTCache(a_cache_dir)
+    WORKER_CORPUS = RSTCorpus(a_fmt, cache, a_stream)
+
+def _measure_file(a_job, a_corpus):
+    """
+    Compute agreement statistics of a source file.
+
+    @param a_job - tuple of source file name, list of annotation file names,
+                   project flag, check flags, difference flag, segment metric
+                   flag, multiple annotator flag, and flag for keeping
+                   statistics of single units
+    @param a_corpus - loader of source and annotation files (RSTCorpus)
+
+    @return agreement statistics (\c None if file was skipped)
+    """
+    src_fname, anno_fnames, projects, chck_flags, diff, sgm_strict, multi, units = a_job
+    if projects:
+        anno_fnames = _get_projects(src_fname, anno_fnames, a_corpus)
+        if anno_fnames is None:
+            return None
+    if multi:
+        return compute_multi_stat(src_fname, anno_fnames, chck_flags, sgm_strict, a_corpus)
+    return compute_stat(src_fname, anno_fnames[0], anno_fnames[1], chck_flags, \
+                            diff, sgm_strict, a_corpus, units)
+
+def _get_job_fnames(a_job):
+    """
+    Obtain names of all files on which the statistics of a source file depend.
+
+    @param a_job - tuple of source file name, list of annotation file names,
+                   project flag, and further parameters of the job
+
+    @return list of file names
+    """
+    src_fname, anno_fnames, projects = a_job[:3]
+    ret = [src_fname] + list(anno_fnames)
+    if projects:
+        for ianno_fname in anno_fnames:
+            iprj = RSTProject(ianno_fname)
+            ret += [fname for fname in (iprj.basedata_fname, iprj.anno_fname) \
+                        if os.path.isfile(fname)]
+    return ret
+
+def _compute_stat_job(a_job):
+    """
+    Compute agreement statistics of a source file in worker process.
+
+    If the loader of the process has a persistent cache, statistics are
+    cached along with the messages printed while computing them, keyed by
+    the content of all files of the job and by its parameters.
+
+    @param a_job - tuple of source file name, list of annotation file names,
+                   project flag, check flags, difference flag, segment metric
+                   flag, multiple annotator flag, and flag for keeping
+                   statistics of single units
+
+    @return 2-tuple of error messages and statistics (\c None if file was
+            skipped)
+    """
+    cache = WORKER_CORPUS.cache
+    if cache is None:
+        return _run_job(a_job)
+    return cache.get_result("agreement", _get_job_fnames(a_job), lambda: _run_job(a_job), \
+                                repr((STAT_CACHE_VERSION, WORKER_CORPUS.fmt, a_job[0]) + \
+                                         tuple(a_job[2:])))
+
+def _run_job(a_job):
+    """
+    Compute agreement statistics of a source file collecting error messages.
+
+    Messages which would be printed to standard error are collected and
+    returned along with the statistics, so that the parent process can output
+    them in the same order as a serial run.  Statistics are converted to
+    plain dictionaries, which, unlike their defaultdicts, can be pickled.
+
+    @param a_job - tuple of source file name, list of annotation file names,
+                   project flag, check flags, difference flag, segment metric
+                   flag, multiple annotator flag, and flag for keeping
+                   statistics of single units
+
+    @return 2-tuple of error messages and statistics (\c None if file was
+            skipped)
+    """
+    orig_stderr = sys.stderr
+    sys.stderr = StringIO()
+    agrmt_stat = None
+    try:
+        agrmt_stat = _measure_file(a_job, WORKER_CORPUS)
+        if agrmt_stat is not None:
+            if a_job[6]:
+                agrmt_stat = dict(agrmt_stat)
+            else:
+                agrmt_stat = dict((k, [dict(v[CONFUSION_IDX]), v[DIFF_IDX], v[UNITS_IDX]]) \
+                                      for k, v in agrmt_stat.iteritems())
+        return (sys.stderr.getvalue(), agrmt_stat)
+    finally:
+        sys.stderr = orig_stderr
+
+def _get_jobs(a_args, a_anno_dirs, a_chck_flags, a_multi, a_units):
+    """
+    Find annotation files of source files.
+
+    @param a_args - parsed command line arguments
+    @param a_anno_dirs - directories with annotation files of each annotator
+    @param a_chck_flags - flags specifying which elements should be tested
+    @param a_multi - flag indicating that multiple annotators are compared
+    @param a_units - flag indicating whether confusion matrices of single
+                     messages and discussions should be kept
+
+    @return list of jobs (tuples of source file name, list of annotation
+            file names, and parameters of comparison)
+    """
+    # iterate over each source file in `source` directory and find
+    # corresponding annotation files
+    anno_fname = ""
+    anno_fnames = []
+    anno_sfx = PRJ_SFX if a_args.projects else a_args.anno_sfx
+    src_fname_base = ""
+    jobs = []
+    for src_fname in glob.iglob(os.path.join(a_args.src_dir, a_args.src_ptrn)):
+        if not os.path.isfile(src_fname) or not os.access(src_fname, os.R_OK):
+            continue
+        # check annotation files corresponding to the given source file
+        src_fname_base = os.path.splitext(os.path.basename(src_fname))[0]
+        anno_fnames = []
+        for ianno_dir in a_anno_dirs:
+            anno_fname = ""
+            ianno_fnames = glob.glob(os.path.join(ianno_dir, src_fname_base + anno_sfx))
+            if ianno_fnames:
+                anno_fname = ianno_fnames[0]
+            if not os.path.isfile(anno_fname) or not os.access(anno_fname, os.R_OK):
+                break
+            anno_fnames.append(anno_fname)
+        else:
+            jobs.append((src_fname, anno_fnames, a_args.projects, a_chck_flags, \
+                             a_args.output_difference and not a_multi, a_args.segment_strict, \
+                             a_multi, a_units))
+    return jobs
+
+def _run_jobs(a_jobs, a_args, a_multi, a_n_bootstrap, a_header = "", a_report = None):
+    """
+    Measure agreement for all source files and output total statistics.
+
+    @param a_jobs - list of jobs returned by `_get_jobs'
+    @param a_args - parsed command line arguments
+    @param a_multi - flag indicating that multiple annotators are compared
+    @param a_n_bootstrap - number of bootstrap replicates
+    @param a_header - optional header to print before total statistics
+    @param a_report - report to which differences should be written
+                     (RSTDiffReport)
+
+    @return \c void
+    """
+    # statistics of files are always merged in the order of the files, so
+    # that parallel runs produce the same output as serial ones
+    njobs = a_args.jobs if a_args.jobs > 0 else multiprocessing.cpu_count()
+    init_args = (FILE_FORMATS[a_args.file_format], a_args.cache_dir, a_args.stream)
+    # the loader of the main process is also used for rendering differences
+    _init_worker(*init_args)
+    if njobs > 1 and len(a_jobs) > 1:
+        pool = multiprocessing.Pool(min(njobs, len(a_jobs)), _init_worker, init_args)
+        try:
+            istats = pool.imap(_compute_stat_job, a_jobs)
+            for i, (ijob, (ilog, istat)) in enumerate(zip(a_jobs, istats)):
+                sys.stderr.write(ilog)
+                if istat is not None:
+                    _report_file(i, ijob, istat, a_args, a_multi, a_n_bootstrap, a_report)
+        finally:
+            pool.terminate()
+    else:
+        for i, ijob in enumerate(a_jobs):
+            if WORKER_CORPUS.cache is None:
+                istat = _measure_file(ijob, WORKER_CORPUS)
+            else:
+                ilog, istat = _compute_stat_job(ijob)
+                sys.stderr.write(ilog)
+            if istat is not None:
+                _report_file(i, ijob, istat, a_args, a_multi, a_n_bootstrap, a_report)
+    if a_multi:
+        output_multi_stat(MULTI_STAT, sys.stderr, a_header)
+    else:
+        output_stat(KAPPA_STAT, sys.stderr, a_header, a_n_bootstrap, a_args.confidence, \
+                        _get_rng(a_args.seed, 0) if a_n_bootstrap else None)
+
+def _report_file(a_idx, a_job, a_agrmt_stat, a_args, a_multi, a_n_bootstrap, a_report):
+    """
+    Output differences and statistics of a single file.
+
+    @param a_idx - index of the job
+    @param a_job - job of the file returned by `_get_jobs'
+    @param a_agrmt_stat - agreement statistics of the file
+    @param a_args - parsed command line arguments
+    @param a_multi - flag indicating that multiple annotators are compared
+    @param a_n_bootstrap - number of bootstrap replicates
+    @param a_report - report to which differences should be written
+                     (RSTDiffReport)
+
+    @return \c void
+    """
+    src_fname, anno_fnames, projects = a_job[:3]
+    rng = None
+    if a_n_bootstrap and a_args.verbose:
+        rng = _get_rng(a_args.seed, a_idx + 1)
+    if a_report is not None and not a_multi:
+        if projects:
+            anno_fnames = _get_projects(src_fname, anno_fnames, WORKER_CORPUS)
+        write_diffs(a_report, src_fname, anno_fnames[0], anno_fnames[1], a_agrmt_stat, \
+                        WORKER_CORPUS)
+    _report_stat(src_fname, a_agrmt_stat, a_args.verbose, a_multi, \
+                     a_n_bootstrap, a_args.confidence, rng)
+
+def _get_signature(a_jobs):
+    """
+    Obtain modification times and sizes of all files of jobs.
+
+    @param a_jobs - list of jobs returned by `_get_jobs'
+
+    @return list of tuples with file names, modification times, and sizes
+    """
+    ret = []
+    istat = None
+    for ijob in a_jobs:
+        for fname in _get_job_fnames(ijob):
+            istat = os.stat(fname)
+            ret.append((fname, istat.st_mtime, istat.st_size))
+    return ret
 
 def main(argv):
     """
@@ -461,12 +1303,36 @@ on RST.""")
     # optional arguments
     argparser.add_argument("--anno-sfx", help = "extension of annotation files", type = str,
                          default = "")
-    argparser.add_argument("-d", "--output-difference", help = """output difference""",
-                         action = "store_true")
+    argparser.add_argument("-b", "--bootstrap", help = """number of bootstrap
+replicates used for computing confidence intervals of Kappa (requires NumPy)""",
+                           type = int, default = 0)
+    argparser.add_argument("--cache-dir", help = """directory for caching parsed
+files between runs""", type = str)
+    argparser.add_argument("--confidence", help = """confidence level of bootstrap
+intervals""", type = float, default = DFLT_CONFIDENCE)
+    argparser.add_argument("-d", "--output-difference", help = """output differences
+between annotations""", action = "store_true")
+    argparser.add_argument("--diff-file", help = """file to which differences should be
+written (standard output by default)""", type = str)
+    argparser.add_argument("--diff-format", help = "format of differences", type = str,
+                           choices = DIFF_FORMATS, default = DIFF_TSV)
     argparser.add_argument("--file-format", help = "format of annotation file", type = str,
-                         default = XML_FMT)
+                         choices = FILE_FORMATS.keys(), default = "xml")
+    argparser.add_argument("-m", "--multi-annotator", help = """compute Fleiss' Kappa,
+Krippendorff's Alpha, and pairwise Kappa of all annotators at once (implied if more than
+two annotation directories are given)""", action = "store_true")
+    argparser.add_argument("-j", "--jobs", help = """number of worker processes
+measuring agreement of different files in parallel (0 means one per CPU)""",
+                           type = int, default = 1)
+    argparser.add_argument("--projects", help = """find annotation and basedata files
+via project files (*{:s}) in annotators' directories""".format(PRJ_SFX),
+                           action = "store_true")
+    argparser.add_argument("--seed", help = "seed of random number generator used for bootstrapping",
+                           type = int)
     argparser.add_argument("--segment-strict", help = """use strict metric
 for evaluating segment agreement""", action = "store_true")
+    argparser.add_argument("--stream", help = """parse annotation files
+incrementally without loading them into memory""", action = "store_true")
     argparser.add_argument("--src-ptrn", help = "shell pattern of source files", type = str,
                          default = "*")
     argparser.add_argument("--type", help = """type of element (relation) for which
@@ -475,11 +1341,35 @@ to measure the agreement""", choices = [SEGMENTS, MNUCLEARITY, DNUCLEARITY, MREL
                            type = str, action = "append")
     argparser.add_argument("-v", "--verbose", help = "output agreement statistics for each file", \
                                action = "store_true")
+    argparser.add_argument("-w", "--watch", help = """check files every SECONDS seconds
+and output new statistics whenever they change (requires --cache-dir)""", type = float,
+                           metavar = "SECONDS")
     # mandatory arguments
     argparser.add_argument("src_dir", help = "directory with source files used for annotation")
     argparser.add_argument("anno1_dir", help = "directory with annotation files of first annotator")
     argparser.add_argument("anno2_dir", help = "directory with annotation files of second annotator")
+    argparser.add_argument("anno_dirs", help = "directories with annotation files of further annotators",
+                           nargs = "*")
     args = argparser.parse_args(argv)
+    anno_dirs = [args.anno1_dir, args.anno2_dir] + args.anno_dirs
+    multi = args.multi_annotator or len(anno_dirs) > 2
+    if multi and args.output_difference:
+        print >> sys.stderr, \
+            "WARNING: Differences are not generated for multiple annotators"
+    if args.bootstrap:
+        if np is None:
+            argparser.error("bootstrapping requires NumPy")
+        if not 0. < args.confidence < 1.:
+            argparser.error("confidence level should be in range (0, 1)")
+        if multi:
+            print >> sys.stderr, \
+                "WARNING: Confidence intervals are not computed for multiple annotators"
+    n_bootstrap = 0 if multi else max(args.bootstrap, 0)
+    if args.watch is not None:
+        if args.watch <= 0.:
+            argparser.error("watch interval should be positive")
+        if not args.cache_dir:
+            argparser.error("watch mode requires --cache-dir")
     # set parameters
     chck_flags = 0
     if args.type:
@@ -500,37 +1390,38 @@ to measure the agreement""", choices = [SEGMENTS, MNUCLEARITY, DNUCLEARITY, MREL
     else:
         chck_flags |= CHCK_ALL
 
-    # iterate over each source file in `source` directory and find
-    # corresponding annotation files
-    anno1_fname = ""
-    anno2_fname = ""
-    src_fname_base = ""
-
-    for src_fname in glob.iglob(os.path.join(args.src_dir, args.src_ptrn)):
-        if not os.path.isfile(src_fname) or not os.access(src_fname, os.R_OK):
-            continue
-        # check annotation files corresponding to the given source file
-        src_fname_base = os.path.splitext(os.path.basename(src_fname))[0]
-        anno1_fname = ""
-        anno1_fnames = glob.glob(os.path.join(args.anno1_dir, \
-                                                  src_fname_base + args.anno_sfx))
-        if anno1_fnames:
-            anno1_fname = anno1_fnames[0]
-        if not os.path.isfile(anno1_fname) or not os.access(anno1_fname, os.R_OK):
-            continue
-
-        anno2_fname = ""
-        anno2_fnames = glob.glob(os.path.join(args.anno2_dir, \
-                                                  src_fname_base + args.anno_sfx))
-        if anno2_fnames:
-            anno2_fname = anno2_fnames[0]
-        if not os.path.isfile(anno2_fname) or not os.access(anno2_fname, os.R_OK):
-            continue
-
-        # measure agreement for the given annotation files
-        update_stat(src_fname, anno1_fname, anno2_fname, chck_flags, args.output_difference, \
-                        args.segment_strict, args.file_format, args.verbose)
-    output_stat()
+    # differences are written to the report as soon as a file is compared
+    report = None
+    diff_file = None
+    if args.output_difference and not multi:
+        if args.diff_file:
+            diff_file = open(args.diff_file, "w")
+        report = RSTDiffReport(diff_file or sys.stdout, args.diff_format)
+    try:
+        if args.watch is None:
+            _run_jobs(_get_jobs(args, anno_dirs, chck_flags, multi, bool(n_bootstrap)), \
+                          args, multi, n_bootstrap, "", report)
+            return 0
+        # re-measure agreement whenever files change (statistics of unchanged
+        # files are read from the cache)
+        jobs = signature = prev_signature = None
+        try:
+            while True:
+                jobs = _get_jobs(args, anno_dirs, chck_flags, multi, bool(n_bootstrap))
+                signature = _get_signature(jobs)
+                if signature != prev_signature:
+                    KAPPA_STAT.clear()
+                    MULTI_STAT.clear()
+                    _run_jobs(jobs, args, multi, n_bootstrap, \
+                                  "Statistics at {:s}".format(time.strftime("%Y-%m-%d %H:%M:%S")), \
+                                  report)
+                    prev_signature = signature
+                time.sleep(args.watch)
+        except KeyboardInterrupt:
+            pass
+    finally:
+        if diff_file is not None:
+            diff_file.close()
     return 0
 
 ##################################################################
@@ -23,11 +23,47 @@ TREE_EXTERNAL - flag indicating that only external tree nodes
 TREE_ALL - flag indicating that both internal and external tree
           nodes should be processed
 NUC_RELS - set of relations that can go out from a nucleus node
+PRJ_SFX - suffix of RST project files
+NO_ID - code of missing node and message identifiers
+NODE_IDS - mapping between node ids and their integer codes
+MSG_IDS - mapping between message ids and their integer codes
+NO_REL - code of missing relations
+RELATIONS - relation vocabulary compiled from the schemes of the corpus
+DIFF_JSONL - name of JSON-lines format of disagreement reports
+DIFF_TSV - name of tab-separated format of disagreement reports
+DIFF_FORMATS - names of all formats of disagreement reports
+SPAN - name of Parseval metric on unlabeled spans
+NUCLEARITY - name of Parseval metric on spans labeled with nuclearity
+RELATION - name of Parseval metric on spans labeled with relations
+FULL - name of Parseval metric on spans labeled with nuclearity and relations
+METRICS - names of all Parseval metrics
 
 Classes:
+RSTCache - persistent on-disk cache of parsed basedata and RST forrests
+RSTCorpus - loader of basedata files and RST annotations
+RSTDiffReport - streaming writer of disagreements between annotations
 RSTForrest - class for dealing with collections of RST trees
+RSTForrestArrays - columnar (NumPy) representation of an RST forrest
+RSTIdMap - bidirectional mapping between string identifiers and integer codes
+RSTNodeIndex - attribute index of the nodes of an RST forrest
+RSTParseval - accumulator of Parseval scores of predicted forrests
+RSTProject - lazy loader of components referenced by `.rstprj.xml' files
+RSTQuery - compiled tgrep-like structural query over RST forrests
+RSTRelIndex - inverted index from relation names to their instances
+RSTRelVocab - mapping between relation names, integer codes, and types
+RSTTokenIndex - mapping between character offsets and tokens of a text
 RSTTree - class for dealing with a single RST tree (which can also
           be just a single node)
+LSPWriter - streaming writer of s-expressions
+PC3Writer - streaming writer of RSTTool (rs3) SGML documents
+XMLWriter - streaming writer of XML documents readable by RSTForrest
+
+Functions:
+read_basedata - read messages from basedata file
+read_relscheme - read relation names and their types from scheme file
+get_writer - return streaming writer for the given output format
+get_segment_diff - return record of differing segment boundaries
+get_attr_diff - return record of differing attributes of two nodes
 
 Exceptions:
 RSTException - abstract exception used as parent for all RST-related exceptions
@@ -44,20 +80,42 @@ RSTBadStructure - raised when data structure to be read appears to be broken
 ##################################################################
 # Imports
 from constants import ENCODING, LIST_SEP, FIELD_SEP, VALUE_SEP, \
-    LSP_FMT, XML_FMT, PC3_FMT, TERMINAL, NONTERMINAL, TREE_INTERNAL, \
+    LSP_FMT, XML_FMT, PC3_FMT, TSV_FMT, TERMINAL, NONTERMINAL, TREE_INTERNAL, \
     TREE_EXTERNAL, TREE_ALL, NUC_RELS
 
 from exceptions import RSTException, RSTBadFormat, RSTBadLogic, RSTBadStructure
 
 from rstforrest import RSTForrest
+from forrestarrays import RSTForrestArrays
+from idmap import RSTIdMap, NO_ID, NODE_IDS, MSG_IDS
+from parseval import RSTParseval, SPAN, NUCLEARITY, RELATION, FULL, METRICS
+from cache import RSTCache
+from corpus import RSTCorpus, read_basedata
+from diffreport import RSTDiffReport, DIFF_JSONL, DIFF_TSV, DIFF_FORMATS, \
+    get_segment_diff, get_attr_diff
+from project import RSTProject, PRJ_SFX
+from query import RSTNodeIndex, RSTQuery
+from relindex import RSTRelIndex
+from relscheme import read_relscheme
+from relvocab import RSTRelVocab, RELATIONS, NO_REL
 from rsttree import RSTTree
+from tokenindex import RSTTokenIndex
+from writers import LSPWriter, PC3Writer, XMLWriter, get_writer
 
 ##################################################################
 # Intialization
 __all__ = ["ENCODING", "LIST_SEP", "FIELD_SEP", "VALUE_SEP", \
-               "TSV_FMT", "LSP_FMT", "PC3_FMT", \
+               "TSV_FMT", "LSP_FMT", "PC3_FMT", "XML_FMT", \
                "TREE_INTERNAL", "TREE_EXTERNAL", "TREE_ALL", "NUC_RELS", \
-               "RSTForrest", "RSTTree", \
+               "PRJ_SFX", "NO_ID", "NODE_IDS", "MSG_IDS", \
+               "NO_REL", "RELATIONS", "DIFF_JSONL", "DIFF_TSV", "DIFF_FORMATS", \
+               "SPAN", "NUCLEARITY", "RELATION", "FULL", "METRICS", \
+               "RSTCache", "RSTCorpus", "RSTDiffReport", "RSTForrest", \
+               "RSTForrestArrays", "RSTIdMap", "RSTNodeIndex", "RSTParseval", \
+               "RSTProject", "RSTQuery", "RSTRelIndex", "RSTRelVocab", \
+               "RSTTokenIndex", "RSTTree", "LSPWriter", "PC3Writer", "XMLWriter", \
+               "read_basedata", "read_relscheme", "get_writer", \
+               "get_segment_diff", "get_attr_diff", \
                "RSTException", "RSTBadFormat", "RSTBadStructure"]
 __author__ = "Wladimir Sidorenko (Uladzimir Sidarenka)"
 __email__ = "sidarenk at uni dash potsdam dot de"
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+"""
+Module providing persistent cache of parsed RST data and of results computed
+from it.
+
+Constants:
+CACHE_VERSION - version of the cache format (entries of other versions are
+                ignored)
+
+Class:
+RSTCache - on-disk cache of parsed basedata, RST forrests, and results
+           computed from them
+
+"""
+
+##################################################################
+# Imports
+from rstforrest import RSTForrest
+
+import cPickle
+import hashlib
+import os
+import tempfile
+
+##################################################################
+# Constants
+CACHE_VERSION = 6
+BLOCK_SIZE = 1 << 20
+
+
+##################################################################
+# Class
+class RSTCache(object):
+    """
+    Persistent on-disk cache of parsed basedata and RST forrests.
+
+    Cache entries are keyed by the hash of the content of all files from which
+    they were created, so that modified files are re-read automatically.
+
+    Instance Variables:
+    cache_dir - directory in which cache entries are stored
+
+    Methods:
+    get_messages - return messages read from a basedata file
+    get_forrest - return forrest parsed from an annotation file
+    get_result - return picklable result computed from files
+
+    """
+
+    def __init__(self, a_cache_dir):
+        """
+        Class constructor.
+
+        @param a_cache_dir - directory in which to store cache entries
+        """
+        self.cache_dir = a_cache_dir
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # mapping from file name and modification time to content hash
+        self._fname2hash = {}
+
+    def get_messages(self, a_fname, a_read_func):
+        """
+        Return messages read from a basedata file.
+
+        @param a_fname - name of the basedata file
+        @param a_read_func - function which reads the basedata file and
+                       returns a 2-tuple of dictionaries mapping message id
+                       to text and to its number in discussion
+
+        @return 2-tuple of dictionaries returned by `a_read_func`
+        """
+        return self.get_result("messages", (a_fname,),
+                               lambda: a_read_func(a_fname))
+
+    def get_forrest(self, a_fmt, a_fname, a_msgid2txt, a_msgid2discid=None,
+                    a_src_fname=None, a_stream=False, a_segments_only=False):
+        """
+        Return forrest parsed from an annotation file.
+
+        @param a_fmt - format of the annotation file
+        @param a_fname - name of the annotation file
+        @param a_msgid2txt - dictionary mapping message id to its text
+        @param a_msgid2discid - dictionary mapping message id to its current
+                        number in discussions
+        @param a_src_fname - name of the basedata file from which
+                        `a_msgid2txt` and `a_msgid2discid` were obtained
+        @param a_stream - parse annotation file incrementally
+        @param a_segments_only - only read segments of annotation file
+
+        @return RSTForrest
+        """
+        ret = RSTForrest(a_fmt, a_msgid2txt, a_msgid2discid, a_stream,
+                         a_segments_only)
+        fnames = (a_fname,) if a_src_fname is None else (a_fname, a_src_fname)
+        key = self._get_key("segments" if a_segments_only else "forrest",
+                            fnames, str(a_fmt))
+        ifile = self._open(key)
+        if ifile is None:
+            ret.parse(a_fname)
+            self._store(key, ret.save)
+        else:
+            with ifile:
+                ret.load(ifile)
+        return ret
+
+    def get_result(self, a_prefix, a_fnames, a_compute_func, a_extra=""):
+        """
+        Return picklable result computed from files.
+
+        @param a_prefix - prefix of the cache key (kind of the result)
+        @param a_fnames - names of all files on which the result depends
+        @param a_compute_func - function without arguments which computes the
+                        result if it is not cached
+        @param a_extra - string describing all other parameters on which the
+                        result depends
+
+        @return result of `a_compute_func`
+        """
+        key = self._get_key(a_prefix, a_fnames, a_extra)
+        ifile = self._open(key)
+        if ifile is None:
+            ret = a_compute_func()
+            self._store(key, lambda ostream: cPickle.dump(
+                ret, ostream, cPickle.HIGHEST_PROTOCOL))
+        else:
+            with ifile:
+                ret = cPickle.load(ifile)
+        return ret
+
+    def _get_key(self, a_prefix, a_fnames, a_extra=""):
+        """
+        Compute cache key for the given files.
+
+        @param a_prefix - prefix of the key
+        @param a_fnames - names of files whose content should be hashed
+        @param a_extra - additional string which should be hashed
+
+        @return string key
+        """
+        ihash = hashlib.sha1(str(CACHE_VERSION) + a_extra)
+        for fname in a_fnames:
+            ihash.update(self._hash_file(fname))
+        return a_prefix + '.' + ihash.hexdigest()
+
+    def _hash_file(self, a_fname):
+        """
+        Compute hash of file's content.
+
+        @param a_fname - name of the file
+
+        @return hex digest of the file content
+        """
+        stat = os.stat(a_fname)
+        fkey = (os.path.abspath(a_fname), stat.st_mtime, stat.st_size)
+        if fkey not in self._fname2hash:
+            ihash = hashlib.sha1()
+            with open(a_fname, "rb") as ifile:
+                block = ifile.read(BLOCK_SIZE)
+                while block:
+                    ihash.update(block)
+                    block = ifile.read(BLOCK_SIZE)
+            self._fname2hash[fkey] = ihash.hexdigest()
+        return self._fname2hash[fkey]
+
+    def _open(self, a_key):
+        """
+        Open cache entry for reading.
+
+        @param a_key - key of the cache entry
+
+        @return binary input stream or \c None if no entry was found
+        """
+        fname = os.path.join(self.cache_dir, a_key)
+        if not os.path.isfile(fname):
+            return None
+        return open(fname, "rb")
+
+    def _store(self, a_key, a_store_func):
+        """
+        Store cache entry.
+
+        The entry is first written to a temporary file which is then renamed,
+        so that concurrent processes never see incomplete entries.
+
+        @param a_key - key of the cache entry
+        @param a_store_func - function which writes the entry to binary stream
+
+        @return \c void
+        """
+        fd, tmp_fname = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as ofile:
+            a_store_func(ofile)
+        os.rename(tmp_fname, os.path.join(self.cache_dir, a_key))
@@ -6,10 +6,11 @@ LIST_SEP = ','
 FIELD_SEP = '\t'
 VALUE_SEP = '\034'
 
-# output formats
+# input and output formats
 XML_FMT = 1
 LSP_FMT = 2
 PC3_FMT = 4
+TSV_FMT = 8
 
 # flags indicating internal or external children of trees should be returned
 TREE_INTERNAL = 1
@@ -19,6 +20,9 @@ TREE_ALL = 3
 TERMINAL = "text"
 NONTERMINAL = "span"
 
+# prefix of relations between messages
+EXT_REL_PRFX = "r-"
+
 # relations that can go out from a nucleus node
 NUC_RELS = set(["List", "Joint", "Sequence", "Contrast", "Same", "Comparison", \
                    "OTHER-multinuc", "span"])
@@ -31,3 +35,6 @@ _CHILDREN = "children"
 _PARENT = "parent"
 _RELNAME = "relname"
 _TEXT = "text"
+_TYPE = "type"
+# type of multinuclear span nodes in TSV format
+_MULTINUC = "multinuc"
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""
+Module providing class for loading RST corpora.
+
+Constants:
+DFLT_MAX_SOURCES - default number of basedata files kept in memory
+
+Class:
+RSTCorpus - loader of basedata files and RST annotations
+
+Functions:
+read_basedata - read messages from basedata file
+
+"""
+
+##################################################################
+# Imports
+from constants import XML_FMT
+from rstforrest import RSTForrest
+
+from collections import OrderedDict
+import os
+import xml.etree.ElementTree as ET
+
+##################################################################
+# Constants
+DFLT_MAX_SOURCES = 16
+
+
+##################################################################
+# Methods
+def read_basedata(a_fname):
+    """
+    Read messages from basedata file.
+
+    Messages are numbered in the order of their appearance in the file, i.e.,
+    answers always get higher numbers than the messages they reply to.
+
+    @param a_fname - name of basedata file
+
+    @return 2-tuple of dictionaries mapping message id to its text and to
+            its serial number in discussion
+    """
+    msgid2txt = {}
+    msgid2discid = {}
+    msgid = None
+    itext = None
+    discid = 0
+    srctree = ET.parse(a_fname).getroot()
+    for ithread in srctree.iter("thread"):
+        for imsg in ithread.iter("msg"):
+            msgid = imsg.get("id")
+            itext = imsg.find("text").text or u""
+            msgid2txt[msgid] = unicode(itext).strip()
+            msgid2discid[msgid] = discid
+            discid += 1
+    return (msgid2txt, msgid2discid)
+
+
+##################################################################
+# Class
+class RSTCorpus(object):
+    """
+    Class for loading basedata files and RST annotations.
+
+    Messages of the most recently used basedata files are kept in memory,
+    so that all forrests created for annotations of a file share the same
+    message dictionaries.  Files are read again when they change on disk or
+    after they have been evicted by `max_sources' more recent files.
+
+    Instance Variables:
+    cache - persistent cache of parsed files (RSTCache or None)
+    fmt - format of annotation files
+    max_sources - maximum number of basedata files kept in memory
+    stream - flag indicating whether annotation files should be parsed
+             incrementally
+
+    Methods:
+    get_messages - return messages of basedata file
+    get_forrest - return RST forrest for an annotation of basedata file
+
+    """
+
+    def __init__(self, a_fmt=XML_FMT, a_cache=None, a_stream=False,
+                 a_max_sources=DFLT_MAX_SOURCES):
+        """
+        Class constructor.
+
+        @param a_fmt - format of annotation files
+        @param a_cache - persistent cache of parsed files
+        @param a_stream - parse annotation files incrementally
+        @param a_max_sources - maximum number of basedata files kept in memory
+        """
+        self.fmt = a_fmt
+        self.cache = a_cache
+        self.stream = a_stream
+        self.max_sources = a_max_sources
+        # mapping from basedata file name to the modification time, size, and
+        # messages of the file (ordered from least to most recently used)
+        self._src2msgs = OrderedDict()
+
+    def get_messages(self, a_src_fname):
+        """
+        Return messages of basedata file.
+
+        @param a_src_fname - name of basedata file
+
+        @return 2-tuple of dictionaries mapping message id to its text and to
+                its serial number in discussion
+        """
+        src_fname = os.path.abspath(a_src_fname)
+        stat = os.stat(src_fname)
+        fkey = (stat.st_mtime, stat.st_size)
+        entry = self._src2msgs.pop(src_fname, None)
+        if entry is None or entry[0] != fkey:
+            if self.cache is None:
+                entry = (fkey, read_basedata(src_fname))
+            else:
+                entry = (fkey, self.cache.get_messages(src_fname,
+                                                       read_basedata))
+        # re-inserted entries become the most recently used ones
+        self._src2msgs[src_fname] = entry
+        while len(self._src2msgs) > self.max_sources:
+            self._src2msgs.popitem(last=False)
+        return entry[1]
+
+    def get_forrest(self, a_src_fname, a_anno_fname, a_segments_only=False,
+                    a_fmt=None):
+        """
+        Return RST forrest for an annotation of basedata file.
+
+        @param a_src_fname - name of basedata file
+        @param a_anno_fname - name of annotation file
+        @param a_segments_only - only read segments of annotation file
+        @param a_fmt - format of annotation file (defaults to corpus format)
+
+        @return RSTForrest
+        """
+        fmt = self.fmt if a_fmt is None else a_fmt
+        msgid2txt, msgid2discid = self.get_messages(a_src_fname)
+        if self.cache is None:
+            ret = RSTForrest(fmt, msgid2txt, msgid2discid, self.stream,
+                             a_segments_only)
+            ret.parse(a_anno_fname)
+        else:
+            ret = self.cache.get_forrest(fmt, a_anno_fname, msgid2txt,
+                                         msgid2discid, a_src_fname,
+                                         self.stream, a_segments_only)
+        return ret
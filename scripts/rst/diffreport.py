@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+
+"""
+Module providing streaming reports of disagreements between annotations.
+
+Disagreements are recorded during comparison as compact tuples which only
+refer to messages and nodes by their ids, so that they can be pickled,
+cached, and collected for large corpora.  They are rendered only when they
+are written to the report, one line per disagreement.
+
+Constants:
+SEGMENT_DIFF - type of records of differing segment boundaries
+ATTR_DIFF - type of records of differing attributes of nodes
+DIFF_JSONL - name of JSON-lines report format
+DIFF_TSV - name of tab-separated report format
+DIFF_FORMATS - names of all report formats
+DIFF_FIELDS - names of the fields of report lines
+
+Class:
+RSTDiffReport - streaming writer of disagreement reports
+
+Functions:
+get_segment_diff - return record of differing segment boundaries
+get_attr_diff - return record of differing attributes of two nodes
+
+"""
+
+##################################################################
+# Imports
+from constants import ENCODING, FIELD_SEP, TREE_INTERNAL
+
+from collections import OrderedDict
+
+import json
+
+##################################################################
+# Constants
+SEGMENT_DIFF = 0
+ATTR_DIFF = 1
+DIFF_JSONL = "jsonl"
+DIFF_TSV = "tsv"
+DIFF_FORMATS = (DIFF_JSONL, DIFF_TSV)
+DIFF_FIELDS = ("file", "element", "msgid", "attr", "id1", "id2", "value1",
+               "value2", "diff1", "diff2")
+BNDR_TAG1 = u"<1>"
+BNDR_TAG2 = u"<2>"
+BNDR_TAG = u"<>"
+TSV_ESCAPES = ((u'\\', u"\\\\"), (u'\t', u"\\t"), (u'\n', u"\\n"))
+
+
+##################################################################
+# Methods
+def get_segment_diff(a_msgid, a_bndr1, a_bndr2):
+    """
+    Return record of differing segment boundaries.
+
+    @param a_msgid - id of the message
+    @param a_bndr1 - set of boundary offsets from the 1-st annotation
+    @param a_bndr2 - set of boundary offsets from the 2-nd annotation
+
+    @return tuple or \c None if boundaries do not differ
+    """
+    if a_bndr1 == a_bndr2:
+        return None
+    return (SEGMENT_DIFF, a_msgid, tuple(sorted(a_bndr1 - a_bndr2)),
+            tuple(sorted(a_bndr2 - a_bndr1)), tuple(sorted(a_bndr1 & a_bndr2)))
+
+
+def get_attr_diff(a_attr, a_tree1, a_tree2, a_flag=TREE_INTERNAL):
+    """
+    Return record of differing attributes of two nodes.
+
+    @param a_attr - name of the attribute
+    @param a_tree1 - node from the 1-st annotation
+    @param a_tree2 - node from the 2-nd annotation
+    @param a_flag - flag indicating which descendants (internal or external,
+                    or both) should be rendered for the nodes
+
+    @return tuple
+    """
+    return (ATTR_DIFF, a_tree1.msgid, a_attr, a_flag, a_tree1.id, a_tree2.id,
+            getattr(a_tree1, a_attr), getattr(a_tree2, a_attr))
+
+
+##################################################################
+# Class
+class RSTDiffReport(object):
+    """
+    Streaming writer of disagreement reports.
+
+    Every disagreement is written as a single line, either as a JSON object
+    or as tab-separated fields (in the order of DIFF_FIELDS, preceded by a
+    header line).  Differing segment boundaries are rendered as the text of
+    the message in which boundaries of only the 1-st or only the 2-nd
+    annotator are marked with `<1>' and `<2>', and common boundaries with
+    `<>'.  Nodes with differing attributes are rendered in their minimal
+    representation.
+
+    Methods:
+    write - output disagreements of a file
+
+    """
+
+    def __init__(self, a_ostream, a_fmt=DIFF_TSV, a_encoding=ENCODING):
+        """
+        Class constructor.
+
+        @param a_ostream - output stream
+        @param a_fmt - report format (DIFF_JSONL or DIFF_TSV)
+        @param a_encoding - encoding of the output stream (\c None for
+                            streams which accept unicode strings)
+        """
+        if a_fmt not in DIFF_FORMATS:
+            raise NotImplementedError(
+                "Unknown report format {:s}".format(repr(a_fmt)))
+        self._ostream = a_ostream
+        self._fmt = a_fmt
+        self._encoding = a_encoding
+        if self._fmt == DIFF_TSV:
+            self._write(u'#' + FIELD_SEP.join(DIFF_FIELDS) + u'\n')
+
+    def write(self, a_fname, a_elname, a_diffs, a_messages=None,
+              a_forrests=None):
+        """
+        Output disagreements of a file.
+
+        @param a_fname - name of the compared file
+        @param a_elname - name of the compared element
+        @param a_diffs - list of records of disagreements
+        @param a_messages - dictionary mapping message ids to their texts
+                            (needed for segment records)
+        @param a_forrests - 2-tuple of RST forrests of both annotations
+                            (needed for attribute records)
+
+        @return \c void
+        """
+        fields = None
+        for idiff in a_diffs:
+            if idiff[0] == SEGMENT_DIFF:
+                fields = self._render_segment_diff(a_messages, *idiff[1:])
+            else:
+                fields = self._render_attr_diff(a_forrests, *idiff[1:])
+            fields["file"] = a_fname
+            fields["element"] = a_elname
+            self._write_fields(fields)
+
+    def _render_segment_diff(self, a_messages, a_msgid, a_bndr1, a_bndr2,
+                             a_common):
+        """
+        Render record of differing segment boundaries.
+
+        @param a_messages - dictionary mapping message ids to their texts
+        @param a_msgid - id of the message
+        @param a_bndr1 - boundaries only set by the 1-st annotator
+        @param a_bndr2 - boundaries only set by the 2-nd annotator
+        @param a_common - boundaries set by both annotators
+
+        @return dictionary of report fields
+        """
+        txt = a_messages[a_msgid]
+        if isinstance(txt, str):
+            txt = txt.decode(ENCODING)
+        boundaries = [(b, BNDR_TAG1) for b in a_bndr1]
+        boundaries += [(b, BNDR_TAG2) for b in a_bndr2]
+        boundaries += [(b, BNDR_TAG) for b in a_common]
+        boundaries.sort()
+        ret = []
+        prev_b = 0
+        for b, tag in boundaries:
+            ret.append(txt[prev_b:b])
+            ret.append(tag)
+            prev_b = b
+        ret.append(txt[prev_b:])
+        return {"msgid": a_msgid, "value1": len(a_bndr1) + len(a_common),
+                "value2": len(a_bndr2) + len(a_common),
+                "diff1": u"".join(ret)}
+
+    def _render_attr_diff(self, a_forrests, a_msgid, a_attr, a_flag, a_id1,
+                          a_id2, a_value1, a_value2):
+        """
+        Render record of differing attributes of two nodes.
+
+        @param a_forrests - 2-tuple of RST forrests of both annotations
+        @param a_msgid - id of the message of the 1-st node
+        @param a_attr - name of the attribute
+        @param a_flag - flag indicating which descendants should be rendered
+        @param a_id1 - id of the node from the 1-st annotation
+        @param a_id2 - id of the node from the 2-nd annotation
+        @param a_value1 - value of the attribute of the 1-st node
+        @param a_value2 - value of the attribute of the 2-nd node
+
+        @return dictionary of report fields
+        """
+        ret = {"msgid": a_msgid, "attr": a_attr, "id1": a_id1, "id2": a_id2,
+               "value1": a_value1, "value2": a_value2}
+        itree = None
+        for ikey, iforrest, iid in (("diff1", a_forrests[0], a_id1),
+                                    ("diff2", a_forrests[-1], a_id2)):
+            itree = iforrest.get_tree(iid)
+            if itree is not None:
+                ret[ikey] = itree.unicode_min(a_flag, a_attr)
+        return ret
+
+    def _write_fields(self, a_fields):
+        """
+        Output a single line of the report.
+
+        @param a_fields - dictionary of report fields
+
+        @return \c void
+        """
+        if self._fmt == DIFF_JSONL:
+            self._write(unicode(json.dumps(
+                OrderedDict((k, a_fields[k]) for k in DIFF_FIELDS
+                            if a_fields.get(k) is not None),
+                ensure_ascii=False)) + u'\n')
+        else:
+            self._write(FIELD_SEP.join(self._escape(a_fields.get(k))
+                                       for k in DIFF_FIELDS) + u'\n')
+
+    def _escape(self, a_value):
+        """
+        Return value as a single TSV field.
+
+        @param a_value - value of the field (\c None for empty fields)
+
+        @return unicode string
+        """
+        if a_value is None:
+            return u""
+        if isinstance(a_value, str):
+            a_value = a_value.decode(ENCODING)
+        else:
+            a_value = unicode(a_value)
+        for ichar, iescaped in TSV_ESCAPES:
+            a_value = a_value.replace(ichar, iescaped)
+        return a_value
+
+    def _write(self, a_str):
+        """
+        Write unicode string to the output stream.
+
+        @param a_str - unicode string
+
+        @return \c void
+        """
+        if self._encoding is None:
+            self._ostream.write(a_str)
+        else:
+            self._ostream.write(a_str.encode(self._encoding))
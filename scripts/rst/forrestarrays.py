@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+"""
+Module providing columnar representation of RST forrests.
+
+Constants:
+NO_CODE - code used for missing parents, relations, and messages
+
+Class:
+RSTForrestArrays - struct-of-arrays view of an RST forrest
+
+"""
+
+##################################################################
+# Imports
+from relvocab import RELATIONS, NO_REL
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+##################################################################
+# Constants
+NO_CODE = NO_REL
+
+
+##################################################################
+# Class
+class RSTForrestArrays(object):
+    """
+    Columnar (struct-of-arrays) representation of an RST forrest.
+
+    Every node of the forrest is assigned a row index, and its attributes are
+    stored in NumPy arrays, so that selections over all nodes are computed
+    with vectorized operations instead of walking the tree graph.  The
+    original RST trees are kept in `nodes`, so that selected rows can be
+    mapped back to them.
+
+    This class requires NumPy.
+
+    Instance Variables:
+    nodes - list of RST trees (the i-th tree corresponds to the i-th row)
+    msgids - list of message ids (indexed by message codes)
+    parent - row index of node's parent (NO_CODE for roots)
+    msgcode - code of node's message
+    discid - number of node's message in discussion
+    start_discid - discussion number of node's start offset
+    start - start offset of node's text
+    end_discid - discussion number of node's end offset
+    end - end offset of node's text
+    t_start_discid - discussion number of the start offset of node's subtree
+    t_start - start offset of node's subtree
+    t_end_discid - discussion number of the end offset of node's subtree
+    t_end - end offset of node's subtree
+    nucleus - flag indicating that node is a nucleus
+    relcode - code of the relation connecting node to its parent (codes
+              of the relation vocabulary RELATIONS are used, so that they
+              are the same for all forrests)
+    terminal - flag indicating that node is terminal
+    external - flag indicating that node is an external span (see
+               RSTTree.external_span)
+
+    Methods:
+    get_msgcode - return code of message id
+    get_relcode - return code of relation name
+    get_trees - return RST trees corresponding to row indices
+    select - return row indices of nodes satisfying all given conditions
+    get_children - return row indices of children of given nodes
+    get_satellites - return row indices of satellites of relation
+    get_nuclei - return row indices of nuclei of relation
+    get_spans - return row indices of (non-terminal) spans of message
+    get_edus - return row indices of terminal nodes
+    get_depths - return depths of nodes
+
+    """
+
+    def __init__(self, a_forrest):
+        """
+        Class constructor.
+
+        @param a_forrest - RST forrest (RSTForrest) whose nodes should be
+                           stored
+        """
+        if np is None:
+            raise ImportError("RSTForrestArrays requires NumPy")
+        self.nodes = a_forrest.get_nodes()
+        self.msgids = []
+        self._msgid2code = {}
+        n = len(self.nodes)
+        node2idx = dict((id(itree), i) for i, itree in enumerate(self.nodes))
+        self.parent = np.fromiter((NO_CODE if itree.parent is None
+                                   else node2idx[id(itree.parent)]
+                                   for itree in self.nodes), np.int32, n)
+        self.msgcode = np.fromiter((self._get_code(itree.msgid, self.msgids,
+                                                   self._msgid2code)
+                                    for itree in self.nodes), np.int32, n)
+        self.relcode = np.fromiter((itree.rid for itree in self.nodes),
+                                   np.int32, n)
+        self.discid = np.fromiter((itree.discid for itree in self.nodes),
+                                  np.int32, n)
+        self.start_discid = np.fromiter((itree.start[0]
+                                         for itree in self.nodes), np.int32, n)
+        self.start = np.fromiter((itree.start[-1] for itree in self.nodes),
+                                 np.int32, n)
+        self.end_discid = np.fromiter((itree.end[0] for itree in self.nodes),
+                                      np.int32, n)
+        self.end = np.fromiter((itree.end[-1] for itree in self.nodes),
+                               np.int32, n)
+        self.t_start_discid = np.fromiter((itree.t_start[0]
+                                           for itree in self.nodes),
+                                          np.int32, n)
+        self.t_start = np.fromiter((itree.t_start[-1] for itree in self.nodes),
+                                   np.int32, n)
+        self.t_end_discid = np.fromiter((itree.t_end[0]
+                                         for itree in self.nodes), np.int32, n)
+        self.t_end = np.fromiter((itree.t_end[-1] for itree in self.nodes),
+                                 np.int32, n)
+        self.nucleus = np.fromiter((bool(itree.nucleus)
+                                    for itree in self.nodes), np.bool_, n)
+        self.terminal = np.fromiter((bool(itree.terminal)
+                                     for itree in self.nodes), np.bool_, n)
+        self.external = np.fromiter((itree.external_span
+                                     for itree in self.nodes), np.bool_, n)
+
+    def __len__(self):
+        """
+        Return number of stored nodes.
+
+        @return integer
+        """
+        return len(self.nodes)
+
+    def get_msgcode(self, a_msgid):
+        """
+        Return code of message id.
+
+        @param a_msgid - message id
+
+        @return integer code (NO_CODE if message is unknown)
+        """
+        return self._msgid2code.get(a_msgid, NO_CODE)
+
+    def get_relcode(self, a_relname):
+        """
+        Return code of relation name.
+
+        @param a_relname - name of the relation
+
+        @return integer code (NO_CODE if relation is unknown)
+        """
+        return RELATIONS.get_code(a_relname)
+
+    def get_trees(self, a_idcs):
+        """
+        Return RST trees corresponding to row indices.
+
+        @param a_idcs - iterable of row indices
+
+        @return list of RST trees
+        """
+        return [self.nodes[i] for i in a_idcs]
+
+    def select(self, a_relname=None, a_msgid=None, a_nucleus=None,
+               a_terminal=None, a_external=None):
+        """
+        Return row indices of nodes satisfying all given conditions.
+
+        Conditions set to \c None are ignored.
+
+        @param a_relname - name of the relation connecting node to its parent
+        @param a_msgid - id of node's message
+        @param a_nucleus - required value of nucleus flag
+        @param a_terminal - required value of terminal flag
+        @param a_external - required value of external span flag
+
+        @return array of row indices
+        """
+        mask = np.ones(len(self.nodes), np.bool_)
+        # unknown relations and messages do not match any node (their code
+        # coincides with the one of missing values)
+        if a_relname is not None:
+            code = self.get_relcode(a_relname)
+            if code == NO_CODE:
+                mask[:] = False
+            else:
+                mask &= self.relcode == code
+        if a_msgid is not None:
+            code = self.get_msgcode(a_msgid)
+            if code == NO_CODE:
+                mask[:] = False
+            else:
+                mask &= self.msgcode == code
+        if a_nucleus is not None:
+            mask &= self.nucleus == bool(a_nucleus)
+        if a_terminal is not None:
+            mask &= self.terminal == bool(a_terminal)
+        if a_external is not None:
+            mask &= self.external == bool(a_external)
+        return np.flatnonzero(mask)
+
+    def get_children(self, a_idcs):
+        """
+        Return row indices of children of given nodes.
+
+        @param a_idcs - array of row indices of parent nodes
+
+        @return array of row indices
+        """
+        return np.flatnonzero(np.in1d(self.parent, a_idcs))
+
+    def get_satellites(self, a_relname):
+        """
+        Return row indices of satellites of relation.
+
+        @param a_relname - name of the relation
+
+        @return array of row indices
+        """
+        return self.select(a_relname=a_relname, a_nucleus=False)
+
+    def get_nuclei(self, a_relname):
+        """
+        Return row indices of nuclei of relation.
+
+        For hypotactic relations, these are nodes to which satellites of this
+        relation are attached; for paratactic relations, these are the nodes
+        linked by the relation itself.
+
+        @param a_relname - name of the relation
+
+        @return array of row indices
+        """
+        nuclei = self.select(a_relname=a_relname, a_nucleus=True)
+        parents = self.parent[self.get_satellites(a_relname)]
+        return np.union1d(nuclei, parents[parents != NO_CODE])
+
+    def get_spans(self, a_msgid):
+        """
+        Return row indices of (non-terminal) spans of message.
+
+        Spans are selected by the message they are assigned to (their
+        `msgid'), not by their offsets, so that external spans are only
+        returned for the message of their nucleus, even though they also
+        cover the EDUs of other messages.
+
+        @param a_msgid - id of the message
+
+        @return array of row indices
+        """
+        return self.select(a_msgid=a_msgid, a_terminal=False)
+
+    def get_edus(self, a_msgid=None):
+        """
+        Return row indices of terminal nodes sorted by their start offsets.
+
+        @param a_msgid - id of the message (all messages if \c None)
+
+        @return array of row indices
+        """
+        ret = self.select(a_msgid=a_msgid, a_terminal=True)
+        order = np.lexsort((self.start[ret], self.start_discid[ret]))
+        return ret[order]
+
+    def get_depths(self):
+        """
+        Return depths of nodes (number of their ancestors).
+
+        Depths of all nodes are computed at once by following the parent
+        links of all rows in parallel, one level per step.
+
+        @return array of integers
+        """
+        ret = np.zeros(len(self.nodes), np.int32)
+        ancestors = self.parent.copy()
+        mask = ancestors != NO_CODE
+        # parent links are acyclic, so no node has more ancestors than there
+        # are nodes
+        for _ in xrange(len(self.nodes)):
+            if not mask.any():
+                break
+            ret[mask] += 1
+            ancestors[mask] = self.parent[ancestors[mask]]
+            mask = ancestors != NO_CODE
+        return ret
+
+    def _get_code(self, a_key, a_keys, a_key2code):
+        """
+        Return code of key, assigning a new code to unknown keys.
+
+        @param a_key - key to be encoded
+        @param a_keys - list of known keys
+        @param a_key2code - dictionary mapping known keys to their codes
+
+        @return integer code (NO_CODE for \c None keys)
+        """
+        if a_key is None:
+            return NO_CODE
+        if a_key not in a_key2code:
+            a_key2code[a_key] = len(a_keys)
+            a_keys.append(a_key)
+        return a_key2code[a_key]
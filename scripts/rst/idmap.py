@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""
+Module providing interning of node and message identifiers.
+
+Constants:
+NO_ID - code of missing identifiers
+NODE_IDS - mapping between node ids and their codes
+MSG_IDS - mapping between message ids and their codes
+
+Class:
+RSTIdMap - bidirectional mapping between string identifiers and dense
+           integer codes
+
+"""
+
+
+##################################################################
+# Class
+class RSTIdMap(object):
+    """
+    Bidirectional mapping between string identifiers and dense integer codes.
+
+    Codes are assigned in the order in which identifiers are seen for the
+    first time, starting from zero.  Codes are only valid within the process
+    that assigned them, so identifiers and not their codes should be written
+    to files.
+
+    Methods:
+    intern - return code of identifier, assigning a new code if necessary
+    get_code - return code of identifier without assigning new codes
+    get_id - return identifier corresponding to code
+
+    """
+
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        self._ids = []
+        self._id2code = {}
+
+    def __len__(self):
+        """
+        Return number of known identifiers.
+
+        @return integer
+        """
+        return len(self._ids)
+
+    def __contains__(self, a_id):
+        """
+        Check whether identifier is known.
+
+        @param a_id - identifier to check
+
+        @return \c True if identifier has a code
+        """
+        return a_id in self._id2code
+
+    def intern(self, a_id):
+        """
+        Return code of identifier, assigning a new code if necessary.
+
+        @param a_id - string identifier (\c None is mapped to NO_ID)
+
+        @return integer code
+        """
+        if a_id is None:
+            return NO_ID
+        try:
+            return self._id2code[a_id]
+        except KeyError:
+            ret = self._id2code[a_id] = len(self._ids)
+            # keep the string which was seen first, so that all nodes share it
+            self._ids.append(a_id)
+            return ret
+
+    def get_code(self, a_id):
+        """
+        Return code of identifier without assigning new codes.
+
+        @param a_id - string identifier
+
+        @return integer code (NO_ID if identifier is unknown)
+        """
+        return self._id2code.get(a_id, NO_ID)
+
+    def get_id(self, a_code):
+        """
+        Return identifier corresponding to code.
+
+        @param a_code - integer code
+
+        @return string identifier (\c None for NO_ID)
+        """
+        if a_code == NO_ID:
+            return None
+        return self._ids[a_code]
+
+
+##################################################################
+# Constants
+NO_ID = -1
+NODE_IDS = RSTIdMap()
+MSG_IDS = RSTIdMap()
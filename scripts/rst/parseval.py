@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+"""
+Module providing Parseval-style evaluation of RST forrests.
+
+Constants:
+SPAN - name of the metric on unlabeled spans
+NUCLEARITY - name of the metric on spans labeled with nuclearity
+RELATION - name of the metric on spans labeled with relations
+FULL - name of the metric on spans labeled with nuclearity and relations
+METRICS - names of all metrics
+
+Class:
+RSTParseval - accumulator of precision, recall, and F1 of predicted forrests
+
+"""
+
+##################################################################
+# Imports
+from constants import TREE_ALL, TREE_INTERNAL
+
+from collections import Counter
+from itertools import chain
+
+##################################################################
+# Constants
+SPAN = "span"
+NUCLEARITY = "nuclearity"
+RELATION = "relation"
+FULL = "full"
+METRICS = (SPAN, NUCLEARITY, RELATION, FULL)
+# number of bits used for packing single components of span keys and
+# relation codes
+POS_BITS = 32
+REL_BITS = 16
+
+
+##################################################################
+# Methods
+def _get_span_key(a_first, a_last):
+    """
+    Pack positions of the first and the last EDU of node into a single integer.
+
+    @param a_first - position of the first EDU (2-tuple of the number of its
+                     message in the discussion and its index in the message)
+    @param a_last - position of the last EDU
+
+    @return integer
+    """
+    # numbers of messages are shifted by one, since missing ones are negative
+    ret = a_first[0] + 1
+    for ipos in (a_first[-1], a_last[0] + 1, a_last[-1]):
+        ret = (ret << POS_BITS) | ipos
+    return ret
+
+
+def _get_span_edus(a_tree):
+    """
+    Return EDUs spanned by node.
+
+    Satellites are children of their nuclei, so that nodes span the EDUs of
+    their subtrees except for those of their satellites.  Children count as
+    satellites unless they are nuclei linked to the node (see
+    `XMLWriter._get_satellites').  External spans span both internal and
+    external EDUs, other nodes only internal ones.
+
+    @param a_tree - RST tree
+
+    @return list of sorted EDUs
+    """
+    if a_tree.external_span:
+        flag = TREE_ALL
+    else:
+        flag = TREE_INTERNAL
+    sat_edus = set(id(iedu) for ch in chain(a_tree.ichildren,
+                                            a_tree.echildren)
+                   if not (ch.nucleus and ch.parent is a_tree)
+                   for iedu in ch.get_edus(flag))
+    return [iedu for iedu in a_tree.get_edus(flag)
+            if id(iedu) not in sat_edus]
+
+
+def _get_edu_positions(a_forrest):
+    """
+    Return positions of all EDUs of forrest.
+
+    @param a_forrest - RST forrest
+
+    @return dictionary mapping ids (`id()') of terminal nodes to 2-tuples of
+            the number of their message in the discussion and their index in
+            the message
+    """
+    ret = {}
+    discid2cnt = Counter()
+    for iedu in sorted(itree for itree in a_forrest.iter_subtrees(TREE_ALL)
+                       if itree.terminal):
+        ret[id(iedu)] = (iedu.discid, discid2cnt[iedu.discid])
+        discid2cnt[iedu.discid] += 1
+    return ret
+
+
+def _get_prf(a_matched, a_gold, a_pred):
+    """
+    Compute precision, recall, and F1.
+
+    @param a_matched - number of matching constituents
+    @param a_gold - number of gold constituents
+    @param a_pred - number of predicted constituents
+
+    @return 3-tuple of floats
+    """
+    precision = float(a_matched) / a_pred if a_pred else 0.
+    recall = float(a_matched) / a_gold if a_gold else 0.
+    if precision + recall == 0.:
+        return (precision, recall, 0.)
+    return (precision, recall, 2. * precision * recall / (precision + recall))
+
+
+##################################################################
+# Class
+class RSTParseval(object):
+    """
+    Accumulator of Parseval scores of predicted forrests.
+
+    Every node is a constituent identified by the positions of the first
+    and the last EDU which it spans (the number of their message in the
+    discussion and their index in the message, see `_get_span_edus'), and
+    is optionally labeled with its nuclearity, its relation, or both.
+    Unlike the
+    offsets of spans, these positions do not depend on the order in which
+    relations were linked, but gold and predicted forrests have to share
+    their segmentation.  Positions and labels are packed into single
+    integers, so that the constituents of a forrest form multisets of
+    integers, which are matched against each other by hashing.
+
+    Micro-averaged scores are computed from the counts of all evaluated
+    forrests, macro-averaged scores are means of the scores of single
+    forrests.
+
+    Instance Variables:
+    flag - flag indicating which nodes (internal or external, or both) are
+           evaluated
+    terminals - flag indicating whether terminal nodes are evaluated
+
+    Methods:
+    clear - reset accumulated counts
+    get_constituents - return constituents of forrest
+    update - evaluate predicted forrest against gold forrest
+    get_scores - return accumulated scores
+
+    """
+
+    def __init__(self, a_flag=TREE_ALL, a_terminals=True):
+        """
+        Class constructor.
+
+        @param a_flag - flag indicating which nodes (internal or external, or
+                        both) should be evaluated
+        @param a_terminals - flag indicating whether terminal nodes should be
+                        evaluated
+        """
+        self.flag = a_flag
+        self.terminals = a_terminals
+        self._counts = None
+        self._doc_scores = None
+        self.clear()
+
+    def clear(self):
+        """
+        Reset accumulated counts.
+
+        @return \c void
+        """
+        self._counts = dict((imetric, [0, 0, 0]) for imetric in METRICS)
+        self._doc_scores = dict((imetric, []) for imetric in METRICS)
+
+    def get_constituents(self, a_forrest):
+        """
+        Return constituents of forrest.
+
+        The result can be passed to `update' instead of the forrest, so that
+        the constituents of gold forrests only need to be computed once.
+
+        @param a_forrest - RST forrest
+
+        @return dictionary mapping metrics to multisets (Counters) of packed
+                constituents
+        """
+        ret = dict((imetric, Counter()) for imetric in METRICS)
+        spans = ret[SPAN]
+        nuclearity = ret[NUCLEARITY]
+        relations = ret[RELATION]
+        full = ret[FULL]
+        positions = _get_edu_positions(a_forrest)
+        edus = None
+        ikey = irel_key = 0
+        for itree in a_forrest.iter_subtrees(self.flag):
+            if itree.terminal and not self.terminals:
+                continue
+            edus = _get_span_edus(itree)
+            # spans without EDUs have no extent
+            if not edus:
+                continue
+            ikey = _get_span_key(positions[id(edus[0])],
+                                 positions[id(edus[-1])])
+            spans[ikey] += 1
+            nuclearity[(ikey << 1) | bool(itree.nucleus)] += 1
+            irel_key = (ikey << REL_BITS) | (itree.rid + 1)
+            relations[irel_key] += 1
+            full[(irel_key << 1) | bool(itree.nucleus)] += 1
+        return ret
+
+    def update(self, a_gold, a_pred):
+        """
+        Evaluate predicted forrest against gold forrest.
+
+        @param a_gold - gold RST forrest (or its constituents returned by
+                        `get_constituents')
+        @param a_pred - predicted RST forrest (or its constituents returned
+                        by `get_constituents')
+
+        @return dictionary mapping metrics to 3-tuples with precision,
+                recall, and F1 of the predicted forrest
+        """
+        if not isinstance(a_gold, dict):
+            a_gold = self.get_constituents(a_gold)
+        if not isinstance(a_pred, dict):
+            a_pred = self.get_constituents(a_pred)
+        ret = {}
+        counts = None
+        n_gold = n_pred = n_matched = 0
+        for imetric in METRICS:
+            n_gold = sum(a_gold[imetric].itervalues())
+            n_pred = sum(a_pred[imetric].itervalues())
+            n_matched = sum((a_gold[imetric] & a_pred[imetric]).itervalues())
+            counts = self._counts[imetric]
+            counts[0] += n_matched
+            counts[1] += n_gold
+            counts[2] += n_pred
+            ret[imetric] = _get_prf(n_matched, n_gold, n_pred)
+            self._doc_scores[imetric].append(ret[imetric])
+        return ret
+
+    def get_scores(self, a_macro=False):
+        """
+        Return accumulated scores.
+
+        @param a_macro - return macro-averaged instead of micro-averaged
+                         scores
+
+        @return dictionary mapping metrics to 3-tuples with precision,
+                recall, and F1
+        """
+        ret = {}
+        doc_scores = None
+        for imetric in METRICS:
+            if a_macro:
+                doc_scores = self._doc_scores[imetric]
+                if doc_scores:
+                    ret[imetric] = tuple(sum(iscores) / len(doc_scores)
+                                         for iscores in zip(*doc_scores))
+                else:
+                    ret[imetric] = (0., 0., 0.)
+            else:
+                ret[imetric] = _get_prf(*self._counts[imetric])
+        return ret
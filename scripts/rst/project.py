@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+"""
+Module providing class for RST project files.
+
+Constants:
+PRJ_SFX - suffix of project files
+PRJ_FORMATS - mapping from format names used in project files to format flags
+              (only formats which can be parsed are listed)
+
+Class:
+RSTProject - lazy loader of components referenced by project file
+
+"""
+
+##################################################################
+# Imports
+from constants import XML_FMT, TSV_FMT
+from corpus import RSTCorpus
+from exceptions import RSTBadFormat
+from relscheme import read_relscheme
+from relvocab import RELATIONS
+
+import os
+import xml.etree.ElementTree as ET
+
+##################################################################
+# Constants
+PRJ_SFX = ".rstprj.xml"
+PRJ_FORMATS = {"pc3m": XML_FMT, "tsv": TSV_FMT}
+
+
+##################################################################
+# Class
+class RSTProject(object):
+    """
+    Class for accessing components referenced by an `.rstprj.xml' file.
+
+    Only the project file itself is read on construction.  Relation schemes,
+    basedata, and annotation are loaded when they are accessed for the first
+    time, so that, e.g., reading segments neither parses scheme files nor
+    constructs spans and relations.  Relation schemes of the project are
+    added to the relation vocabulary (see RELATIONS) before its annotation
+    is read, so that relations of the project are known even if they are
+    missing from the default schemes.
+
+    Instance Variables:
+    fname - name of the project file
+    fmt - format of the annotation file (\c None if not specified)
+    relscheme_fname - name of the relation scheme file
+    erelscheme_fname - name of the extended relation scheme file
+    basedata_fname - name of the basedata file
+    anno_fname - name of the annotation file
+    corpus - loader of basedata and annotation files (RSTCorpus)
+    relscheme - dictionary mapping relation names to their types
+    erelscheme - dictionary mapping relation names of the extended scheme
+                 to their types
+    messages - dictionary mapping message id to its text
+    segments - RST forrest which only contains segments of the annotation
+    forrest - RST forrest of the annotation
+
+    """
+
+    def __init__(self, a_fname, a_corpus=None):
+        """
+        Class constructor.
+
+        @param a_fname - name of the project file
+        @param a_corpus - loader of basedata and annotation files (if \c None,
+                          a new loader will be created)
+        """
+        self.fname = a_fname
+        self.corpus = RSTCorpus() if a_corpus is None else a_corpus
+        self.fmt = None
+        self.relscheme_fname = None
+        self.erelscheme_fname = None
+        self.basedata_fname = None
+        self.anno_fname = None
+        self._relscheme = None
+        self._erelscheme = None
+        self._segments = None
+        self._forrest = None
+        self._read(a_fname)
+
+    @property
+    def relscheme(self):
+        """
+        Return relation scheme of the project.
+
+        @return dictionary mapping relation names to their types or \c None
+                if project does not specify scheme file
+        """
+        if self._relscheme is None and self.relscheme_fname is not None:
+            self._relscheme = read_relscheme(self.relscheme_fname)
+        return self._relscheme
+
+    @property
+    def erelscheme(self):
+        """
+        Return extended relation scheme of the project.
+
+        @return dictionary mapping relation names to their types or \c None
+                if project does not specify extended scheme file
+        """
+        if self._erelscheme is None and self.erelscheme_fname is not None:
+            self._erelscheme = read_relscheme(self.erelscheme_fname)
+        return self._erelscheme
+
+    @property
+    def messages(self):
+        """
+        Return messages of project's basedata.
+
+        @return dictionary mapping message id to its text
+        """
+        return self.corpus.get_messages(self.basedata_fname)[0]
+
+    @property
+    def segments(self):
+        """
+        Return RST forrest which only contains segments of the annotation.
+
+        If complete annotation has already been read, its forrest is returned
+        instead.
+
+        @return RSTForrest
+        """
+        if self._forrest is not None:
+            return self._forrest
+        if self._segments is None:
+            self._segments = self.corpus.get_forrest(self.basedata_fname,
+                                                     self.anno_fname, True,
+                                                     self.fmt)
+        return self._segments
+
+    @property
+    def forrest(self):
+        """
+        Return RST forrest of the annotation.
+
+        @return RSTForrest
+        """
+        if self._forrest is None:
+            if self.relscheme is not None:
+                RELATIONS.add_scheme(self.relscheme)
+            if self.erelscheme is not None:
+                RELATIONS.add_scheme(self.erelscheme, True)
+            self._forrest = self.corpus.get_forrest(self.basedata_fname,
+                                                    self.anno_fname, False,
+                                                    self.fmt)
+            self._segments = None
+        return self._forrest
+
+    def _read(self, a_fname):
+        """
+        Read file names and format specified in project file.
+
+        Paths in project file are resolved relative to its directory.
+        Formats without parser (e.g., `lisp') are rejected.
+
+        @param a_fname - name of the project file
+
+        @return \c void
+        """
+        prj_dir = os.path.dirname(os.path.abspath(a_fname))
+        iprj = ET.parse(a_fname).getroot()
+        ifmt = iprj.find("format")
+        if ifmt is not None:
+            if ifmt.get("type") not in PRJ_FORMATS:
+                raise RSTBadFormat(
+                    "Unsupported format of project {:s}: {:s} (expected"
+                    " one of {:s})".format(a_fname, repr(ifmt.get("type")),
+                                           ", ".join(sorted(PRJ_FORMATS))))
+            self.fmt = PRJ_FORMATS[ifmt.get("type")]
+        self.relscheme_fname = self._get_path(iprj, "relscheme", prj_dir)
+        self.erelscheme_fname = self._get_path(iprj, "erelscheme", prj_dir)
+        self.basedata_fname = self._get_path(iprj, "basedata", prj_dir)
+        if self.basedata_fname is None:
+            raise RSTBadFormat(
+                "No basedata specified in project {:s}".format(a_fname))
+        self.anno_fname = self._get_path(iprj, "annotation", prj_dir)
+        if self.anno_fname is None:
+            raise RSTBadFormat(
+                "No annotation specified in project {:s}".format(a_fname))
+
+    def _get_path(self, a_prj, a_tag, a_prj_dir):
+        """
+        Return path specified by element of project file.
+
+        @param a_prj - root element of project file
+        @param a_tag - tag of the element specifying path
+        @param a_prj_dir - directory of project file
+
+        @return path to the file or \c None if element does not specify any
+        """
+        ielem = a_prj.find(a_tag)
+        if ielem is None or not ielem.text or not ielem.text.strip():
+            return None
+        return os.path.normpath(os.path.join(a_prj_dir, ielem.text.strip()))
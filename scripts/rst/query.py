@@ -0,0 +1,551 @@
+#!/usr/bin/env python
+
+"""
+Module providing structural queries over RST forrests.
+
+Queries are written in a small tgrep-like language.  A node is described by
+a shell-style pattern of its relation name (`*' matches any node) followed
+by any number of attribute tests in square brackets:
+
+  Contrast[nucleus][messages>=2]   nuclei of Contrast spanning two messages
+  [terminal][!nucleus]             satellite EDUs
+  r-*[msgid=3249*]                 reply relations of matching messages
+
+Boolean attributes (nucleus, terminal, external) are tested by their name or
+its negation (`[!nucleus]'), `external' being true for external spans only
+(see RSTTree.external_span); string attributes (relname, msgid, id) are
+compared with `=' or `!=' against shell-style patterns; integer attributes
+(messages, children) are compared with `=', `!=', `<', `<=', `>', or `>='.
+
+Nodes are linked by operators borrowed from tgrep:
+
+  A < B    A is the parent of B
+  A << B   A dominates B
+  A > B    A is a child of B
+  A >> B   A is dominated by B
+  A $ B    A is a sibling of B
+
+Every operator can be negated by a preceding `!' (e.g., `A !<< B').  All
+operators following a node constrain this node (`A < B > C' finds nodes A
+which are parents of B and children of C), parentheses group constraints of
+nested nodes (`A < (B < C)').  The query returns the nodes matched by its
+first node.
+
+Constants:
+QUERY_OPS - operators linking nodes of a query
+BOOL_ATTRS - names of boolean attributes
+GLOB_ATTRS - names of attributes compared with shell-style patterns
+INT_ATTRS - names of integer attributes
+
+Classes:
+RSTNodeIndex - attribute index of the nodes of an RST forrest
+RSTQuery - compiled query over RST forrests
+
+"""
+
+##################################################################
+# Imports
+from constants import TREE_ALL
+from exceptions import RSTBadFormat
+
+from collections import defaultdict
+from fnmatch import fnmatchcase
+from itertools import chain
+
+import operator
+import re
+
+##################################################################
+# Constants
+PARENT = "<"
+ANCESTOR = "<<"
+CHILD = ">"
+DESCENDANT = ">>"
+SIBLING = "$"
+QUERY_OPS = (ANCESTOR, DESCENDANT, PARENT, CHILD, SIBLING)
+NEGATION = "!"
+ANY = "*"
+
+BOOL_ATTRS = {"nucleus": lambda t: bool(t.nucleus),
+              "terminal": lambda t: bool(t.terminal),
+              "external": lambda t: t.external_span}
+GLOB_ATTRS = {"relname": lambda t: t.relname or "",
+              "msgid": lambda t: t.msgid or "",
+              "id": lambda t: t.id or ""}
+INT_ATTRS = {"messages": lambda t: _get_n_messages(t),
+             "children": lambda t: len(t.ichildren) + len(t.echildren)}
+CMP_OPS = {"=": operator.eq, "!=": operator.ne, "<": operator.lt,
+           "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+TOKEN_RE = re.compile(r"\s*(?:(?P<op>!?(?:<<|>>|<|>|\$))|(?P<paren>[()])"
+                      r"|\[(?P<test>[^\]]*)\]|(?P<name>[^\s()\[\]<>$!]+))")
+TEST_RE = re.compile(r"\s*(?P<neg>!)?\s*(?P<attr>\w+)\s*"
+                     r"(?:(?P<cmp>!=|<=|>=|=|<|>)\s*(?P<value>\S+))?\s*$")
+
+
+##################################################################
+# Methods
+def _get_n_messages(a_tree):
+    """
+    Return number of messages spanned by a node.
+
+    Messages are counted by the distinct message ids of all EDUs dominated
+    by the node, since offsets of spans are restricted to the node's own
+    message.
+
+    @param a_tree - RST tree
+
+    @return integer (0 if the node does not dominate any EDUs)
+    """
+    return len(set(iedu.msgid for iedu in a_tree.get_edus(TREE_ALL)))
+
+
+##################################################################
+# Classes
+class RSTNodeIndex(object):
+    """
+    Attribute index of the nodes of an RST forrest.
+
+    Nodes are referred to by their row indices.  Nodes with the same
+    relation name and of the same message are indexed, so that queries only
+    visit nodes which can match their relation and message patterns, and
+    links between nodes are stored as lists of row indices, so that
+    structural constraints are evaluated on sets of rows without walking
+    the trees again.  The index of a forrest can be reused for any number of
+    queries.  Since nodes of discussions can be linked as external children
+    of several nodes, a node can have more than one parent.
+
+    Instance Variables:
+    nodes - list of RST trees (the i-th tree corresponds to the i-th row)
+    parents - lists of row indices of node's parents
+    children - lists of row indices of node's children
+
+    Methods:
+    get_trees - return RST trees corresponding to row indices
+    get_candidates - return rows of nodes matching relation and message
+                     patterns
+    get_parents - return rows of parents of nodes
+    get_ancestors - return rows of ancestors of nodes
+    get_children - return rows of children of nodes
+    get_descendants - return rows of descendants of nodes
+    get_siblings - return rows of siblings of nodes
+
+    """
+
+    def __init__(self, a_forrest):
+        """
+        Class constructor.
+
+        @param a_forrest - RST forrest (RSTForrest) whose nodes should be
+                           indexed
+        """
+        self.nodes = a_forrest.get_nodes()
+        node2idx = dict((id(itree), i) for i, itree in enumerate(self.nodes))
+        links = set()
+        for i, itree in enumerate(self.nodes):
+            links.update((i, node2idx[id(ichild)])
+                         for ichild in chain(itree.ichildren, itree.echildren))
+            if itree.parent is not None:
+                links.add((node2idx[id(itree.parent)], i))
+        self.parents = [[] for _ in self.nodes]
+        self.children = [[] for _ in self.nodes]
+        for iparent, ichild in sorted(links):
+            self.parents[ichild].append(iparent)
+            self.children[iparent].append(ichild)
+        self._relname2idcs = defaultdict(set)
+        self._msgid2idcs = defaultdict(set)
+        for i, itree in enumerate(self.nodes):
+            if itree.relname:
+                self._relname2idcs[itree.relname].add(i)
+            if itree.msgid:
+                self._msgid2idcs[itree.msgid].add(i)
+
+    def __len__(self):
+        """
+        Return number of indexed nodes.
+
+        @return integer
+        """
+        return len(self.nodes)
+
+    def get_trees(self, a_idcs):
+        """
+        Return RST trees corresponding to row indices.
+
+        @param a_idcs - iterable of row indices
+
+        @return list of RST trees sorted by their offsets
+        """
+        return sorted(self.nodes[i] for i in a_idcs)
+
+    def get_candidates(self, a_relpatterns=(), a_msgpatterns=()):
+        """
+        Return rows of nodes matching relation and message patterns.
+
+        @param a_relpatterns - shell-style patterns which the relation name
+                               of a node should all match
+        @param a_msgpatterns - shell-style patterns which the message id of a
+                               node should all match
+
+        @return set of row indices
+        """
+        ret = None
+        for key2idcs, patterns in ((self._relname2idcs, a_relpatterns),
+                                   (self._msgid2idcs, a_msgpatterns)):
+            for ipattern in patterns:
+                idcs = set()
+                for ikey, iidcs in key2idcs.iteritems():
+                    if fnmatchcase(ikey, ipattern):
+                        idcs |= iidcs
+                ret = idcs if ret is None else ret & idcs
+        if ret is None:
+            return set(xrange(len(self.nodes)))
+        return ret
+
+    def get_parents(self, a_idcs):
+        """
+        Return rows of parents of nodes.
+
+        @param a_idcs - iterable of row indices
+
+        @return set of row indices
+        """
+        return set(iparent for i in a_idcs for iparent in self.parents[i])
+
+    def get_ancestors(self, a_idcs):
+        """
+        Return rows of ancestors of nodes.
+
+        @param a_idcs - iterable of row indices
+
+        @return set of row indices
+        """
+        return self._get_closure(a_idcs, self.parents)
+
+    def get_children(self, a_idcs):
+        """
+        Return rows of children of nodes.
+
+        @param a_idcs - iterable of row indices
+
+        @return set of row indices
+        """
+        return set(ichild for i in a_idcs for ichild in self.children[i])
+
+    def get_descendants(self, a_idcs):
+        """
+        Return rows of descendants of nodes.
+
+        @param a_idcs - iterable of row indices
+
+        @return set of row indices
+        """
+        return self._get_closure(a_idcs, self.children)
+
+    def get_siblings(self, a_idcs):
+        """
+        Return rows of siblings of nodes.
+
+        @param a_idcs - iterable of row indices
+
+        @return set of row indices
+        """
+        ret = set()
+        for i in a_idcs:
+            for iparent in self.parents[i]:
+                ret.update(ichild for ichild in self.children[iparent]
+                           if ichild != i)
+        return ret
+
+    def _get_closure(self, a_idcs, a_links):
+        """
+        Return rows of nodes reachable from nodes by following links.
+
+        @param a_idcs - iterable of row indices
+        @param a_links - lists of row indices linked to every row
+
+        @return set of row indices (without the original ones unless they
+                are reachable from other nodes)
+        """
+        ret = set()
+        inodes = list(a_idcs)
+        while inodes:
+            for ilinked in a_links[inodes.pop()]:
+                # nodes reachable from visited nodes are already collected
+                if ilinked not in ret:
+                    ret.add(ilinked)
+                    inodes.append(ilinked)
+        return ret
+
+
+class _QueryNode(object):
+    """
+    Single node of a compiled query.
+
+    Instance Variables:
+    relpatterns - shell-style patterns of the relation name
+    msgpatterns - shell-style patterns of the message id
+    tests - list of predicates on RST trees
+    links - list of 3-tuples with operators, negation flags, and linked nodes
+
+    """
+
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        self.relpatterns = []
+        self.msgpatterns = []
+        self.tests = []
+        self.links = []
+
+
+class RSTQuery(object):
+    """
+    Compiled query over RST forrests.
+
+    Queries are evaluated bottom-up on sets of rows of an RSTNodeIndex:
+    candidates of every node are looked up by their relation name and
+    message id in the index, filtered by the remaining attribute tests, and
+    then restricted to nodes standing in the required relation to the
+    matches of linked nodes.  Every node of the query is thus evaluated once
+    per forrest, regardless of the number of candidates.
+
+    Instance Variables:
+    pattern - source of the query
+
+    Methods:
+    match - return nodes of forrest matched by the query
+
+    """
+
+    def __init__(self, a_pattern):
+        """
+        Class constructor.
+
+        @param a_pattern - query string
+
+        @raise RSTBadFormat if the query cannot be parsed
+        """
+        self.pattern = a_pattern
+        self._tokens = self._tokenize(a_pattern)
+        self._pos = 0
+        self._root = self._parse_expr()
+        if self._pos < len(self._tokens):
+            self._error("Unexpected `{:s}'".format(
+                self._tokens[self._pos][1]))
+        self._tokens = None
+
+    def match(self, a_forrest):
+        """
+        Return nodes of forrest matched by the query.
+
+        @param a_forrest - RST forrest or its RSTNodeIndex (indices should be
+                           passed if several queries are run on the same
+                           forrest)
+
+        @return list of RST trees sorted by their offsets
+        """
+        if not isinstance(a_forrest, RSTNodeIndex):
+            a_forrest = RSTNodeIndex(a_forrest)
+        return a_forrest.get_trees(self._eval(self._root, a_forrest))
+
+    def _eval(self, a_node, a_index):
+        """
+        Return rows of nodes matched by query node.
+
+        @param a_node - node of the query (_QueryNode)
+        @param a_index - RSTNodeIndex of the forrest
+
+        @return set of row indices
+        """
+        ret = a_index.get_candidates(a_node.relpatterns, a_node.msgpatterns)
+        if a_node.tests:
+            ret = set(i for i in ret
+                      if all(itest(a_index.nodes[i])
+                             for itest in a_node.tests))
+        linked = None
+        for iop, inegated, ilinked in a_node.links:
+            if not ret:
+                break
+            linked = self._eval(ilinked, a_index)
+            if iop == PARENT:
+                linked = a_index.get_parents(linked)
+            elif iop == ANCESTOR:
+                linked = a_index.get_ancestors(linked)
+            elif iop == CHILD:
+                linked = a_index.get_children(linked)
+            elif iop == DESCENDANT:
+                linked = a_index.get_descendants(linked)
+            else:
+                linked = a_index.get_siblings(linked)
+            if inegated:
+                ret -= linked
+            else:
+                ret &= linked
+        return ret
+
+    def _tokenize(self, a_pattern):
+        """
+        Split query into tokens.
+
+        @param a_pattern - query string
+
+        @return list of 3-tuples with token types, values, and positions
+
+        @raise RSTBadFormat if the query contains invalid characters
+        """
+        ret = []
+        imatch = None
+        pos = 0
+        end = len(a_pattern.rstrip())
+        while pos < end:
+            imatch = TOKEN_RE.match(a_pattern, pos)
+            if imatch is None:
+                raise RSTBadFormat("Invalid query {:s} at position {:d}".format(
+                    repr(a_pattern), pos))
+            ret.append((imatch.lastgroup, imatch.group(imatch.lastgroup),
+                        imatch.start(imatch.lastgroup)))
+            pos = imatch.end()
+        return ret
+
+    def _error(self, a_msg):
+        """
+        Raise exception about invalid query.
+
+        @param a_msg - description of the error
+
+        @raise RSTBadFormat
+        """
+        if self._pos < len(self._tokens):
+            pos = self._tokens[self._pos][-1]
+        else:
+            pos = len(self.pattern)
+        raise RSTBadFormat("{:s} in query {:s} at position {:d}".format(
+            a_msg, repr(self.pattern), pos))
+
+    def _peek(self, a_type, a_value=None):
+        """
+        Check type (and value) of the current token.
+
+        @param a_type - expected token type
+        @param a_value - expected token value (\c None for any)
+
+        @return \c True if current token is of the expected type and value
+        """
+        if self._pos >= len(self._tokens):
+            return False
+        ttype, tvalue, _ = self._tokens[self._pos]
+        return ttype == a_type and (a_value is None or tvalue == a_value)
+
+    def _next(self):
+        """
+        Return value of the current token and advance to the next one.
+
+        @return string
+        """
+        self._pos += 1
+        return self._tokens[self._pos - 1][1]
+
+    def _parse_expr(self):
+        """
+        Parse node followed by its links.
+
+        @return _QueryNode
+        """
+        ret = self._parse_node()
+        op = None
+        while self._peek("op"):
+            op = self._next()
+            if op.startswith(NEGATION):
+                ret.links.append((op[1:], True, self._parse_node()))
+            else:
+                ret.links.append((op, False, self._parse_node()))
+        return ret
+
+    def _parse_node(self):
+        """
+        Parse single node or parenthesized expression.
+
+        @return _QueryNode
+        """
+        if self._peek("paren", "("):
+            self._next()
+            ret = self._parse_expr()
+            if not self._peek("paren", ")"):
+                self._error("Missing `)'")
+            self._next()
+            return ret
+        ret = _QueryNode()
+        if self._peek("name"):
+            # nodes without relation also match `*'
+            if self._next() != ANY:
+                ret.relpatterns.append(self._tokens[self._pos - 1][1])
+        elif not self._peek("test"):
+            self._error("Node expected")
+        while self._peek("test"):
+            self._parse_test(ret, self._tokens[self._pos][1])
+            self._pos += 1
+        return ret
+
+    def _parse_test(self, a_node, a_test):
+        """
+        Add attribute test to query node.
+
+        @param a_node - query node (_QueryNode) to which the test is added
+        @param a_test - content of the square brackets
+
+        @return \c void
+        """
+        imatch = TEST_RE.match(a_test)
+        if imatch is None:
+            self._error("Invalid test `[{:s}]'".format(a_test))
+        negated, attr, cmp_op, value = imatch.group("neg", "attr", "cmp",
+                                                    "value")
+        if attr in BOOL_ATTRS:
+            if cmp_op is not None:
+                self._error("Boolean attribute `{:s}' cannot be compared".format(
+                    attr))
+            getter = BOOL_ATTRS[attr]
+            if negated:
+                a_node.tests.append(lambda t: not getter(t))
+            else:
+                a_node.tests.append(getter)
+            return
+        if cmp_op is None or negated:
+            self._error("Attribute `{:s}' should be compared".format(attr))
+        if attr in GLOB_ATTRS:
+            if cmp_op not in ("=", "!="):
+                self._error("Invalid comparison `{:s}' of `{:s}'".format(
+                    cmp_op, attr))
+            if cmp_op == "=" and attr == "relname":
+                # relation and message patterns are looked up in the index
+                a_node.relpatterns.append(value)
+            elif cmp_op == "=" and attr == "msgid":
+                a_node.msgpatterns.append(value)
+            else:
+                self._add_test(a_node, GLOB_ATTRS[attr],
+                               lambda v: fnmatchcase(v, value) == (cmp_op == "="))
+        elif attr in INT_ATTRS:
+            try:
+                value = int(value)
+            except ValueError:
+                self._error("Attribute `{:s}' should be compared with an"
+                            " integer".format(attr))
+            cmp_func = CMP_OPS[cmp_op]
+            self._add_test(a_node, INT_ATTRS[attr],
+                           lambda v: cmp_func(v, value))
+        else:
+            self._error("Unknown attribute `{:s}'".format(attr))
+
+    def _add_test(self, a_node, a_getter, a_check):
+        """
+        Add predicate on attribute value to query node.
+
+        @param a_node - query node (_QueryNode)
+        @param a_getter - function returning the attribute of an RST tree
+        @param a_check - predicate on the attribute value
+
+        @return \c void
+        """
+        a_node.tests.append(lambda t: a_check(a_getter(t)))
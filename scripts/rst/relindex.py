@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+"""
+Module providing an inverted index of RST relations.
+
+Constants:
+FNAME_IDX - index of the file name in relation records
+MSGID_IDX - index of the message id in relation records
+START_IDX - index of the start offset of the satellite in relation records
+END_IDX - index of the end offset of the satellite in relation records
+NUCLEUS_IDX - index of the id of the nucleus in relation records
+SATELLITE_IDX - index of the id of the satellite in relation records
+
+Class:
+RSTRelIndex - mapping from relation names to the instances of relations
+
+"""
+
+##################################################################
+# Imports
+from constants import TREE_ALL
+
+from collections import defaultdict
+from fnmatch import fnmatchcase
+
+##################################################################
+# Constants
+FNAME_IDX = 0
+MSGID_IDX = 1
+START_IDX = 2
+END_IDX = 3
+NUCLEUS_IDX = 4
+SATELLITE_IDX = 5
+
+
+##################################################################
+# Class
+class RSTRelIndex(object):
+    """
+    Inverted index from relation names to the instances of relations.
+
+    The index is built in a single pass over the nodes of every forrest, so
+    that any number of relations can afterwards be extracted without parsing
+    the annotation again.  Every instance of a relation is stored as a tuple
+    of the name of the annotation file, the id of the message, the start and
+    end offsets of the satellite, and the ids of the nucleus and the
+    satellite.  String representations of nodes are only rendered by
+    `get_texts', i.e., only for the relations which are extracted, and only
+    the forrests of files containing such relations are requested for it.
+    Relations are stored by their names (and not by the codes of the
+    relation vocabulary), so that pickled indices do not depend on the order
+    in which relation schemes were read.
+
+    Methods:
+    add_forrest - add relations of a forrest to the index
+    update - add all relations of another index
+    get_relnames - return names of indexed relations matching patterns
+    get_records - return instances of a relation
+    get_texts - return string representations of nuclei and satellites of
+                a relation
+
+    """
+
+    def __init__(self):
+        """
+        Class constructor.
+        """
+        self._relname2records = defaultdict(list)
+
+    def __len__(self):
+        """
+        Return number of indexed relation instances.
+
+        @return integer
+        """
+        return sum(len(irecords)
+                   for irecords in self._relname2records.itervalues())
+
+    def __contains__(self, a_relname):
+        """
+        Check whether relation has indexed instances.
+
+        @param a_relname - name of the relation
+
+        @return \c True if relation has instances, \c False otherwise
+        """
+        return a_relname in self._relname2records
+
+    def add_forrest(self, a_forrest, a_fname=""):
+        """
+        Add relations of a forrest to the index.
+
+        @param a_forrest - RST forrest whose relations should be indexed
+        @param a_fname - name of the annotation file of the forrest
+
+        @return \c void
+        """
+        nuc = None
+        # every node of the forrest is visited exactly once
+        for sat in a_forrest.iter_subtrees(TREE_ALL):
+            nuc = sat.parent
+            if not sat.relname or nuc is None:
+                continue
+            self._relname2records[sat.relname].append(
+                (a_fname, sat.msgid, sat.start, sat.end, nuc.id, sat.id))
+
+    def update(self, a_index):
+        """
+        Add all relations of another index.
+
+        @param a_index - RSTRelIndex whose relations should be added
+
+        @return \c void
+        """
+        for relname, records in a_index._relname2records.iteritems():
+            self._relname2records[relname].extend(records)
+
+    def get_relnames(self, a_patterns=None):
+        """
+        Return names of indexed relations matching patterns.
+
+        @param a_patterns - iterable of relation names or shell-style
+                            patterns (e.g., `r-*'), all relations are
+                            returned if \c None
+
+        @return sorted list of relation names
+        """
+        relnames = self._relname2records.iterkeys()
+        if a_patterns is None:
+            return sorted(relnames)
+        a_patterns = list(a_patterns)
+        return sorted(relname for relname in relnames
+                      if any(fnmatchcase(relname, ipattern)
+                             for ipattern in a_patterns))
+
+    def get_records(self, a_relname):
+        """
+        Return instances of a relation.
+
+        @param a_relname - name of the relation
+
+        @return list of tuples (empty if relation is not indexed)
+        """
+        return self._relname2records.get(a_relname, [])
+
+    def get_texts(self, a_relname, a_get_forrest):
+        """
+        Return string representations of nuclei and satellites of relation.
+
+        @param a_relname - name of the relation
+        @param a_get_forrest - callable returning RST forrest of annotation
+                               file (it is called once for every file
+                               containing instances of the relation)
+
+        @return list of 2-tuples with minimal string representations of
+                nuclei and satellites (in the order of `get_records')
+        """
+        ret = []
+        fname2forrest = {}
+        forrest = None
+        for irec in self.get_records(a_relname):
+            forrest = fname2forrest.get(irec[FNAME_IDX])
+            if forrest is None:
+                forrest = fname2forrest[irec[FNAME_IDX]] = \
+                    a_get_forrest(irec[FNAME_IDX])
+            ret.append((forrest.get_tree(irec[NUCLEUS_IDX]).str_min(),
+                        forrest.get_tree(irec[SATELLITE_IDX]).str_min()))
+        return ret
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""
+Module providing functions for reading relation schemes.
+
+Constants:
+HYP_REL - type of hypotactic relations
+PAR_REL - type of paratactic relations
+
+Functions:
+read_relscheme - read relation names and their types from scheme file
+
+"""
+
+##################################################################
+# Imports
+from exceptions import RSTBadFormat
+
+import htmlentitydefs
+import xml.etree.ElementTree as ET
+
+##################################################################
+# Constants
+HYP_REL = "hyp"
+PAR_REL = "par"
+
+
+##################################################################
+# Methods
+def read_relscheme(a_fname):
+    """
+    Read relation names and their types from scheme file.
+
+    Descriptions of relations in scheme files might contain HTML entities
+    (e.g., `&auml;') which are not declared in their DTD, so these entities
+    are resolved by the parser itself.
+
+    @param a_fname - name of the scheme file
+
+    @return dictionary mapping relation name to its type (`hyp' or `par')
+    """
+    iparser = ET.XMLParser()
+    iparser.entity.update((iname, unichr(icode)) for iname, icode in
+                          htmlentitydefs.name2codepoint.iteritems())
+    ret = {}
+    rtype = None
+    for irel in ET.parse(a_fname, iparser).getroot().iter("relation"):
+        rtype = irel.get("type")
+        if rtype != HYP_REL and rtype != PAR_REL:
+            raise RSTBadFormat(
+                "Unknown type of relation {:s}: {:s}".format(
+                    irel.get("name"), repr(rtype)))
+        ret[irel.get("name")] = rtype
+    return ret
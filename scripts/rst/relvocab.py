@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""
+Module providing compiled vocabulary of RST relations.
+
+Constants:
+SPAN_REL - name of the relation connecting nucleus of hypotactic relation
+           to its span
+SPAN_CODE - code of the span relation
+NO_REL - code of missing relations
+SCHEME_DIR - directory containing relation schemes of the corpus
+DFLT_RELSCHEME - default scheme of relations within messages
+DFLT_ERELSCHEME - default scheme of relations between messages
+RELATIONS - vocabulary compiled from the default schemes (which are only
+            read when relations are looked up for the first time)
+
+Class:
+RSTRelVocab - mapping between relation names and integer codes along with
+              relation types
+
+"""
+
+##################################################################
+# Imports
+from constants import EXT_REL_PRFX
+from relscheme import read_relscheme, HYP_REL, PAR_REL
+
+import os
+
+
+##################################################################
+# Class
+class RSTRelVocab(object):
+    """
+    Mapping between relation names and dense integer codes.
+
+    Relations of the schemes get the codes 1, 2, ... in alphabetic order
+    (internal relations first), code 0 (SPAN_CODE) is reserved for the
+    `span' relation.  Relations which are not defined by any of the schemes
+    get codes when they are seen for the first time, so that they can still
+    be stored and compared, but they are reported as unknown and have no
+    type.  Scheme files are only read when relations are looked up for the
+    first time, and further schemes (e.g., those of a project) can be added
+    later on, in which case their relations get the next free codes (or
+    their types if they were seen before).  Types, external flags, and known
+    flags are kept in lists indexed by codes, so that checking them does not
+    involve any string operations.
+
+    Instance Variables:
+    relnames - list of relation names (indexed by codes)
+
+    Methods:
+    add_scheme - add relations of a scheme to the vocabulary
+    intern - return code of relation, assigning a new code if necessary
+    get_code - return code of relation without assigning new codes
+    get_name - return name of relation corresponding to code
+    get_type - return type of relation (`hyp' or `par')
+    is_known - check whether relation is defined by the schemes
+    is_hyp - check whether relation is hypotactic
+    is_par - check whether relation is paratactic
+    is_nuc - check whether relation can go out from a nucleus node
+    is_external - check whether relation connects different messages
+
+    """
+
+    def __init__(self, a_relscheme=None, a_erelscheme=None):
+        """
+        Class constructor.
+
+        @param a_relscheme - name of the scheme file with relations within
+                             messages (\c None if there is no such scheme)
+        @param a_erelscheme - name of the scheme file with relations between
+                              messages (\c None if there is no such scheme)
+        """
+        self.relnames = []
+        self._types = []
+        self._external = []
+        self._known = []
+        self._name2code = {}
+        self._add(SPAN_REL, None, False, True)
+        # scheme files which have not been read yet
+        self._fnames = [(fname, external) for fname, external in
+                        ((a_relscheme, False), (a_erelscheme, True))
+                        if fname is not None]
+
+    def __len__(self):
+        """
+        Return number of relations with assigned codes.
+
+        @return integer
+        """
+        if self._fnames:
+            self._load()
+        return len(self.relnames)
+
+    def __contains__(self, a_relname):
+        """
+        Check whether relation has a code.
+
+        @param a_relname - name of the relation
+
+        @return \c True if relation has a code
+        """
+        if self._fnames:
+            self._load()
+        return a_relname in self._name2code
+
+    def add_scheme(self, a_scheme, a_external=False):
+        """
+        Add relations of a scheme to the vocabulary.
+
+        @param a_scheme - dictionary mapping relation names to their types
+                          (see read_relscheme)
+        @param a_external - flag indicating scheme of relations between
+                            messages
+
+        @return \c void
+        """
+        if self._fnames:
+            self._load()
+        # schemes are read into dictionaries, so sort their names to make
+        # codes independent of hashing
+        code = None
+        for relname, rtype in sorted(a_scheme.iteritems()):
+            code = self._name2code.get(relname)
+            if code is None:
+                self._add(relname, rtype, a_external, True)
+            elif not self._known[code]:
+                self._types[code] = rtype
+                self._external[code] = a_external
+                self._known[code] = True
+
+    def intern(self, a_relname):
+        """
+        Return code of relation, assigning a new code if necessary.
+
+        @param a_relname - name of the relation (\c None is mapped to NO_REL)
+
+        @return integer code
+        """
+        if a_relname is None:
+            return NO_REL
+        if self._fnames:
+            self._load()
+        try:
+            return self._name2code[a_relname]
+        except KeyError:
+            return self._add(a_relname, None,
+                             a_relname.startswith(EXT_REL_PRFX), False)
+
+    def get_code(self, a_relname):
+        """
+        Return code of relation without assigning new codes.
+
+        @param a_relname - name of the relation
+
+        @return integer code (NO_REL if relation is unknown)
+        """
+        if self._fnames:
+            self._load()
+        return self._name2code.get(a_relname, NO_REL)
+
+    def get_name(self, a_code):
+        """
+        Return name of relation corresponding to code.
+
+        @param a_code - integer code
+
+        @return relation name (\c None for NO_REL)
+        """
+        if a_code == NO_REL:
+            return None
+        return self.relnames[a_code]
+
+    def get_type(self, a_code):
+        """
+        Return type of relation.
+
+        @param a_code - integer code
+
+        @return `hyp', `par', or \c None for the span relation and relations
+                which are not defined by the schemes
+        """
+        if a_code == NO_REL:
+            return None
+        return self._types[a_code]
+
+    def is_known(self, a_code):
+        """
+        Check whether relation is defined by the schemes.
+
+        @param a_code - integer code
+
+        @return \c True if relation is the span relation or is defined by
+                one of the schemes
+        """
+        return a_code != NO_REL and self._known[a_code]
+
+    def is_hyp(self, a_code):
+        """
+        Check whether relation is hypotactic.
+
+        @param a_code - integer code
+
+        @return \c True if relation is hypotactic
+        """
+        return self.get_type(a_code) == HYP_REL
+
+    def is_par(self, a_code):
+        """
+        Check whether relation is paratactic.
+
+        @param a_code - integer code
+
+        @return \c True if relation is paratactic
+        """
+        return self.get_type(a_code) == PAR_REL
+
+    def is_nuc(self, a_code):
+        """
+        Check whether relation can go out from a nucleus node.
+
+        @param a_code - integer code
+
+        @return \c True for the span relation and paratactic relations
+        """
+        return a_code == SPAN_CODE or self.is_par(a_code)
+
+    def is_external(self, a_code):
+        """
+        Check whether relation connects different messages.
+
+        @param a_code - integer code
+
+        @return \c True if relation is defined by the scheme of relations
+                between messages (or carries their prefix)
+        """
+        if a_code == NO_REL:
+            return False
+        return self._external[a_code]
+
+    def _load(self):
+        """
+        Read scheme files passed to the constructor.
+
+        Missing scheme files are skipped, so that the vocabulary can also be
+        used outside of the corpus.
+
+        @return \c void
+        """
+        fnames = self._fnames
+        self._fnames = []
+        for fname, external in fnames:
+            if os.path.exists(fname):
+                self.add_scheme(read_relscheme(fname), external)
+
+    def _add(self, a_relname, a_type, a_external, a_known):
+        """
+        Assign new code to relation.
+
+        @param a_relname - name of the relation
+        @param a_type - type of the relation
+        @param a_external - flag indicating relation between messages
+        @param a_known - flag indicating relation defined by a scheme
+
+        @return integer code
+        """
+        ret = self._name2code[a_relname] = len(self.relnames)
+        self.relnames.append(a_relname)
+        self._types.append(a_type)
+        self._external.append(a_external)
+        self._known.append(a_known)
+        return ret
+
+
+##################################################################
+# Constants
+SPAN_REL = "span"
+SPAN_CODE = 0
+NO_REL = -1
+SCHEME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, os.pardir, "data", "corpus", "scheme")
+DFLT_RELSCHEME = os.path.join(SCHEME_DIR, "PCC.xml")
+DFLT_ERELSCHEME = os.path.join(SCHEME_DIR, "R-PCC.xml")
+RELATIONS = RSTRelVocab(DFLT_RELSCHEME, DFLT_ERELSCHEME)
@@ -11,15 +11,22 @@ RSTForrest - container class comprising several RST trees
 ##################################################################
 # Imports
 from constants import ENCODING, LIST_SEP, FIELD_SEP, VALUE_SEP, \
-    TERMINAL, XML_FMT, LSP_FMT, PC3_FMT, _INT_NID, _EXT_NID, \
-    _PARENT, _CHILDREN, _RELNAME
+    TERMINAL, NONTERMINAL, TREE_INTERNAL, TREE_EXTERNAL, TREE_ALL, \
+    XML_FMT, LSP_FMT, PC3_FMT, TSV_FMT, \
+    _INT_NID, _EXT_NID, _PARENT, _CHILDREN, _RELNAME, _TEXT, _TYPE, \
+    _OFFSETS, _MULTINUC
 
 from exceptions import RSTBadFormat, RSTBadStructure
-from rsttree import RSTTree
+from idmap import NODE_IDS, MSG_IDS
+from relvocab import RELATIONS, SPAN_CODE, NO_REL
+from rsttree import RSTTree, NO_CHILDREN, NO_OFFSET
+from writers import LSPWriter, get_writer
 
 from collections import defaultdict
 from itertools import chain
+from StringIO import StringIO
 
+import cPickle
 import sys
 
 
@@ -32,17 +39,35 @@ class RSTForrest(object):
     Variables:
     trees - set of most prominent RST trees
     msgid2txt - mapping from message id to text
-    msgid2iroots - mapping from message id to its corresponding (sub-)tree
+    msgid2iroots - mapping from message code (see MSG_IDS) to its
+               corresponding (sub-)trees (use `get_iroots' to look them up
+               by message id)
     msgid2discid - dictionary mapping message id to its current number in
                discussions
+    relations - hypotactic relations (4-tuples of relation name, span,
+               nucleus, and satellite ids) and paratactic relations (3-tuples
+               of relation name, span id, and tuple of nucleus ids) in the
+               order in which they were linked
+    segments_only - flag indicating that only segments (without spans and
+               relations) are read from input files
+    unknown_relnames - set of relation names which are not defined by the
+               relation schemes (see RELATIONS)
 
     Methods:
     clear - public method for re-setting data
+    get_iroots - return root trees of the message with the given id
+    get_nodes - return all nodes of the forrest
+    get_tree - return tree of the node with the given id
+    iter_subtrees - iterate over all nodes of the forrest
+    load - restore forrest from its binary representation
     parse - general method for parsing files
+    save - store forrest in compact binary form
+    write - output forrest in LSP, PC3, or XML format
 
     """
 
-    def __init__(self, a_fmt, a_msgid2txt, a_msgid2discid=None):
+    def __init__(self, a_fmt, a_msgid2txt, a_msgid2discid=None,
+                 a_stream=False, a_segments_only=False):
         """
         Class constructor.
 
@@ -50,22 +75,36 @@ class RSTForrest(object):
         @param a_msgid2txt - dictionary mapping message id to its text
         @param a_msgid2discid - dictionary mapping message id to its current
                         number in discussions
+        @param a_stream - parse input files incrementally without loading
+                        complete documents into memory
+        @param a_segments_only - only read segments of input files skipping
+                        spans and relations
 
         """
+        self.segments_only = a_segments_only
+        self.unknown_relnames = set()
         self.trees = set()
+        self.relations = []
         self.msgid2iroots = defaultdict(set)
         self.msgid2txt = a_msgid2txt
         if a_msgid2discid is None:
             self.msgid2discid = defaultdict(lambda: 0)
         else:
             self.msgid2discid = a_msgid2discid
+        # mapping from message id to its decoded text
+        self._msgid2utxt = {}
         # mapping from node id to its corresponding tree
         self._nid2tree = {}
         # mapping from node id to the id of its corresponding message
         self._nid2msgid = {}
         # set appropriate parse function
         if a_fmt == XML_FMT:
-            self._parse_func = self._parse_xml
+            if a_stream:
+                self._parse_func = self._iterparse_xml
+            else:
+                self._parse_func = self._parse_xml
+        elif a_fmt == TSV_FMT:
+            self._parse_func = self._parse_tsv
         else:
             raise NotImplementedError
 
@@ -75,7 +114,9 @@ class RSTForrest(object):
 
         @return unicode representation of the forrest
         """
-        return u"\n\n".join([unicode(t) for t in self.trees])
+        ostream = StringIO()
+        LSPWriter(ostream, None).write_forrest(self)
+        return ostream.getvalue()
 
     def __str__(self):
         """
@@ -85,6 +126,24 @@ class RSTForrest(object):
         """
         return unicode(self).encode(ENCODING)
 
+    def write(self, a_ostream, a_fmt=XML_FMT, a_encoding=ENCODING):
+        """
+        Output forrest in the given format.
+
+        Nodes are written one by one, so that the output is never kept in
+        memory as a whole.  Forrests written in XML format can be read back
+        with `parse`; forrests read from XML files thereby get the same
+        nodes with the same attributes.
+
+        @param a_ostream - output stream
+        @param a_fmt - output format (LSP_FMT, PC3_FMT, or XML_FMT)
+        @param a_encoding - encoding of the output stream (\c None for
+                        streams which accept unicode strings)
+
+        @return \c void
+        """
+        get_writer(a_fmt, a_ostream, a_encoding).write_forrest(self)
+
     def clear(self):
         """
         Public method for re-setting data.
@@ -92,10 +151,86 @@ class RSTForrest(object):
         @return \c void
         """
         self.trees.clear()
+        del self.relations[:]
+        self.unknown_relnames.clear()
         self.msgid2iroots.clear()
+        self._msgid2utxt.clear()
         self._nid2tree.clear()
         self._nid2msgid.clear()
 
+    def get_nodes(self):
+        """
+        Return all nodes of the forrest.
+
+        Node ids are not guaranteed to be unique, so nodes are collected by
+        following the links between them rather than from their ids.
+
+        @return list of RST trees (each node is listed exactly once)
+        """
+        ret = []
+        seen = set()
+        itree = None
+        inodes = list(chain(self._nid2tree.itervalues(), self.trees,
+                            chain.from_iterable(self.msgid2iroots.itervalues())))
+        while inodes:
+            itree = inodes.pop()
+            if id(itree) in seen:
+                continue
+            seen.add(id(itree))
+            ret.append(itree)
+            inodes.extend(itree.ichildren)
+            inodes.extend(itree.echildren)
+            if itree.parent is not None:
+                inodes.append(itree.parent)
+        return ret
+
+    def get_tree(self, a_id):
+        """
+        Return tree of the node with the given id.
+
+        @param a_id - string id of the node
+
+        @return RSTTree or \c None if no such node exists
+        """
+        return self._nid2tree.get(NODE_IDS.get_code(a_id))
+
+    def get_iroots(self, a_msgid):
+        """
+        Return root trees of the message with the given id.
+
+        @param a_msgid - string id of the message
+
+        @return set of RST trees (empty if the message has no trees)
+        """
+        return self.msgid2iroots.get(MSG_IDS.get_code(a_msgid), NO_CHILDREN)
+
+    def iter_subtrees(self, a_flag=TREE_ALL, a_postorder=False):
+        """
+        Iterate over all nodes of the forrest without recursion.
+
+        Traversal starts from the most prominent trees (if external nodes are
+        requested) and from the roots of messages (if internal nodes are
+        requested).  Every node is visited only once, even if it is reachable
+        from several roots.
+
+        @param a_flag - (optional) flag indicating which nodes (internal or
+                        external, or both) should be visited
+        @param a_postorder - (optional) visit children before their parents
+
+        @return iterator over RST trees
+        """
+        visited = set()
+        iroots = []
+        if a_flag & TREE_EXTERNAL:
+            iroots.append(sorted(self.trees))
+        if a_flag & TREE_INTERNAL:
+            iroots.extend(sorted(self.msgid2iroots[mid])
+                          for mid in sorted(self.msgid2iroots,
+                                            key=self._get_discid))
+        for iroot in chain.from_iterable(iroots):
+            for itree in iroot.iter_subtrees(a_flag, a_postorder, visited):
+                yield itree
+
     def parse(self, a_file):
         """
         General method for parsing files with RST forrests.
@@ -106,9 +241,77 @@ class RSTForrest(object):
         """
         self._parse_func(a_file)
 
+    def save(self, a_ostream):
+        """
+        Store forrest in compact binary form.
+
+        All trees are stored as flat records in which links between nodes are
+        replaced by record indices, so that neither storing nor restoring the
+        forrest requires recursion.
+
+        @param a_ostream - binary output stream
+
+        @return \c void
+        """
+        nodes = self.get_nodes()
+        node2idx = dict((id(itree), i) for i, itree in enumerate(nodes))
+        records = [(itree.id, itree.msgid, itree.discid,
+                    -1 if itree.parent is None else node2idx[id(itree.parent)],
+                    itree.relname, itree.etype, itree.external,
+                    itree.nucleus, itree.type, itree.terminal,
+                    itree.start, itree.end, itree.t_start, itree.t_end,
+                    self._get_text_record(itree),
+                    [node2idx[id(ch)] for ch in itree.ichildren],
+                    [node2idx[id(ch)] for ch in itree.echildren])
+                   for itree in nodes]
+        nid2tree = [node2idx[id(itree)] for itree in self._nid2tree.itervalues()]
+        trees = [node2idx[id(itree)] for itree in self.trees]
+        iroots = [(MSG_IDS.get_id(mid), [node2idx[id(itree)] for itree in iroots])
+                  for mid, iroots in self.msgid2iroots.iteritems()]
+        cPickle.dump((records, nid2tree, trees, iroots, self.relations),
+                     a_ostream, cPickle.HIGHEST_PROTOCOL)
+
+    def load(self, a_istream):
+        """
+        Restore forrest previously stored with `save`.
+
+        @param a_istream - binary input stream
+
+        @return \c void
+        """
+        self.clear()
+        records, nid2tree, trees, iroots, self.relations = \
+            cPickle.load(a_istream)
+        nodes = [RSTTree(irec[0]) for irec in records]
+        itree = None
+        for itree, irec in zip(nodes, records):
+            (itree.msgid, itree.discid) = irec[1:3]
+            if irec[3] >= 0:
+                itree.parent = nodes[irec[3]]
+            self._set_relname(itree, irec[4])
+            (itree.etype, itree.external, itree.nucleus,
+             itree.type, itree.terminal, itree.start, itree.end,
+             itree.t_start, itree.t_end) = irec[5:14]
+            itxt, txt_start, txt_end = irec[14]
+            if itxt is None:
+                itxt = self._get_text(itree.msgid)
+            itree.bind_text(itxt, txt_start, txt_end)
+        for i in nid2tree:
+            itree = nodes[i]
+            self._nid2tree[itree.nid] = itree
+            self._nid2msgid[itree.nid] = itree.mid
+        # children sets can only be populated when all hash keys are known
+        for itree, irec in zip(nodes, records):
+            itree.ichildren = (nodes[i] for i in irec[15])
+            itree.echildren = (nodes[i] for i in irec[16])
+        self.trees.update(nodes[i] for i in trees)
+        for msgid, idcs in iroots:
+            self.msgid2iroots[MSG_IDS.intern(msgid)].update(nodes[i]
+                                                            for i in idcs)
+
     def _parse_xml(self, a_file):
         """
-        Parse line in tab-separated value format.
+        Parse XML file.
 
         @param a_file - XML file to parse
 
@@ -117,91 +320,389 @@ class RSTForrest(object):
         import xml.etree.ElementTree as ET
         idoc = ET.parse(a_file).getroot()
         # read segments and spans
-        iid = -1
-        itree = None
-        inodes = chain(idoc.iterfind("segments/segment"),
-                       idoc.iterfind("spans/span"))
+        if self.segments_only:
+            inodes = idoc.iterfind("segments/segment")
+        else:
+            inodes = chain(idoc.iterfind("segments/segment"),
+                           idoc.iterfind("spans/span"))
         for inode in inodes:
-            iid = inode.attrib.pop("id")
-            inode.attrib["type"] = inode.tag
-            inode.attrib["discid"] = \
-                self.msgid2discid[inode.attrib.get("msgid")]
-            # get/create appropriate tree for the given node id
-            itree = RSTTree(iid, **inode.attrib)
-            self._nid2tree[iid] = itree
-            self.trees.add(itree)
-            self._nid2msgid[iid] = itree.msgid
-            # set `t_start` and `t_end` of terminal nodes
-            if itree.terminal:
-                itree.start = itree.t_start = (self.msgid2discid[itree.msgid],
-                                               itree.start)
-                itree.end = itree.t_end = (self.msgid2discid[itree.msgid],
-                                           itree.end)
-                if not itree.text and not self.msgid2txt is None:
-                    assert itree.msgid in self.msgid2txt, \
-                        "No text specified for terminal node {:s}".format(
-                            itree.msgid)
-                    itext = self.msgid2txt[itree.msgid]
-                    assert itree.end[-1] <= len(self.msgid2txt[itree.msgid]), \
-                        "End offset of node {:s} exceeds text length of its" \
-                        " message {:s} ({:d} vs. {:d})".format(
-                            itree.id, itree.msgid, itree.t_end[-1],
-                            len(self.msgid2txt[itree.msgid]))
-                    itree.text = itext[itree.t_start[-1]:itree.t_end[-1]]
-                    itree.adjust_offsets()
-            else:
-                itree.start = itree.end = (-1, -1)
-            if not itree.external or itree.etype == TERMINAL:
-                self.msgid2iroots[itree.msgid].add(itree)
+            self._add_node(inode.attrib.pop("id"), inode.tag, inode.attrib)
+        if self.segments_only:
+            return
         # read hypotactic relations
-        iroots = None
-        span_id = nuc_id = sat_id = None
-        span_tree = nuc_tree = sat_tree = None
         for irel in idoc.iterfind(".//hypRelation"):
-            span_id = irel.find("spannode").get("idref")
-            span_tree = self._nid2tree[span_id]
-            nuc_id = irel.find("nucleus").get("idref")
-            nuc_tree = self._nid2tree[nuc_id]
-            sat_id = irel.find("satellite").get("idref")
-            sat_tree = self._nid2tree[sat_id]
-            # update parent and child information of nucleus and satellite
-            nuc_tree.relname = "span"
+            self._add_hyp_relation(*self._get_hyp_relation(irel))
+        # read paratactic relations
+        for irel in idoc.iterfind(".//parRelation"):
+            self._add_par_relation(*self._get_par_relation(irel))
+
+    def _iterparse_xml(self, a_file):
+        """
+        Parse XML file incrementally without keeping the whole document in memory.
+
+        Segments and spans are converted to RST trees as soon as their closing
+        tags are read, after which the corresponding XML elements are
+        discarded.  Hypotactic relations are linked as soon as all of their
+        nodes are known.  Paratactic relations are only remembered as tuples
+        of node ids and linked at the end of the document, so that the
+        resulting forrest is identical to the one produced by `_parse_xml`.
+
+        @param a_file - XML file to parse
+
+        @return \c void
+        """
+        import xml.etree.ElementTree as ET
+        ancestors = []
+        hyp_rels = []
+        par_rels = []
+        irel = None
+        for ievent, ielem in ET.iterparse(a_file, events=("start", "end")):
+            if ievent == "start":
+                ancestors.append(ielem)
+                continue
+            ancestors.pop()
+            if ielem.tag == "segment":
+                self._add_node(ielem.attrib.pop("id"), ielem.tag, ielem.attrib)
+            elif ielem.tag not in ("span", "hypRelation", "parRelation"):
+                continue
+            elif self.segments_only:
+                # spans and relations are discarded without being processed
+                pass
+            elif ielem.tag == "span":
+                self._add_node(ielem.attrib.pop("id"), ielem.tag, ielem.attrib)
+            elif ielem.tag == "hypRelation":
+                irel = self._get_hyp_relation(ielem)
+                if all(nid is None or self.get_tree(nid) is not None
+                       for nid in irel[1:]):
+                    self._add_hyp_relation(*irel)
+                else:
+                    hyp_rels.append(irel)
+            else:
+                par_rels.append(self._get_par_relation(ielem))
+            # remove processed element from its parent
+            if ancestors:
+                del ancestors[-1][:]
+        # link relations whose nodes were defined after them
+        for irel in hyp_rels:
+            self._add_hyp_relation(*irel)
+        for irel in par_rels:
+            self._add_par_relation(*irel)
+
+    def _parse_tsv(self, a_file):
+        """
+        Parse file in tab-separated value format (raw RSTTool output).
+
+        Each `nid' line describes a single node together with the id of its
+        parent; each `msgs2extnid' line describes a hypotactic relation
+        between two messages (with its span, nucleus, satellite, and name),
+        which is linked like the hypotactic relations of XML files.  All
+        nodes are created in one pass over the file, after which the
+        collected links are resolved without any further reading.
+
+        @param a_file - TSV file (or name of the file) to parse
+
+        @return \c void
+        """
+        if isinstance(a_file, basestring):
+            with open(a_file) as ifile:
+                return self._parse_tsv(ifile)
+        # links from children to their parents
+        links = []
+        # relations between messages (name, span, nucleus, and satellite ids)
+        ext_rels = []
+        # ids of multinuclear spans
+        multinucs = set()
+        fields = None
+        nid = ntype = None
+        msgids = attrs = iattrs = None
+        for iline in a_file:
+            iline = iline.rstrip("\r\n")
+            if not iline:
+                continue
+            fields = iline.split(FIELD_SEP)
+            if fields[0] == _EXT_NID:
+                if self.segments_only:
+                    continue
+                if len(fields) < 3:
+                    raise RSTBadFormat(iline)
+                attrs = fields[2].split(VALUE_SEP)
+                if len(attrs) < 5:
+                    raise RSTBadFormat(iline)
+                ext_rels.append((attrs[5] if len(attrs) > 5 else None,
+                                 attrs[0], attrs[3], attrs[4]))
+                continue
+            elif fields[0] != _INT_NID or len(fields) < 3:
+                raise RSTBadFormat(iline)
+            nid = fields[1]
+            msgids = fields[2].split(VALUE_SEP)
+            attrs = {}
+            for ifield in fields[3:]:
+                ifield = ifield.split(VALUE_SEP)
+                attrs[ifield[0]] = ifield[1:]
+            ntype = attrs.get(_TYPE, [NONTERMINAL])[0]
+            iattrs = {"msgid": msgids[0]}
+            if ntype == TERMINAL:
+                if len(attrs.get(_OFFSETS, ())) != 2:
+                    raise RSTBadFormat(iline)
+                iattrs["start"], iattrs["end"] = attrs[_OFFSETS]
+                # RSTTool stores the text of each segment along with its
+                # offsets, which may also include trailing separators
+                iattrs["text"] = VALUE_SEP.join(attrs.get(_TEXT, ()))
+                self._add_node(nid, "segment", iattrs)
+            elif self.segments_only:
+                continue
+            else:
+                if ntype == _MULTINUC:
+                    multinucs.add(nid)
+                # nodes spanning several messages are external spans
+                if len(msgids) > 1:
+                    iattrs["external"] = 1
+                    iattrs["etype"] = NONTERMINAL
+                self._add_node(nid, "span", iattrs)
+            if self.segments_only:
+                continue
+            if attrs.get(_PARENT, [""])[0]:
+                links.append((nid, attrs[_PARENT][0],
+                              attrs.get(_RELNAME, [""])[0]))
+        # link child nodes to their parents: nuclei (children of multinuclear
+        # spans or children linked by relations which go out from nuclei)
+        # are linked like paratactic relations with a single nucleus, and
+        # satellites like hypotactic relations without span
+        for chld_id, prnt_id, relname in links:
+            if self.get_tree(chld_id) is None or \
+                    self.get_tree(prnt_id) is None:
+                raise RSTBadStructure(
+                    "Unknown node in link {:s} -> {:s}".format(chld_id,
+                                                               prnt_id))
+            if prnt_id in multinucs or \
+                    RELATIONS.is_nuc(RELATIONS.get_code(relname)):
+                self._add_par_relation(relname or None, prnt_id, (chld_id,))
+            else:
+                self._add_hyp_relation(relname or None, None, prnt_id,
+                                       chld_id)
+        # RSTTool keeps a separate span for every pair of related messages,
+        # even if their nucleus is shared with other relations (entries
+        # referring to deleted nodes are skipped)
+        for irel in ext_rels:
+            if all(self.get_tree(nid) is not None for nid in irel[1:]):
+                self._add_hyp_relation(*irel)
+
+    def _get_hyp_relation(self, a_elem):
+        """
+        Obtain name and node ids of a hypotactic relation from XML element.
+
+        @param a_elem - XML element representing hypotactic relation
+
+        @return 4-tuple with relation name, span, nucleus, and satellite ids
+                (span id is \c None if relation has no span node)
+        """
+        ispan = a_elem.find("spannode")
+        return (a_elem.get("relname"),
+                None if ispan is None else ispan.get("idref"),
+                a_elem.find("nucleus").get("idref"),
+                a_elem.find("satellite").get("idref"))
+
+    def _get_par_relation(self, a_elem):
+        """
+        Obtain name and node ids of a paratactic relation from XML element.
+
+        @param a_elem - XML element representing paratactic relation
+
+        @return 3-tuple with relation name, span id, and tuple of nucleus ids
+        """
+        return (a_elem.get("relname"),
+                a_elem.find("spannode").get("idref"),
+                tuple(inuc.get("idref") for inuc in a_elem.iterfind("nucleus")))
+
+    def _add_node(self, a_id, a_type, a_attrs):
+        """
+        Create new RST tree for a segment or span and add it to the forrest.
+
+        @param a_id - id of the new node
+        @param a_type - type of the new node (`segment' or `span')
+        @param a_attrs - dictionary of node attributes
+
+        @return pointer to the created tree
+        """
+        a_attrs["type"] = a_type
+        a_attrs["discid"] = self.msgid2discid[a_attrs.get("msgid")]
+        # nodes which are defined several times are replaced by their last
+        # definition
+        itree = self.get_tree(a_id)
+        if itree is not None:
+            self.trees.discard(itree)
+            self.msgid2iroots[itree.mid].discard(itree)
+        itree = RSTTree(a_id, **a_attrs)
+        self._nid2tree[itree.nid] = itree
+        self.trees.add(itree)
+        self._nid2msgid[itree.nid] = itree.mid
+        # set `t_start` and `t_end` of terminal nodes
+        if itree.terminal:
+            itree.start = itree.t_start = (self.msgid2discid[itree.msgid],
+                                           itree.start)
+            itree.end = itree.t_end = (self.msgid2discid[itree.msgid],
+                                       itree.end)
+            if not itree.text and not self.msgid2txt is None:
+                assert itree.msgid in self.msgid2txt, \
+                    "No text specified for terminal node {:s}".format(
+                        itree.msgid)
+                itext = self._get_text(itree.msgid)
+                # offsets count characters, but the end offsets of some
+                # segments which close their messages lie between the length
+                # of the text and the length of its UTF-8 encoding, so they
+                # are moved to the end of the text
+                assert itree.start[-1] <= len(itext), \
+                    "Start offset of node {:s} exceeds text length of its" \
+                    " message {:s} ({:d} vs. {:d})".format(
+                        itree.id, itree.msgid, itree.t_start[-1], len(itext))
+                if itree.end[-1] > len(itext):
+                    itree.end = itree.t_end = (itree.end[0], len(itext))
+                itree.bind_text(itext, itree.t_start[-1], itree.t_end[-1])
+            itree.adjust_offsets()
+        else:
+            itree.start = itree.end = NO_OFFSET
+        if not itree.external_span:
+            self.msgid2iroots[itree.mid].add(itree)
+        return itree
+
+    def _set_relname(self, a_tree, a_relname):
+        """
+        Set relation of tree and remember relations unknown to the schemes.
+
+        @param a_tree - RST tree whose relation should be set
+        @param a_relname - name of the relation
+
+        @return \c void
+        """
+        a_tree.relname = a_relname
+        if a_tree.rid != NO_REL and not RELATIONS.is_known(a_tree.rid):
+            self.unknown_relnames.add(a_relname)
+
+    def _get_discid(self, a_mid):
+        """
+        Return number of message in discussion.
+
+        @param a_mid - code of the message id
+
+        @return integer or \c None if message is not in the discussion
+        """
+        return self.msgid2discid.get(MSG_IDS.get_id(a_mid))
+
+    def _get_text(self, a_msgid):
+        """
+        Return decoded text of the given message.
+
+        Texts are decoded only once, so that all nodes of a message can share
+        the same text buffer.
+
+        @param a_msgid - id of the message
+
+        @return unicode text of the message
+        """
+        if a_msgid not in self._msgid2utxt:
+            itext = self.msgid2txt[a_msgid]
+            if isinstance(itext, str):
+                itext = itext.decode(ENCODING)
+            self._msgid2utxt[a_msgid] = itext
+        return self._msgid2utxt[a_msgid]
+
+    def _get_text_record(self, a_tree):
+        """
+        Return representation of node's text used by `save`.
+
+        @param a_tree - node whose text should be stored
+
+        @return 3-tuple of text buffer (\c None if it is the text of node's
+                message), start and end offset
+        """
+        itxt, txt_start, txt_end = a_tree.get_text_span()
+        if self.msgid2txt is not None and a_tree.msgid in self.msgid2txt \
+                and itxt is self._get_text(a_tree.msgid):
+            itxt = None
+        return (itxt, txt_start, txt_end)
+
+    def _is_internal_link(self, a_chld, a_prnt):
+        """
+        Check whether child node is linked to a parent from the same message.
+
+        External spans may also belong to the message of their nucleus, but
+        they do not subsume it, so that message nodes linked to such spans
+        remain roots of their messages.
+
+        @param a_chld - child node
+        @param a_prnt - parent node
+
+        @return \c True if the child is no longer a root of its message
+        """
+        return a_chld.mid == a_prnt.mid and \
+            not a_prnt.external_span
+
+    def _add_hyp_relation(self, a_relname, a_span_id, a_nuc_id, a_sat_id):
+        """
+        Link nucleus and satellite of a hypotactic relation.
+
+        @param a_relname - name of the relation
+        @param a_span_id - id of the span node (\c None if nucleus is not
+                        enclosed by any span)
+        @param a_nuc_id - id of the nucleus node
+        @param a_sat_id - id of the satellite node
+
+        @return \c void
+        """
+        self.relations.append((a_relname, a_span_id, a_nuc_id, a_sat_id))
+        nuc_tree = self.get_tree(a_nuc_id)
+        sat_tree = self.get_tree(a_sat_id)
+        span_tree = None
+        # parent of the nucleus has to be set before the satellite is added,
+        # since offsets of the satellite are propagated to it
+        if a_span_id is not None:
+            span_tree = self.get_tree(a_span_id)
+            nuc_tree.rid = SPAN_CODE
+            nuc_tree.parent = span_tree
+            nuc_tree.nucleus = True
+        # update parent and child information of satellite
+        self._set_relname(sat_tree, a_relname)
+        sat_tree.parent = nuc_tree
+        sat_tree.nucleus = False
+        nuc_tree.add_children(sat_tree)
+        self.trees.discard(sat_tree)
+        if self._is_internal_link(sat_tree, nuc_tree):
+            self.msgid2iroots[sat_tree.mid].discard(sat_tree)
+        if span_tree is None:
+            return
+        # update child information of span
+        span_tree.add_children(nuc_tree)
+        self.trees.discard(nuc_tree)
+        if self._is_internal_link(nuc_tree, span_tree):
+            self.msgid2iroots[nuc_tree.mid].discard(nuc_tree)
+
+    def _add_par_relation(self, a_relname, a_span_id, a_nuc_ids):
+        """
+        Link nuclei of a paratactic relation.
+
+        @param a_relname - name of the relation
+        @param a_span_id - id of the span node
+        @param a_nuc_ids - ids of the nucleus nodes
+
+        @return \c void
+        """
+        self.relations.append((a_relname, a_span_id, tuple(a_nuc_ids)))
+        span_tree = self.get_tree(a_span_id)
+        internal = True
+        nuc_tree = None
+        for nuc_id in a_nuc_ids:
+            nuc_tree = self.get_tree(nuc_id)
+            self._set_relname(nuc_tree, a_relname)
             nuc_tree.parent = span_tree
             nuc_tree.nucleus = True
-            sat_tree.relname = irel.get("relname")
-            sat_tree.parent = nuc_tree
-            sat_tree.nucleus = False
-            # update child information of nucleus and span
-            nuc_tree.add_children(sat_tree)
+            # update child information of span
             span_tree.add_children(nuc_tree)
-            # remove nucleus and satellite from the list of tree roots
-            self.trees.discard(sat_tree)
             self.trees.discard(nuc_tree)
-            # remove nucleus and satellite from the list of internal message
-            # tree roots
-            if nuc_tree.msgid == span_tree.msgid:
-                iroots = self.msgid2iroots[nuc_tree.msgid]
-                iroots.discard(sat_tree)
-                iroots.discard(nuc_tree)
-        # read paratactic relations
-        relname = ""
-        internal = False
-        for irel in idoc.iterfind(".//parRelation"):
-            relname = irel.get("relname")
-            span_id = irel.find("spannode").get("idref"); span_tree = self._nid2tree[span_id]
-            internal = True
-            for inuc in irel.iterfind("nucleus"):
-                nuc_id = inuc.get("idref"); nuc_tree = self._nid2tree[nuc_id]
-                nuc_tree.relation = relname; nuc_tree.parent = span_tree; nuc_tree.nucleus = True
-                # update child information of span
-                span_tree.add_children(nuc_tree)
-                self.trees.discard(nuc_tree)
-                # check if the nucleus belongs to the same message
-                if nuc_tree.msgid != span_tree.msgid:
-                    internal = False
-            # remove nucleus and satellite from the list of internal message tree roots
-            if internal:
-                iroots =  self.msgid2iroots[span_tree.msgid]
-                for inuc in irel.iterfind("nucleus"):
-                    nuc_id = inuc.get("idref"); nuc_tree = self._nid2tree[nuc_id]
-                    iroots.discard(nuc_tree)
+            # check if the nucleus belongs to the same message
+            if not self._is_internal_link(nuc_tree, span_tree):
+                internal = False
+        # remove nuclei from the list of internal message tree roots
+        if internal:
+            iroots = self.msgid2iroots[span_tree.mid]
+            for nuc_id in a_nuc_ids:
+                iroots.discard(self.get_tree(nuc_id))
@@ -4,9 +4,9 @@
 Module providing class for RSTTree.
 
 Constants:
-DQUOTES - regular expression matching double quotes
-ESCAPED - substitution string used to escape quotes
 EXT_REL_PRFX - prefix of external relations
+NO_CHILDREN - immutable empty set shared by all nodes without children
+NO_OFFSET - offset shared by all nodes whose offset is not known
 
 Class:
 RSTTree - class representing single RST tree
@@ -21,17 +21,21 @@ RSTTree - class representing single RST tree
 # Imports
 from constants import ENCODING, LIST_SEP, FIELD_SEP, VALUE_SEP, \
     XML_FMT, TREE_INTERNAL, TREE_EXTERNAL, TREE_ALL, \
-    TERMINAL, NONTERMINAL, NUC_RELS, _CHILDREN, _TEXT, _OFFSETS
+    TERMINAL, NONTERMINAL, EXT_REL_PRFX, _CHILDREN, _TEXT, _OFFSETS
 from exceptions import RSTBadFormat, RSTBadLogic, RSTBadStructure
+from idmap import NODE_IDS, MSG_IDS, NO_ID
+from relvocab import RELATIONS, NO_REL
+from writers import LSPWriter, QUOTE, ESCAPED
+
+from itertools import chain
+from StringIO import StringIO
 
-import re
 import sys
 
 ##################################################################
 # Constants
-QUOTE = re.compile(u"([\"'])", re.U)
-ESCAPED = ur"\\\1"
-EXT_REL_PRFX = "r-"
+NO_CHILDREN = frozenset()
+NO_OFFSET = (-1, -1)
 
 
 ##################################################################
@@ -42,12 +46,18 @@ class RSTTree(object):
 
     Instance Variables:
     id - id of the root node
+    nid - integer code of the root node id (see NODE_IDS)
     msgid - id of the message to which this tree belongs
+    mid - integer code of the message id (see MSG_IDS)
     discid - id of the message in discussion
     parent - pointer to the parent tree
     relname - relation connecting this tree to its parent
+    rid - integer code of the relation (see RELATIONS)
     ichildren - internal child trees (those which pertain to the same message)
     echildren - external child trees (those which pertain to other messages)
+    external_span - flag indicating that this tree is an external span, i.e.,
+                    a span linking several messages (external nodes of type
+                    `text' only mark message roots linked to such spans)
 
     type - type of this tree (can be either `text' (TERMINAL) or `span' (NONTERMINAL))
     start - start offset of the text
@@ -56,21 +66,37 @@ class RSTTree(object):
     t_end - end offset of the underlying subtree
     terminal - boolean value indicating whether given node is terminal
                or not
-    text - actual text of terminal node
+    text - actual text of terminal node (computed on demand from the text
+           buffer the node refers to)
 
     Methods:
     add_children - add child trees
     adjust_offsets - adjust offsets of terminal nodes to exclude trailining and
                      leading whitespaces
-    get_edus - return list of descendant terminal trees
-    get_subtrees - return list of all descendants (by default, only internal
+    bind_text - let node refer to a span of a shared text buffer
+    get_edus - return sorted descendant terminal trees (cached per flag)
+    get_subtrees - return set of all descendants (by default, only internal
              subtrees are returned)
+    get_text_span - return text buffer of the node along with the offsets of
+             node's text in it
+    invalidate_edus - discard cached EDUs of the tree and its ancestors
+    iter_subtrees - iterate over the tree and its descendants in pre- or
+             post-order without recursion
     unicode_min - return minimal unicode representation of the given tree
     str_min - return minimal string representation of the given tree
     update - update attributes of the given tree
 
+    Nodes keep their attributes in slots, and sets of children are only
+    allocated when the first child of the corresponding type is added, since
+    most nodes of a forrest are leaves.
+
     """
 
+    __slots__ = ("nid", "mid", "discid", "parent", "rid", "etype",
+                 "external", "_echildren", "_ichildren", "nucleus", "type",
+                 "start", "end", "t_start", "t_end", "_txt", "_txt_start",
+                 "_txt_end", "terminal", "_nestedness", "_edus", "_parents")
+
     def __init__(self, a_id, **a_attrs):
         """
         Class constructor.
@@ -79,24 +105,32 @@ class RSTTree(object):
         @param a_attrs - dictionary of attributes of this tree
         """
         self.id = a_id
-        self.msgid = None
+        self.mid = NO_ID
         self.discid = -1
         self.parent = None
-        self.relname = None
+        self.rid = NO_REL
         self.etype = None
         self.external = False
-        self.echildren = set()
-        self.ichildren = set()
+        self._echildren = NO_CHILDREN
+        self._ichildren = NO_CHILDREN
         self.nucleus = False
         self.type = None
-        self.start = (-1, -1)
-        self.end = (-1, -1)
-        self.t_start = (-1, -1) # start position of the whole subtree
-        self.t_end = (-1, -1)   # end position of the whole subtree
-        self.text = ""
+        self.start = NO_OFFSET
+        self.end = NO_OFFSET
+        self.t_start = NO_OFFSET # start position of the whole subtree
+        self.t_end = NO_OFFSET   # end position of the whole subtree
+        # text buffer (usually shared with other nodes of the same message)
+        # and offsets of node's text in this buffer
+        self._txt = u""
+        self._txt_start = self._txt_end = 0
         self.terminal = False
         # nestedness level of this tree (used in print function)
         self._nestedness = 0
+        # mapping from flags to sorted EDUs of this tree (computed on demand)
+        self._edus = None
+        # all trees this tree was linked to as a child (nodes of discussions
+        # can be children of several spans, but have only one `parent')
+        self._parents = ()
         self.update(**a_attrs)
 
     def __eq__(self, a_other):
@@ -109,15 +143,15 @@ class RSTTree(object):
         """
         if not isinstance(a_other, RSTTree):
             raise RSTBadLogic("Can't compare RST tree with {:s}".format(a_other.__class__.__name__))
-        return self.id == a_other.id and self.msgid == a_other.msgid
+        return self.nid == a_other.nid and self.mid == a_other.mid
 
     def __hash__(self):
         """Return hash key for the given element.
 
-        @return tuple: message id, node id
+        @return integer combining codes of node and message id
 
         """
-        return int(self.id) ^ int(self.msgid)
+        return hash((self.nid, self.mid))
 
     def __ne__(self, a_other):
         """
@@ -135,12 +169,15 @@ class RSTTree(object):
 
         @param a_other - tree to compare with
 
+        Trees are ordered by the offsets of their subtrees; trees with the
+        same offsets are ordered by their message and node ids, so that
+        sorting does not depend on the order of sets.
+
         @return \c integer lesser than, equal to, or greater than 0
         """
-        ret = cmp(self.t_start, a_other.t_start)
-        if ret == 0:
-            return cmp(self.t_end, a_other.t_end)
-        return ret
+        return cmp((self.t_start, self.t_end, self.msgid, self.id),
+                   (a_other.t_start, a_other.t_end, a_other.msgid,
+                    a_other.id))
 
     def __str__(self):
         """Produce string representation of the tree.
@@ -154,77 +191,219 @@ class RSTTree(object):
 
         @return unicode representation of the tree
         """
-        ret = u'\t' * self._nestedness
-        ret += u"(" + self.id
-        if self.msgid is not None and (self.parent is None or self.parent.msgid != self.msgid):
-            ret += u" (msgid " + self._escape_text(self.msgid) + ")"
-        ret += u" (type " + self._escape_text(self.type or "") + ")"
-        if self.relname:
-            ret += u" (relname " + self._escape_text(self.relname) + ")"
-        if self.terminal or self.start >= 0:
-            self.terminal = True
-            ret += u" (start " + unicode(self.start) + ")"
-            ret += u" (end " + unicode(self.end) + ")"
-            ret += u" (text " + self._escape_text(self.text) + ")"
-        # append internal nodes to the output
-        ret += self._unicode_children(self.ichildren)
-        # append external nodes to the output
-        ret += self._unicode_children(self.echildren)
-        ret += u")"
-        return ret
+        ostream = StringIO()
+        LSPWriter(ostream, None).write_tree(self, self._nestedness)
+        return ostream.getvalue()
 
     def str_min(self, a_flag = TREE_INTERNAL, *a_attrs):
         """
         Return minimal string representation of the given tree.
 
+        @param a_flag - flag indicating which descendants (internal or
+                        external, or both) should be printed
         @param a_attrs - attributes that should be printed for trees
 
-        @return minimal unicode representation
+        @return minimal encoded representation
         """
-        return self.unicode_min(a_flag, a_attrs).encode(ENCODING)
+        return self.unicode_min(a_flag, *a_attrs).encode(ENCODING)
 
     def unicode_min(self, a_flag=TREE_INTERNAL, *a_attrs):
         """Return minimal unicode representation of the given tree.
 
+        Only ids of nodes, the given attributes, and texts of terminal nodes
+        are printed.
+
+        @param a_flag - flag indicating which descendants (internal or
+                        external, or both) should be printed
         @param a_attrs - attributes that should be printed for trees
 
         @return minimal unicode representation
 
         """
-        ret = u'\t' * self._nestedness
-        ret += u"("
-        if self._nestedness < 2:
-            ret += self.id
-            if self._nestedness == 2:
-                avalue = None
-                for attr in a_attrs:
-                    avalue = getattr(attr, None)
-                    if avalue is not None:
-                        ret += " (" + attr + ' ' + avalue + ')'
-        text = ""
-        if self.terminal:
-            text = self.text.decode("utf-8", errors="ignore")
-            ret += u" (text " + \
-                   self._escape_text(text) \
-                   + u")"
-        else:
-            ret += u"..."
-
-        orig_nestedness = 0
-        chld_nestedness = self._nestedness + 1
-        if a_flag & TREE_INTERNAL:
-            for ch_tree in self.ichildren:
-                orig_nestedness = ch_tree._nestedness
-                ch_tree._nestedness = chld_nestedness
-                ret += u'\n' + ch_tree.unicode_min()
-                ch_tree._nestedness = orig_nestedness
-        if a_flag & TREE_EXTERNAL:
-            for ch in self.echildren():
-                orig_nestedness = ch_tree._nestedness
-                ch_tree._nestedness = chld_nestedness
-                ret += u'\n' + ch_tree.unicode_min()
-                ch_tree._nestedness = orig_nestedness
-        return ret
+        ret = []
+        itree = avalue = None
+        ilevel = 0
+        # `None' marks the end of the node which was opened last
+        inodes = [(self, self._nestedness)]
+        while inodes:
+            itree, ilevel = inodes.pop()
+            if itree is None:
+                ret.append(u")")
+                continue
+            if ret:
+                ret.append(u'\n')
+            ret.append(u'\t' * ilevel + u"(" + itree.id)
+            for attr in a_attrs:
+                avalue = getattr(itree, attr, None)
+                if avalue is not None:
+                    ret.append(u" (" + attr + u' ' + unicode(avalue) + u')')
+            if itree.terminal:
+                ret.append(u" (text " + self._escape_text(itree.text) + u")")
+            inodes.append((None, ilevel))
+            inodes.extend((ch, ilevel + 1) for ch in
+                          sorted(itree._get_children(a_flag), reverse=True))
+        return u"".join(ret)
+
+    @property
+    def id(self):
+        """
+        Return id of the root node.
+
+        @return string id
+        """
+        return NODE_IDS.get_id(self.nid)
+
+    @id.setter
+    def id(self, a_id):
+        """
+        Set id of the root node.
+
+        @param a_id - string id
+
+        @return \c void
+        """
+        self.nid = NODE_IDS.intern(a_id)
+
+    @property
+    def msgid(self):
+        """
+        Return id of the message to which this tree belongs.
+
+        @return string id (\c None if not known)
+        """
+        return MSG_IDS.get_id(self.mid)
+
+    @msgid.setter
+    def msgid(self, a_msgid):
+        """
+        Set id of the message to which this tree belongs.
+
+        @param a_msgid - string id
+
+        @return \c void
+        """
+        self.mid = MSG_IDS.intern(a_msgid)
+
+    @property
+    def external_span(self):
+        """
+        Check whether this tree is an external span.
+
+        @return \c True if tree is external and not of type `text'
+        """
+        return bool(self.external) and self.etype != TERMINAL
+
+    @property
+    def relname(self):
+        """
+        Return name of the relation connecting this tree to its parent.
+
+        @return string name (\c None if tree has no relation)
+        """
+        return RELATIONS.get_name(self.rid)
+
+    @relname.setter
+    def relname(self, a_relname):
+        """
+        Set relation connecting this tree to its parent.
+
+        @param a_relname - string name
+
+        @return \c void
+        """
+        self.rid = RELATIONS.intern(a_relname)
+
+    @property
+    def ichildren(self):
+        """
+        Return internal child trees (those which pertain to the same message).
+
+        @return set of child trees
+        """
+        return self._ichildren
+
+    @ichildren.setter
+    def ichildren(self, a_children):
+        """
+        Set internal child trees.
+
+        @param a_children - iterable of child trees
+
+        @return \c void
+        """
+        self._ichildren = set(a_children) or NO_CHILDREN
+        self._add_parent(self._ichildren)
+        self.invalidate_edus()
+
+    @property
+    def echildren(self):
+        """
+        Return external child trees (those which pertain to other messages).
+
+        @return set of child trees
+        """
+        return self._echildren
+
+    @echildren.setter
+    def echildren(self, a_children):
+        """
+        Set external child trees.
+
+        @param a_children - iterable of child trees
+
+        @return \c void
+        """
+        self._echildren = set(a_children) or NO_CHILDREN
+        self._add_parent(self._echildren)
+        self.invalidate_edus()
+
+    @property
+    def text(self):
+        """
+        Return text of the node.
+
+        @return unicode string
+        """
+        return self._txt[self._txt_start:self._txt_end]
+
+    @text.setter
+    def text(self, a_text):
+        """
+        Set text of the node.
+
+        @param a_text - new text of the node (byte strings are assumed to be
+                        encoded in `ENCODING')
+
+        @return \c void
+        """
+        if isinstance(a_text, str):
+            a_text = a_text.decode(ENCODING)
+        self.bind_text(a_text, 0, len(a_text))
+
+    def bind_text(self, a_txt, a_start, a_end):
+        """
+        Let node refer to a span of a (shared) text buffer.
+
+        The text is not copied: it is only extracted from the buffer when the
+        `text' attribute is accessed.
+
+        @param a_txt - unicode text buffer
+        @param a_start - start offset of node's text in the buffer
+        @param a_end - end offset of node's text in the buffer
+
+        @return \c void
+        """
+        self._txt = a_txt
+        self._txt_start = a_start
+        self._txt_end = a_end
+
+    def get_text_span(self):
+        """
+        Return text buffer of the node along with the offsets of its text.
+
+        @return 3-tuple of text buffer, start and end offset
+        """
+        return (self._txt, self._txt_start, self._txt_end)
 
     def add_children(self, *a_children):
         """
@@ -235,14 +414,18 @@ class RSTTree(object):
         @return pointer to this tree
         """
         changed = False
-        external = bool(self.external and self.etype != TERMINAL)
-        min_start = max_end = (-1, -1)
+        external = self.external_span
+        min_start = max_end = NO_OFFSET
         for ch in a_children:
-            # update lists of children
-            if ch.msgid == self.msgid:
-                self.ichildren.add(ch)
+            # update lists of children (allocating them on first use)
+            if ch.mid == self.mid:
+                if self._ichildren is NO_CHILDREN:
+                    self._ichildren = set()
+                self._ichildren.add(ch)
             else:
-                self.echildren.add(ch)
+                if self._echildren is NO_CHILDREN:
+                    self._echildren = set()
+                self._echildren.add(ch)
             # update minimum start and maximum positions available from
             # children
             if ch.t_start[0] > -1 and (min_start[0] < 0 or min_start > ch.t_start):
@@ -251,6 +434,8 @@ class RSTTree(object):
                 max_end = ch.t_end
         # update `start` and `end` values of self and parent, if necessary
         self._update_tstart_tend(min_start, max_end)
+        self._add_parent(a_children)
+        self.invalidate_edus()
         return self
 
     def adjust_offsets(self):
@@ -259,46 +444,85 @@ class RSTTree(object):
 
         @return \c void
         """
-        if not self.terminal or not self.text:
+        if not self.terminal or self._txt_start >= self._txt_end:
             return
         assert self.start == self.t_start and self.t_start[0] > -1, "start and t_start fields of\
  RST terminal diverged before `adjust_offsets was called`"
         assert self.end == self.t_end and self.t_end[0] > -1, "end and t_end fields of RST\
  terminal diverged before `adjust_offsets was called`"
-        orig_len = len(self.text)
-        self.text = self.text.lstrip()
-        delta_start = orig_len - len(self.text)
-        orig_len = len(self.text)
-        self.text = self.text.rstrip()
-        delta_end = orig_len - len(self.text)
+        # skip whitespaces in the buffer without copying the text
+        txt = self._txt
+        txt_start = self._txt_start
+        txt_end = self._txt_end
+        while txt_start < txt_end and txt[txt_start].isspace():
+            txt_start += 1
+        while txt_end > txt_start and txt[txt_end - 1].isspace():
+            txt_end -= 1
+        delta_start = txt_start - self._txt_start
+        delta_end = self._txt_end - txt_end
+        self._txt_start = txt_start
+        self._txt_end = txt_end
         self.start = self.t_start = (self.t_start[0], self.t_start[-1] + delta_start)
         self.end = self.t_end = (self.t_end[0], self.t_end[-1] - delta_end)
+        # order of EDUs might have changed
+        self.invalidate_edus()
 
     def get_edus(self, a_flag=TREE_INTERNAL):
         """
-        Return list of descendant terminal trees in sorted order.
+        Return descendant terminal trees in sorted order.
+
+        The result is cached for each flag until the structure of the tree
+        changes, so the returned sequence should not be modified.
 
         @param a_flag - (optional) flag indicating which descendants (internal
                         or external, or both) should be returned
 
-        @return list of descendant terminal trees
+        @return tuple of descendant terminal trees
         """
+        if self._edus is None:
+            self._edus = {}
+        elif a_flag in self._edus:
+            return self._edus[a_flag]
         ret = []
         if self.terminal:
             ret.append(self)
         # external EDUs subsume internal ones
-        if a_flag & TREE_EXTERNAL or not self.external or self.etype == TERMINAL:
-            for ch in self.ichildren:
-                ret += ch.get_edus(a_flag)
+        if a_flag & TREE_EXTERNAL or not self.external_span:
+            for ch in self._ichildren:
+                ret.extend(ch.get_edus(a_flag))
         # additionally, external EDUs also include external children
         if a_flag & TREE_EXTERNAL:
-            for ch in self.echildren:
-                ret += ch.get_edus(a_flag)
+            for ch in self._echildren:
+                ret.extend(ch.get_edus(a_flag))
+        # lists of children are already sorted, so sorting only merges them
         ret.sort(key = lambda edu: edu.start)
+        ret = self._edus[a_flag] = tuple(ret)
         return ret
 
+    def invalidate_edus(self):
+        """
+        Discard cached EDUs of the tree and of all its ancestors.
+
+        Since EDUs of a tree are computed from the EDUs of its children, no
+        ancestor of a tree without cached EDUs can have them cached either,
+        so that invalidation stops at the first such tree.  Ancestors are
+        found by following `parent' links and the links to all other trees
+        which the tree was added to as a child.
+
+        @return \c void
+        """
+        itree = None
+        inodes = [self]
+        while inodes:
+            itree = inodes.pop()
+            if itree is None or itree._edus is None:
+                continue
+            itree._edus = None
+            inodes.append(itree.parent)
+            inodes.extend(itree._parents)
+
     def get_subtrees(self, a_flag=TREE_INTERNAL):
-        """Return list of all descendant trees in sorted order.
+        """Return set of the tree and all its descendants.
 
         @param a_flag - (optional) flag indicating which descendants (internal
                         or external, or both) should be returned
@@ -306,27 +530,47 @@ class RSTTree(object):
         @return set of descendant trees
 
         """
-        ret = []
-        ret.append(self)
-        if a_flag & TREE_EXTERNAL:
-            for ch in self.echildren:
-                ret += ch.get_subtrees(a_flag)
-            if self.external and self.etype != TERMINAL:
-                for ch in self.ichildren:
-                    ret += ch.get_subtrees(a_flag)
-        if a_flag & TREE_INTERNAL:
-            if not self.external or self.etype == TERMINAL:
-                for ch in self.ichildren:
-                    ret += ch.get_subtrees(a_flag)
-                ret.sort()
+        return set(self.iter_subtrees(a_flag))
+
+    def iter_subtrees(self, a_flag=TREE_INTERNAL, a_postorder=False,
+                      a_visited=None):
+        """
+        Iterate over the tree and its descendants without recursion.
+
+        Internal descendants are reached via internal children of nodes
+        which are not external spans; external descendants are reached via
+        external children and via internal children of external spans.
+        Children are visited in the order of their offsets.
+
+        @param a_flag - (optional) flag indicating which descendants (internal
+                        or external, or both) should be visited
+        @param a_postorder - (optional) visit children before their parents
+        @param a_visited - (optional) set of ids (`id()') of nodes which
+                        should be skipped; ids of visited nodes are added to
+                        it, so that sharing this set between several calls
+                        visits every node only once
+
+        @return iterator over RST trees
+        """
+        visited = set() if a_visited is None else a_visited
+        itree = None
+        expanded = False
+        inodes = [(self, False)]
+        while inodes:
+            itree, expanded = inodes.pop()
+            if expanded:
+                yield itree
+                continue
+            if id(itree) in visited:
+                continue
+            visited.add(id(itree))
+            if a_postorder:
+                inodes.append((itree, True))
             else:
-                if not (a_flag & TREE_EXTERNAL and
-                        self.external and
-                        self.etype != TERMINAL):
-                    for ch in self.ichildren:
-                        if ch.msgid == self.msgid:
-                            return set(ret + ch.get_subtrees())
-        return set(ret)
+                yield itree
+            inodes.extend((ch, False) for ch in
+                          sorted(itree._get_children(a_flag), reverse=True)
+                          if id(ch) not in visited)
 
     def update(self, **a_attrs):
         """
@@ -349,6 +593,7 @@ class RSTTree(object):
             self.type = NONTERMINAL
             self.terminal = False
         self.external = int(self.external)
+        self.invalidate_edus()
 
     def _escape_text(self, a_text):
         """
@@ -360,6 +605,40 @@ class RSTTree(object):
         """
         return u'"' + QUOTE.sub(ESCAPED, a_text) + u'"'
 
+    def _add_parent(self, a_children):
+        """
+        Remember this tree as a parent of child trees.
+
+        @param a_children - child trees
+
+        @return \c void
+        """
+        for ch in a_children:
+            if not any(iparent is self for iparent in ch._parents):
+                ch._parents += (self,)
+
+    def _get_children(self, a_flag):
+        """
+        Return children which should be visited for the given flag.
+
+        @param a_flag - flag indicating which descendants (internal or
+                        external, or both) should be visited
+
+        @return iterable of child trees
+        """
+        if self.external_span:
+            # internal children of external spans are external descendants
+            if a_flag & TREE_EXTERNAL:
+                return chain(self._ichildren, self._echildren)
+            return self._ichildren
+        if a_flag == TREE_ALL:
+            return chain(self._ichildren, self._echildren)
+        elif a_flag & TREE_INTERNAL:
+            return self._ichildren
+        elif a_flag & TREE_EXTERNAL:
+            return self._echildren
+        return ()
+
     def _update_tstart_tend(self, a_start, a_end):
         """
         Update `t_start` and `t_end` attributes.
@@ -379,28 +658,10 @@ class RSTTree(object):
             self.t_end = a_end
         # update `start` and `end` values of non-terminal nodes
         if update and not self.terminal:
-            if a_start[0] == self.discid or (self.external and self.etype != TERMINAL):
+            if a_start[0] == self.discid or self.external_span:
                 self.start = self.t_start
-            if a_end[0] == self.discid or (self.external and self.etype != TERMINAL):
+            if a_end[0] == self.discid or self.external_span:
                 self.end = self.t_end
         # propagate new `t_start`, `t_end` values to the parent
         if update and self.parent is not None:
             self.parent._update_tstart_tend(a_start, a_end)
-
-    def _unicode_children(self, a_children):
-        """
-        Convert children to their unicode representation.
-
-        @param a_children - children whose unicode representation is requested
-
-        @return unicode string representing children
-        """
-        ret = u""
-        orig_nestedness = 0
-        chld_nestedness = self._nestedness + 1
-        for ch_tree in a_children:
-            orig_nestedness = ch_tree._nestedness
-            ch_tree._nestedness = chld_nestedness
-            ret += '\n' + unicode(ch_tree)
-            ch_tree._nestedness = orig_nestedness
-        return ret
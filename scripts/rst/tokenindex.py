@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""
+Module providing mapping between character offsets and tokens of texts.
+
+Constants:
+TOKEN_RE - regular expression matching tokens (the same ones as those
+           obtained by splitting text on whitespace)
+
+Class:
+RSTTokenIndex - sorted offsets of the tokens of a text
+
+"""
+
+##################################################################
+# Imports
+from constants import ENCODING
+
+from bisect import bisect_left, bisect_right
+
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+##################################################################
+# Constants
+TOKEN_RE = re.compile(r"\S+", re.U)
+
+
+##################################################################
+# Class
+class RSTTokenIndex(object):
+    """
+    Sorted offsets of the tokens of a text.
+
+    The index is computed once per text, after which characters are mapped
+    to tokens by binary search.  Token boundaries are numbered by the number
+    of tokens preceding them, i.e. boundary `i' follows the `i'-th token, so
+    that a text with `n' tokens has the boundary candidates 1, ..., n.
+    Offsets of a text are stored in NumPy arrays if NumPy is available, so
+    that many offsets can be mapped at once.
+
+    Instance Variables:
+    starts - sorted start offsets of tokens
+    ends - sorted end offsets of tokens
+
+    Methods:
+    char2token - return index of token at character offset
+    token2char - return start and end offset of token
+    get_boundary - return token boundary corresponding to character offset
+    get_boundaries - return token boundaries of character offsets
+    get_offset - return character offset of token boundary
+
+    """
+
+    def __init__(self, a_text):
+        """
+        Class constructor.
+
+        @param a_text - text to be indexed
+        """
+        if isinstance(a_text, str):
+            a_text = a_text.decode(ENCODING)
+        starts = []
+        ends = []
+        for imatch in TOKEN_RE.finditer(a_text):
+            starts.append(imatch.start())
+            ends.append(imatch.end())
+        if np is None:
+            self.starts = starts
+            self.ends = ends
+        else:
+            self.starts = np.array(starts, dtype=np.int64)
+            self.ends = np.array(ends, dtype=np.int64)
+
+    def __len__(self):
+        """
+        Return number of tokens.
+
+        @return integer
+        """
+        return len(self.starts)
+
+    def char2token(self, a_offset):
+        """
+        Return index of token at character offset.
+
+        @param a_offset - character offset
+
+        @return index of the token containing the offset or of the token
+                following it if the offset points to whitespace (number of
+                tokens if there is no such token)
+        """
+        return int(bisect_right(self.ends, a_offset))
+
+    def token2char(self, a_idx):
+        """
+        Return start and end offset of token.
+
+        @param a_idx - index of the token
+
+        @return 2-tuple of integers
+        """
+        return (int(self.starts[a_idx]), int(self.ends[a_idx]))
+
+    def get_boundary(self, a_offset):
+        """
+        Return token boundary corresponding to character offset.
+
+        Offsets inside of a token are mapped to the boundary following this
+        token.
+
+        @param a_offset - character offset (e.g., end offset of an EDU)
+
+        @return number of tokens starting before the offset
+        """
+        return int(bisect_left(self.starts, a_offset))
+
+    def get_boundaries(self, a_offsets):
+        """
+        Return token boundaries of character offsets.
+
+        @param a_offsets - iterable of character offsets
+
+        @return sorted list of distinct token boundaries
+        """
+        if np is None:
+            return sorted(set(self.get_boundary(ioffset)
+                              for ioffset in a_offsets))
+        offsets = np.fromiter(a_offsets, dtype=np.int64)
+        return np.unique(np.searchsorted(self.starts, offsets,
+                                         side="left")).tolist()
+
+    def get_offset(self, a_boundary):
+        """
+        Return character offset of token boundary.
+
+        @param a_boundary - token boundary
+
+        @return end offset of the token preceding the boundary
+        """
+        if a_boundary <= 0:
+            return 0
+        return int(self.ends[a_boundary - 1])
@@ -0,0 +1,477 @@
+#!/usr/bin/env python
+
+"""
+Module providing streaming writers of RST trees and forrests.
+
+Constants:
+QUOTE - regular expression matching quotes in s-expressions
+ESCAPED - substitution string used to escape quotes in s-expressions
+WRITERS - mapping from output formats to their writer classes
+
+Classes:
+RSTWriter - abstract base class of all writers
+LSPWriter - writer of s-expressions
+PC3Writer - writer of RSTTool (rs3) SGML documents
+XMLWriter - writer of XML documents which can be read by RSTForrest
+
+Functions:
+get_writer - return writer for the given output format
+
+"""
+
+##################################################################
+# Imports
+from constants import ENCODING, TREE_ALL, LSP_FMT, PC3_FMT, XML_FMT
+from relvocab import RELATIONS, SPAN_CODE
+
+from itertools import chain
+from xml.sax.saxutils import escape, quoteattr
+
+import re
+
+##################################################################
+# Constants
+QUOTE = re.compile(u"([\"'])", re.U)
+ESCAPED = ur"\\\1"
+
+
+##################################################################
+# Methods
+def get_writer(a_fmt, a_ostream, a_encoding=ENCODING):
+    """
+    Return writer for the given output format.
+
+    @param a_fmt - output format (LSP_FMT, PC3_FMT, or XML_FMT)
+    @param a_ostream - output stream
+    @param a_encoding - encoding of the output stream (\c None for streams
+                        which accept unicode strings)
+
+    @return RSTWriter
+    """
+    if a_fmt not in WRITERS:
+        raise NotImplementedError(
+            "No writer for output format {:d}".format(a_fmt))
+    return WRITERS[a_fmt](a_ostream, a_encoding)
+
+
+##################################################################
+# Class
+class RSTWriter(object):
+    """
+    Abstract base class of writers.
+
+    Writers output nodes one by one as they traverse trees iteratively, so
+    that neither the complete output nor the recursion depth grows with the
+    size of the forrest.
+
+    Methods:
+    write_forrest - output all trees of the forrest
+    write_tree - output a single tree
+
+    """
+
+    def __init__(self, a_ostream, a_encoding=ENCODING):
+        """
+        Class constructor.
+
+        @param a_ostream - output stream
+        @param a_encoding - encoding of the output stream (\c None for
+                            streams which accept unicode strings)
+        """
+        self._ostream = a_ostream
+        self._encoding = a_encoding
+
+    def write_forrest(self, a_forrest):
+        """
+        Output all trees of the forrest.
+
+        @param a_forrest - RST forrest to be written
+
+        @return \c void
+        """
+        self._write_nodes(lambda: a_forrest.iter_subtrees(TREE_ALL))
+
+    def write_tree(self, a_tree):
+        """
+        Output a single tree.
+
+        @param a_tree - RST tree to be written
+
+        @return \c void
+        """
+        self._write_nodes(lambda: a_tree.iter_subtrees(TREE_ALL))
+
+    def _write_nodes(self, a_iter_nodes):
+        """
+        Output document comprising the given nodes.
+
+        @param a_iter_nodes - callable returning a new iterator over the
+                              nodes on every call
+
+        @return \c void
+        """
+        raise NotImplementedError
+
+    def _write(self, a_str):
+        """
+        Write unicode string to the output stream.
+
+        @param a_str - unicode string
+
+        @return \c void
+        """
+        if self._encoding is None:
+            self._ostream.write(a_str)
+        else:
+            self._ostream.write(a_str.encode(self._encoding))
+
+
+class LSPWriter(RSTWriter):
+    """
+    Writer of s-expressions.
+
+    Every node is written as a list of its attributes followed by its
+    internal and its external children, which are indented one level deeper
+    than the node itself.  Trees and children are written in sorted order,
+    and trees of a forrest are separated by empty lines.
+
+    """
+
+    def write_forrest(self, a_forrest):
+        """
+        Output all trees of the forrest.
+
+        @param a_forrest - RST forrest to be written
+
+        @return \c void
+        """
+        first = True
+        for itree in sorted(a_forrest.trees):
+            if not first:
+                self._write(u"\n\n")
+            first = False
+            self.write_tree(itree)
+
+    def write_tree(self, a_tree, a_level=0):
+        """
+        Output a single tree.
+
+        @param a_tree - RST tree to be written
+        @param a_level - indentation level of the root of the tree
+
+        @return \c void
+        """
+        itree = None
+        ilevel = 0
+        # `None' marks the end of the node which was opened last
+        inodes = [(a_tree, a_level)]
+        while inodes:
+            itree, ilevel = inodes.pop()
+            if itree is None:
+                self._write(u")")
+                continue
+            if ilevel > a_level:
+                self._write(u"\n")
+            self._write_node(itree, ilevel)
+            inodes.append((None, ilevel))
+            inodes.extend((ch, ilevel + 1) for ch in
+                          reversed(sorted(itree.ichildren) +
+                                   sorted(itree.echildren)))
+
+    def _write_node(self, a_tree, a_level):
+        """
+        Output attributes of a node (without closing its list).
+
+        @param a_tree - RST tree whose root should be written
+        @param a_level - indentation level of the node
+
+        @return \c void
+        """
+        self._write(u'\t' * a_level + u"(" + a_tree.id)
+        if a_tree.msgid is not None and \
+                (a_tree.parent is None or a_tree.parent.mid != a_tree.mid):
+            self._write(u" (msgid " + self._escape(a_tree.msgid) + u")")
+        self._write(u" (type " + self._escape(a_tree.type or "") + u")")
+        if a_tree.relname:
+            self._write(u" (relname " + self._escape(a_tree.relname) + u")")
+        self._write(u" (start " + unicode(a_tree.start) + u")")
+        self._write(u" (end " + unicode(a_tree.end) + u")")
+        self._write(u" (text " + self._escape(a_tree.text) + u")")
+
+    def _escape(self, a_text):
+        """
+        Return quoted text with all quotes escaped.
+
+        @param a_text - text to be escaped
+
+        @return unicode string
+        """
+        return u'"' + QUOTE.sub(ESCAPED, a_text) + u'"'
+
+
+class PC3Writer(RSTWriter):
+    """
+    Writer of RSTTool (rs3) SGML documents.
+
+    The header lists all relations occurring in the output along with their
+    type (`rst' or `multinuc', as defined by the relation schemes, or as
+    given by the nuclearity of the related nodes for relations which are
+    not defined by the schemes); the body contains one `segment' element with
+    the text of every terminal node and one `group' element for every span.
+    As in RSTTool, satellites refer to their nucleus as parent, and nuclei
+    refer to their span.  Message ids are kept in additional `msgid'
+    attributes.
+
+    """
+
+    def _write_nodes(self, a_iter_nodes):
+        """
+        Output document comprising the given nodes.
+
+        @param a_iter_nodes - callable returning a new iterator over the
+                              nodes on every call
+
+        @return \c void
+        """
+        relations = {}
+        multinuc = None
+        for itree in a_iter_nodes():
+            if itree.relname and itree.rid != SPAN_CODE:
+                if RELATIONS.is_par(itree.rid):
+                    multinuc = True
+                elif RELATIONS.is_hyp(itree.rid):
+                    multinuc = False
+                else:
+                    multinuc = itree.nucleus
+                relations[itree.relname] = "multinuc" if multinuc else "rst"
+        self._write(u"<rst>\n  <header>\n    <relations>\n")
+        for irel, itype in sorted(relations.iteritems()):
+            self._write(u"      <rel name={:s} type={:s}/>\n".format(
+                quoteattr(irel), quoteattr(itype)))
+        self._write(u"    </relations>\n  </header>\n  <body>\n")
+        for itree in a_iter_nodes():
+            if itree.terminal:
+                self._write(u"    <segment" + self._get_attrs(itree) + u">" +
+                            escape(itree.text) + u"</segment>\n")
+        for itree in a_iter_nodes():
+            if not itree.terminal:
+                self._write(u"    <group" + self._get_attrs(itree) + u"/>\n")
+        self._write(u"  </body>\n</rst>\n")
+
+    def _get_attrs(self, a_tree):
+        """
+        Return attributes of the element representing node.
+
+        @param a_tree - RST tree whose root is represented
+
+        @return unicode string
+        """
+        ret = u" id=" + quoteattr(a_tree.id)
+        if not a_tree.terminal:
+            ret += u" type=" + quoteattr(self._get_group_type(a_tree))
+        if a_tree.parent is not None:
+            ret += u" parent=" + quoteattr(a_tree.parent.id) + \
+                u" relname=" + quoteattr(a_tree.relname or "span")
+        if a_tree.msgid is not None:
+            ret += u" msgid=" + quoteattr(a_tree.msgid)
+        return ret
+
+    def _get_group_type(self, a_tree):
+        """
+        Return RSTTool type of a span.
+
+        @param a_tree - RST tree whose root is a span
+
+        @return `multinuc' if span joins nuclei of a paratactic relation,
+                `span' otherwise
+        """
+        for ch in chain(a_tree.ichildren, a_tree.echildren):
+            if ch.nucleus and ch.rid != SPAN_CODE:
+                return "multinuc"
+        return "span"
+
+
+class XMLWriter(RSTWriter):
+    """
+    Writer of XML documents which can be read by RSTForrest.
+
+    Segments and spans are written first, followed by hypotactic and
+    paratactic relations.  Relations of forrests are written in the order
+    in which they were linked when the forrest was read, since offsets of
+    spans depend on this order, so that reading the output yields the same
+    nodes with the same attributes.  Relations of single trees are
+    reconstructed from the links between nodes: every satellite yields one
+    hypotactic relation for each span which links its nucleus (or one
+    relation without span node if the nucleus is not enclosed by a span),
+    and every span yields one paratactic relation for each relation name of
+    its nuclei (nuclei without satellites are written as paratactic
+    relations named `span' with a single nucleus).  These relations are
+    reconstructed from the children of nodes rather than from their
+    parents, so that nodes linked by several spans keep all of their links.
+
+    """
+
+    def write_forrest(self, a_forrest):
+        """
+        Output all trees of the forrest.
+
+        @param a_forrest - RST forrest to be written
+
+        @return \c void
+        """
+        self._write_nodes(lambda: a_forrest.iter_subtrees(TREE_ALL),
+                          a_forrest.relations)
+
+    def _write_nodes(self, a_iter_nodes, a_relations=None):
+        """
+        Output document comprising the given nodes.
+
+        @param a_iter_nodes - callable returning a new iterator over the
+                              nodes on every call
+        @param a_relations - (optional) relations of the nodes in the format
+                             of `RSTForrest.relations' (they are
+                             reconstructed from the nodes if \c None)
+
+        @return \c void
+        """
+        self._write(u"<annotation>\n    <segments>\n")
+        for itree in a_iter_nodes():
+            if itree.terminal:
+                self._write(u"        <segment" + self._get_attrs(itree) +
+                            u" start=\"{:d}\" end=\"{:d}\"/>\n".format(
+                                itree.start[-1], itree.end[-1]))
+        self._write(u"    </segments>\n    <spans>\n")
+        for itree in a_iter_nodes():
+            if not itree.terminal:
+                self._write(u"        <span" + self._get_attrs(itree) +
+                            u"/>\n")
+        self._write(u"    </spans>\n    <relations>\n")
+        if a_relations is None:
+            a_relations = self._get_relations(a_iter_nodes)
+        for irel in a_relations:
+            if len(irel) == 4:
+                self._write_hyp_relation(*irel)
+            else:
+                self._write_par_relation(*irel)
+        self._write(u"    </relations>\n</annotation>\n")
+
+    def _get_relations(self, a_iter_nodes):
+        """
+        Reconstruct relations from the links between nodes.
+
+        @param a_iter_nodes - callable returning a new iterator over the
+                              nodes on every call
+
+        @return iterator over relations in the format of
+                `RSTForrest.relations'
+        """
+        for itree in a_iter_nodes():
+            # nuclei which are not enclosed by any span
+            if itree.rid != SPAN_CODE:
+                for isat in self._get_satellites(itree):
+                    yield (isat.relname, None, itree.id, isat.id)
+            for inuc in sorted(chain(itree.ichildren, itree.echildren)):
+                if inuc.rid == SPAN_CODE:
+                    for isat in self._get_satellites(inuc):
+                        yield (isat.relname, itree.id, inuc.id, isat.id)
+        rid2nucs = {}
+        for itree in a_iter_nodes():
+            rid2nucs.clear()
+            for ch in sorted(chain(itree.ichildren, itree.echildren)):
+                # nuclei of spans without satellites can only be expressed
+                # as paratactic relations with a single nucleus
+                if ch.nucleus and (ch.rid != SPAN_CODE or
+                                   not self._get_satellites(ch)):
+                    rid2nucs.setdefault(ch.rid, []).append(ch)
+            for inucs in sorted(rid2nucs.itervalues()):
+                yield (inucs[0].relname, itree.id,
+                       tuple(inuc.id for inuc in inucs))
+
+    def _write_hyp_relation(self, a_relname, a_span_id, a_nuc_id, a_sat_id):
+        """
+        Output hypotactic relation.
+
+        @param a_relname - name of the relation
+        @param a_span_id - id of the span node (\c None if nucleus is not
+                        enclosed by any span)
+        @param a_nuc_id - id of the nucleus node
+        @param a_sat_id - id of the satellite node
+
+        @return \c void
+        """
+        self._write(u"        <hypRelation" +
+                    self._get_relname_attr(a_relname) + u">\n")
+        if a_span_id is not None:
+            self._write(u"            <spannode idref={:s}/>\n".format(
+                quoteattr(a_span_id)))
+        self._write(u"            <nucleus idref={:s}/>\n"
+                    u"            <satellite idref={:s}/>\n"
+                    u"        </hypRelation>\n".format(
+                        quoteattr(a_nuc_id), quoteattr(a_sat_id)))
+
+    def _write_par_relation(self, a_relname, a_span_id, a_nuc_ids):
+        """
+        Output paratactic relation.
+
+        @param a_relname - name of the relation
+        @param a_span_id - id of the span node
+        @param a_nuc_ids - ids of the nucleus nodes
+
+        @return \c void
+        """
+        self._write(u"        <parRelation" +
+                    self._get_relname_attr(a_relname) + u">\n"
+                    u"            <spannode idref={:s}/>\n".format(
+                        quoteattr(a_span_id)))
+        for nuc_id in a_nuc_ids:
+            self._write(u"            <nucleus idref={:s}/>\n".format(
+                quoteattr(nuc_id)))
+        self._write(u"        </parRelation>\n")
+
+    def _get_satellites(self, a_nuc):
+        """
+        Return satellites of hypotactic relations linked to a nucleus.
+
+        Nodes which are both satellites and nuclei of other relations only
+        keep the last of their roles, so that every child of the nucleus
+        counts as a satellite unless it is a nucleus linked to it.
+
+        @param a_nuc - RST tree whose root is the nucleus
+
+        @return sorted list of RST trees
+        """
+        return [ch for ch in sorted(chain(a_nuc.ichildren, a_nuc.echildren))
+                if not (ch.nucleus and ch.parent is a_nuc)]
+
+    def _get_relname_attr(self, a_relname):
+        """
+        Return attribute with the name of a relation.
+
+        @param a_relname - name of the relation
+
+        @return unicode string (empty if relation has no name)
+        """
+        if a_relname is None:
+            return u""
+        return u" relname=" + quoteattr(a_relname)
+
+    def _get_attrs(self, a_tree):
+        """
+        Return attributes shared by segments and spans.
+
+        @param a_tree - RST tree whose root is represented
+
+        @return unicode string
+        """
+        ret = u" id=" + quoteattr(a_tree.id)
+        if a_tree.msgid is not None:
+            ret += u" msgid=" + quoteattr(a_tree.msgid)
+        ret += u" external=\"{:d}\"".format(int(a_tree.external))
+        if a_tree.etype is not None:
+            ret += u" etype=" + quoteattr(a_tree.etype)
+        return ret
+
+
+##################################################################
+# Constants
+WRITERS = {LSP_FMT: LSPWriter, PC3_FMT: PC3Writer, XML_FMT: XMLWriter}
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+
+"""
+Common functions of unit tests.
+
+Constants:
+CORPUS_DIR - directory of the bundled corpus
+ANNO_DIRS - directories with annotations of the bundled corpus
+ANNO_SFX - suffix of annotation files
+NODE_ATTRS - attributes of RST trees compared by tests
+STRUCT_IDX - indices of the attributes returned by `dump_forrest' which do
+             not depend on offsets
+MSGID2TXT - texts of the messages of handcrafted annotations
+MSGID2DISCID - discussion ids of the messages of handcrafted annotations
+ANNO_XML - handcrafted annotation of the messages in MSGID2TXT
+
+Methods:
+dump_forrest - return attributes of all nodes of a forrest
+get_corpus_files - return basedata and annotation files of the corpus
+get_corpus_pairs - return basedata files annotated by both annotators
+get_structure - return attributes of all nodes of a forrest except offsets
+make_edu - create terminal node the same way as parsers do
+parse_forrest - parse RST forrest from string
+
+"""
+
+##################################################################
+# Libraries
+import glob
+import os
+
+from rst import RSTForrest, RSTTree, XML_FMT
+from rst.idmap import MSG_IDS
+
+from cStringIO import StringIO
+
+##################################################################
+# Constants
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          os.pardir, os.pardir, "data", "corpus")
+ANNO_DIRS = [os.path.join(CORPUS_DIR, "annotator-2", "markables"),
+             os.path.join(CORPUS_DIR, "annotator-3", "markables")]
+ANNO_SFX = ".rst.xml"
+NODE_ATTRS = ("msgid", "discid", "relname", "nucleus", "external", "etype",
+              "type", "terminal", "start", "end", "t_start", "t_end", "text")
+STRUCT_IDX = [i for i, attr in enumerate(NODE_ATTRS)
+              if attr not in ("start", "end", "t_start", "t_end")] + \
+    [-3, -2, -1]
+MSGID2TXT = {"101": "Es regnet. Wir bleiben zu Hause.",
+             "102": "Schade! Viel Spass."}
+MSGID2DISCID = {"101": 0, "102": 1}
+ANNO_XML = """<annotation>
+    <segments>
+        <segment id="1" msgid="101" start="0" end="11"/>
+        <segment id="2" msgid="101" start="11" end="32"/>
+        <segment id="4" msgid="102" start="0" end="8"/>
+        <segment id="5" msgid="102" start="8" end="19"/>
+    </segments>
+    <spans>
+        <span id="3" msgid="101"/>
+        <span id="6" msgid="102"/>
+        <span id="7" msgid="101" external="1" etype="span"/>
+    </spans>
+    <relations>
+        <hypRelation relname="Cause">
+            <spannode idref="3"/>
+            <nucleus idref="2"/>
+            <satellite idref="1"/>
+        </hypRelation>
+        <parRelation relname="Joint">
+            <spannode idref="6"/>
+            <nucleus idref="4"/>
+            <nucleus idref="5"/>
+        </parRelation>
+        <hypRelation relname="r-OTHER">
+            <spannode idref="7"/>
+            <nucleus idref="3"/>
+            <satellite idref="6"/>
+        </hypRelation>
+    </relations>
+</annotation>
+"""
+
+
+##################################################################
+# Methods
+def get_corpus_files():
+    """
+    Return basedata and annotation files of the bundled corpus.
+
+    @return list of 2-tuples of basedata and annotation file names
+    """
+    ret = []
+    src_fname = ""
+    for anno_dir in ANNO_DIRS:
+        for anno_fname in sorted(glob.glob(os.path.join(anno_dir,
+                                                        '*' + ANNO_SFX))):
+            src_fname = os.path.join(
+                CORPUS_DIR, "basedata",
+                os.path.basename(anno_fname)[:-len(ANNO_SFX)] + ".xml")
+            ret.append((src_fname, anno_fname))
+    return ret
+
+
+def get_corpus_pairs():
+    """
+    Return basedata files of the corpus annotated by both annotators.
+
+    @return sorted list of 3-tuples of basedata file name and annotation
+            file names of both annotators
+    """
+    src2annos = {}
+    for src_fname, anno_fname in get_corpus_files():
+        src2annos.setdefault(src_fname, []).append(anno_fname)
+    return sorted((src_fname,) + tuple(anno_fnames)
+                  for src_fname, anno_fnames in src2annos.iteritems()
+                  if len(anno_fnames) == len(ANNO_DIRS))
+
+
+def make_edu(a_id, a_msgid, a_discid, a_start, a_end):
+    """
+    Create terminal node the same way as parsers do.
+
+    @param a_id - id of the node
+    @param a_msgid - id of the message of the node
+    @param a_discid - number of the message in discussion
+    @param a_start - start offset of the node in its message
+    @param a_end - end offset of the node in its message
+
+    @return RST tree
+    """
+    ret = RSTTree(a_id, type="segment", msgid=a_msgid, discid=a_discid,
+                  start=a_start, end=a_end)
+    ret.start = ret.t_start = (a_discid, a_start)
+    ret.end = ret.t_end = (a_discid, a_end)
+    return ret
+
+
+def parse_forrest(a_src, a_fmt=XML_FMT, a_msgid2txt=MSGID2TXT,
+                  a_msgid2discid=MSGID2DISCID):
+    """
+    Parse RST forrest from string.
+
+    @param a_src - string with the annotation
+    @param a_fmt - format of the annotation
+    @param a_msgid2txt - mapping from message ids to their texts
+    @param a_msgid2discid - mapping from message ids to discussion ids
+
+    @return RSTForrest
+    """
+    forrest = RSTForrest(a_fmt, a_msgid2txt, a_msgid2discid)
+    forrest.parse(StringIO(a_src))
+    return forrest
+
+
+def dump_forrest(a_forrest):
+    """
+    Return attributes of all nodes of a forrest.
+
+    @param a_forrest - RST forrest
+
+    @return 2-tuple of dictionary mapping node ids to tuples of their
+            attributes and ids of their parents and children, and sorted
+            list of message ids paired with the ids of their roots
+    """
+    ret = {}
+    inodes = list(a_forrest.trees)
+    itree = None
+    while inodes:
+        itree = inodes.pop()
+        if itree.id in ret:
+            continue
+        ret[itree.id] = tuple(getattr(itree, attr) for attr in NODE_ATTRS) \
+            + (None if itree.parent is None else itree.parent.id,
+               sorted(ch.id for ch in itree.ichildren),
+               sorted(ch.id for ch in itree.echildren))
+        inodes.extend(itree.ichildren)
+        inodes.extend(itree.echildren)
+    iroots = sorted((MSG_IDS.get_id(mid), itree.id)
+                    for mid, iroots in a_forrest.msgid2iroots.iteritems()
+                    for itree in iroots)
+    return (ret, iroots)
+
+
+def get_structure(a_forrest):
+    """
+    Return attributes of all nodes of a forrest except for their offsets.
+
+    @param a_forrest - RST forrest
+
+    @return 2-tuple of dictionary mapping node ids to tuples of their
+            attributes and sorted list of message ids and their roots
+    """
+    nodes, iroots = dump_forrest(a_forrest)
+    return (dict((nid, tuple(attrs[i] for i in STRUCT_IDX))
+                 for nid, attrs in nodes.iteritems()), iroots)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for the persistent cache of parsed RST data.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import dump_forrest, get_corpus_files
+from rst import RSTCache, RSTForrest, XML_FMT, read_basedata
+
+
+##################################################################
+# Classes
+class TestCache(unittest.TestCase):
+    """
+    Tests of RSTCache.
+    """
+
+    def setUp(self):
+        """
+        Create empty cache directory.
+        """
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = RSTCache(self.cache_dir)
+
+    def tearDown(self):
+        """
+        Remove cache directory.
+        """
+        shutil.rmtree(self.cache_dir)
+
+    def test_messages(self):
+        """
+        Check that cached messages are the same as the read ones.
+        """
+        src_fname = get_corpus_files()[0][0]
+        messages = read_basedata(src_fname)
+        self.assertEqual(self.cache.get_messages(src_fname, read_basedata),
+                         messages)
+        self.assertEqual(self.cache.get_messages(src_fname, None), messages)
+
+    def test_forrest(self):
+        """
+        Check that forrests loaded from cache are the same as parsed ones.
+        """
+        for src_fname, anno_fname in get_corpus_files():
+            msgid2txt, msgid2discid = read_basedata(src_fname)
+            forrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+            forrest.parse(anno_fname)
+            nodes = dump_forrest(forrest)
+            cforrest = None
+            for _ in xrange(2):
+                cforrest = self.cache.get_forrest(XML_FMT, anno_fname,
+                                                  msgid2txt, msgid2discid,
+                                                  src_fname)
+                self.assertEqual(dump_forrest(cforrest), nodes, anno_fname)
+                self.assertEqual(cforrest.relations, forrest.relations)
+        self.assertTrue(os.listdir(self.cache_dir))
+
+    def test_modified(self):
+        """
+        Check that modified files are parsed again.
+        """
+        (src_fname, anno_fname1), (_, anno_fname2) = \
+            [ifiles for ifiles in get_corpus_files()
+             if ifiles[0].endswith("1.general.xml")]
+        anno_fname = os.path.join(self.cache_dir, "anno.rst.xml")
+        msgid2txt, msgid2discid = read_basedata(src_fname)
+        for ifname in (anno_fname1, anno_fname2):
+            shutil.copy(ifname, anno_fname)
+            forrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+            forrest.parse(ifname)
+            self.assertEqual(
+                dump_forrest(self.cache.get_forrest(
+                    XML_FMT, anno_fname, msgid2txt, msgid2discid,
+                    src_fname)), dump_forrest(forrest))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for reports of disagreements between annotations.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import MSGID2TXT, get_corpus_pairs
+from rst import DIFF_JSONL, DIFF_TSV, FIELD_SEP, RSTDiffReport, \
+    get_segment_diff
+from rst.diffreport import DIFF_FIELDS
+import measure_agreement as ma
+
+from StringIO import StringIO
+
+import json
+
+##################################################################
+# Constants
+MSG_FLAGS = ma.CHCK_SEGMENTS | ma.CHCK_MNUCLEARITY | ma.CHCK_MRELATIONS
+
+
+##################################################################
+# Classes
+class TestDiffReport(unittest.TestCase):
+    """
+    Tests of reports of disagreements.
+    """
+
+    def setUp(self):
+        """
+        Suppress progress messages.
+        """
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        """
+        Restore standard error.
+        """
+        sys.stderr = self.stderr
+
+    def test_segments(self):
+        """
+        Check rendering of differing segment boundaries.
+        """
+        self.assertIsNone(get_segment_diff("101", set([10, 32]),
+                                           set([10, 32])))
+        ostream = StringIO()
+        report = RSTDiffReport(ostream, DIFF_JSONL)
+        report.write("f.xml", ma.SEGMENTS,
+                     [get_segment_diff("101", set([10, 32]), set([3, 32]))],
+                     MSGID2TXT)
+        self.assertEqual(json.loads(ostream.getvalue()),
+                         {"file": "f.xml", "element": ma.SEGMENTS,
+                          "msgid": "101", "value1": 2, "value2": 2,
+                          "diff1": "Es <2>regnet.<1> Wir bleiben zu"
+                          " Hause.<>"})
+
+    def test_corpus(self):
+        """
+        Check that every disagreement of the corpus yields one report line.
+        """
+        src_fname, anno1_fname, anno2_fname = get_corpus_pairs()[0]
+        agrmt_stat = ma.compute_stat(src_fname, anno1_fname, anno2_fname,
+                                     MSG_FLAGS, True)
+        ostream = StringIO()
+        ma.write_diffs(RSTDiffReport(ostream, DIFF_TSV), src_fname,
+                       anno1_fname, anno2_fname, agrmt_stat)
+        lines = ostream.getvalue().decode("utf-8").splitlines()
+        self.assertEqual(lines[0], '#' + FIELD_SEP.join(DIFF_FIELDS))
+        fields = [iline.split(FIELD_SEP) for iline in lines[1:]]
+        self.assertTrue(fields)
+        self.assertTrue(all(len(ifields) == len(DIFF_FIELDS)
+                            for ifields in fields))
+        element = DIFF_FIELDS.index("element")
+        for elname, elstat in agrmt_stat.iteritems():
+            self.assertEqual(
+                sum(ifields[element] == elname for ifields in fields),
+                len(elstat[ma.DIFF_IDX]), elname)
+            if elname == ma.SEGMENTS:
+                continue
+            # attribute differences are only recorded for subsegments
+            # covered by both annotations
+            self.assertEqual(
+                len(elstat[ma.DIFF_IDX]),
+                sum(cnt for v1, counts in
+                    elstat[ma.CONFUSION_IDX].iteritems()
+                    for v2, cnt in counts.iteritems()
+                    if v1 != v2 and ma.NONE not in (v1, v2)), elname)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for the columnar export of RST corpora.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_DIRS, CORPUS_DIR, NODE_ATTRS, dump_forrest, \
+    get_corpus_files
+from rst import RSTForrest, XML_FMT, read_basedata
+import export_rst_columns as erc
+
+from StringIO import StringIO
+
+import csv
+import glob
+
+
+##################################################################
+# Methods
+def _read_lines(a_fname):
+    """
+    Read lines of a text file.
+
+    @param a_fname - name of the file
+
+    @return list of lines without newlines
+    """
+    with open(a_fname) as ifile:
+        return ifile.read().splitlines()
+
+
+##################################################################
+# Classes
+class TestExport(unittest.TestCase):
+    """
+    Tests of the columnar export.
+    """
+
+    def setUp(self):
+        """
+        Create empty output directory and suppress progress messages.
+        """
+        self.out_dir = tempfile.mkdtemp()
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        """
+        Remove output directory and restore standard error.
+        """
+        sys.stderr = self.stderr
+        shutil.rmtree(self.out_dir)
+
+    def _export(self, a_fmt, a_chunk_size):
+        """
+        Export the annotations of the 1-st annotator.
+
+        @param a_fmt - output format
+        @param a_chunk_size - number of rows in a chunk
+
+        @return 2-tuple of dictionary mapping column names to lists of
+                values and name of the output directory
+        """
+        out_dir = os.path.join(self.out_dir, a_fmt)
+        self.assertEqual(erc.main(["-f", a_fmt, "--chunk-size",
+                                   str(a_chunk_size),
+                                   os.path.join(CORPUS_DIR, "basedata"),
+                                   ANNO_DIRS[0], out_dir]), 0)
+        columns = dict((icol, []) for icol in erc.COLUMNS)
+        if a_fmt == erc.CSV:
+            with open(os.path.join(out_dir,
+                                   erc.NODES + '.' + erc.CSV)) as ifile:
+                rows = list(csv.reader(ifile))
+            self.assertEqual(tuple(rows[0]), erc.COLUMNS)
+            for irow in rows[1:]:
+                for icol, ivalue in zip(erc.COLUMNS, irow):
+                    columns[icol].append(int(ivalue))
+        else:
+            chunks = sorted(glob.glob(os.path.join(out_dir, erc.NODES +
+                                                   ".*." + erc.NPZ)))
+            for ichunk in chunks:
+                data = erc.np.load(ichunk)
+                self.assertTrue(len(data["node"]) <= a_chunk_size)
+                for icol in erc.COLUMNS:
+                    columns[icol].extend(int(v) for v in data[icol])
+        return (columns, out_dir)
+
+    def test_export(self):
+        """
+        Check that exported rows describe all nodes and relations.
+        """
+        if erc.np is None:
+            self.skipTest("NumPy is not installed")
+        columns, out_dir = self._export(erc.CSV, 7)
+        self.assertEqual(self._export(erc.NPZ, 50)[0], columns)
+        node_ids = _read_lines(os.path.join(out_dir, erc.NODE_IDS_FNAME))
+        relations = _read_lines(os.path.join(out_dir, erc.RELATIONS_FNAME))
+        anno_fnames = _read_lines(os.path.join(out_dir, erc.FILES_FNAME))
+        self.assertEqual(columns["node"], range(len(node_ids)))
+        # nodes of every file mapped to their parents and relations
+        exported = {}
+        iparent = irelcode = None
+        for i, inode in enumerate(node_ids):
+            iparent = columns["parent"][i]
+            irelcode = columns["relcode"][i]
+            exported[(columns["filecode"][i], inode)] = (
+                None if iparent < 0 else node_ids[iparent],
+                None if irelcode < 0 else relations[irelcode])
+            if iparent < 0:
+                self.assertEqual(columns["depth"][i], 0)
+            else:
+                self.assertEqual(columns["filecode"][iparent],
+                                 columns["filecode"][i])
+                self.assertEqual(columns["depth"][i],
+                                 columns["depth"][iparent] + 1)
+        expected = {}
+        relname = NODE_ATTRS.index("relname")
+        anno2src = dict((anno_fname, src_fname)
+                        for src_fname, anno_fname in get_corpus_files())
+        for i, anno_fname in enumerate(anno_fnames):
+            msgid2txt, msgid2discid = read_basedata(anno2src[anno_fname])
+            forrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+            forrest.parse(anno_fname)
+            for inode, iattrs in dump_forrest(forrest)[0].iteritems():
+                expected[(i, inode)] = (iattrs[-3], iattrs[relname])
+        self.assertTrue(expected)
+        self.assertEqual(exported, expected)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for measuring agreement on the RST corpus.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_DIRS, ANNO_SFX, CORPUS_DIR, get_corpus_pairs
+import measure_agreement as ma
+
+from collections import Counter
+from StringIO import StringIO
+
+##################################################################
+# Constants
+MSG_FLAGS = ma.CHCK_SEGMENTS | ma.CHCK_MNUCLEARITY | ma.CHCK_MRELATIONS
+DISC_FLAGS = ma.CHCK_DNUCLEARITY | ma.CHCK_DRELATIONS
+# four items labeled by two annotators
+TABLE = Counter({(ma.SEG, ma.SEG): 2, (ma.SEG, ma.NONSEG): 1,
+                 (ma.NONSEG, ma.NONSEG): 1})
+
+
+##################################################################
+# Classes
+class TestMultiAnnotator(unittest.TestCase):
+    """
+    Tests of agreement of multiple annotators.
+    """
+
+    def setUp(self):
+        """
+        Suppress progress messages.
+        """
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        """
+        Restore standard error.
+        """
+        sys.stderr = self.stderr
+
+    def test_coefficients(self):
+        """
+        Check Fleiss' Kappa, Krippendorff's Alpha, and pairwise Kappa.
+        """
+        self.assertAlmostEqual(ma._compute_fleiss_kappa(TABLE), 7. / 15)
+        self.assertAlmostEqual(ma._compute_alpha(TABLE), 8. / 15)
+        self.assertAlmostEqual(ma._compute_kappa(
+            *ma._get_pair_confusion(TABLE, 0, 1) + (4,)), 0.5)
+        self.assertAlmostEqual(ma._compute_fleiss_kappa(
+            Counter({(ma.SEG,) * 3: 2, (ma.NONSEG,) * 3: 1})), 1.)
+
+    def test_two_annotators(self):
+        """
+        Check that tables of two annotators match pairwise confusion matrices.
+        """
+        for src_fname, anno1_fname, anno2_fname in get_corpus_pairs():
+            for flags in (MSG_FLAGS, DISC_FLAGS):
+                agrmt_stat = ma.compute_stat(src_fname, anno1_fname,
+                                             anno2_fname, flags)
+                multi_stat = ma.compute_multi_stat(
+                    src_fname, [anno1_fname, anno2_fname], flags)
+                self.assertEqual(sorted(multi_stat), sorted(agrmt_stat))
+                for elname, table in multi_stat.iteritems():
+                    confusion = agrmt_stat[elname][ma.CONFUSION_IDX]
+                    self.assertEqual(
+                        dict(((v1, v2), cnt)
+                             for v1, counts in confusion.iteritems()
+                             for v2, cnt in counts.iteritems() if cnt),
+                        dict((row, cnt) for row, cnt in table.iteritems()
+                             if cnt), src_fname)
+
+    def test_same_annotation(self):
+        """
+        Check that annotators who share their annotation fully agree.
+        """
+        src_fname, anno1_fname, anno2_fname = get_corpus_pairs()[0]
+        multi_stat = ma.compute_multi_stat(
+            src_fname, [anno1_fname, anno2_fname, anno1_fname], MSG_FLAGS)
+        self.assertTrue(multi_stat)
+        for table in multi_stat.itervalues():
+            self.assertTrue(all(row[0] == row[2] for row in table))
+            overlap, marginals1, marginals2 = \
+                ma._get_pair_confusion(table, 0, 2)
+            self.assertEqual(overlap, sum(table.itervalues()))
+            self.assertEqual(marginals1, marginals2)
+
+
+class TestBootstrap(unittest.TestCase):
+    """
+    Tests of bootstrap confidence intervals of Kappa.
+    """
+
+    def setUp(self):
+        """
+        Suppress progress messages.
+        """
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        """
+        Restore standard error.
+        """
+        sys.stderr = self.stderr
+
+    def test_units(self):
+        """
+        Check that confusion matrices of units sum up to the total ones.
+        """
+        src_fname, anno1_fname, anno2_fname = get_corpus_pairs()[0]
+        for flags in (MSG_FLAGS, DISC_FLAGS):
+            agrmt_stat = ma.compute_stat(src_fname, anno1_fname, anno2_fname,
+                                         flags)
+            unit_stat = ma.compute_stat(src_fname, anno1_fname, anno2_fname,
+                                        flags, a_units=True)
+            for elname, elstat in unit_stat.iteritems():
+                self.assertTrue(elstat[ma.UNITS_IDX])
+                total = Counter()
+                for iunit in elstat[ma.UNITS_IDX]:
+                    total.update(dict(((v1, v2), cnt)
+                                      for v1, counts in iunit.iteritems()
+                                      for v2, cnt in counts.iteritems()))
+                confusion = agrmt_stat[elname][ma.CONFUSION_IDX]
+                self.assertEqual(
+                    dict((k, cnt) for k, cnt in total.iteritems() if cnt),
+                    dict(((v1, v2), cnt)
+                         for v1, counts in confusion.iteritems()
+                         for v2, cnt in counts.iteritems() if cnt))
+
+    def test_interval(self):
+        """
+        Check bounds of confidence intervals.
+        """
+        if ma.np is None:
+            self.skipTest("NumPy is not installed")
+        agree = {ma.SEG: {ma.SEG: 3}, ma.NONSEG: {ma.NONSEG: 2}}
+        disagree = {ma.SEG: {ma.NONSEG: 1}, ma.NONSEG: {ma.SEG: 1}}
+        self.assertEqual(ma._bootstrap_kappa([agree] * 5, 100), (1., 1.))
+        units = [agree, disagree, agree, agree]
+        low, high = ma._bootstrap_kappa(units, 1000, 0.9,
+                                        ma.np.random.RandomState(1))
+        self.assertTrue(-1. <= low < 53. / 70 < high <= 1.)
+        self.assertEqual(ma._bootstrap_kappa(units, 1000, 0.9,
+                                             ma.np.random.RandomState(1)),
+                         (low, high))
+
+    def test_verbose(self):
+        """
+        Check that intervals of single files do not change total intervals.
+        """
+        if ma.np is None:
+            self.skipTest("NumPy is not installed")
+        args = ["-b", "100", "--seed", "1", "--type", ma.MNUCLEARITY,
+                "--anno-sfx", ANNO_SFX, os.path.join(CORPUS_DIR, "basedata")] \
+            + ANNO_DIRS
+        stdout = sys.stdout
+        outputs = []
+        try:
+            for iargs in (args, ["-v"] + args, args):
+                ma.KAPPA_STAT.clear()
+                sys.stdout = StringIO()
+                sys.stderr = StringIO()
+                self.assertEqual(ma.main(iargs), 0)
+                outputs.append((sys.stdout.getvalue(), sys.stderr.getvalue()))
+        finally:
+            sys.stdout = stdout
+            ma.KAPPA_STAT.clear()
+        self.assertEqual(outputs[0], outputs[2])
+        self.assertEqual(outputs[1][1], outputs[0][1])
+        self.assertIn("CI", outputs[1][0])
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for Parseval-style evaluation of RST forrests.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_DIRS, ANNO_XML, CORPUS_DIR, dump_forrest, \
+    get_corpus_files, get_corpus_pairs, get_structure, parse_forrest
+from rst import RSTForrest, RSTParseval, XML_FMT, FULL, METRICS, \
+    NUCLEARITY, RELATION, SPAN, read_basedata
+import evaluate_rst_parses as erp
+
+from cStringIO import StringIO
+
+import xml.etree.ElementTree as ET
+
+##################################################################
+# Constants
+MSGID2TXT = {"103": "Es regnet. Wir bleiben zu Hause. Schade!"}
+MSGID2DISCID = {"103": 0}
+# annotation of MSGID2TXT (with placeholders for the relations)
+ANNO_XML3 = """<annotation>
+    <segments>
+        <segment id="1" msgid="103" start="0" end="11"/>
+        <segment id="2" msgid="103" start="11" end="33"/>
+        <segment id="3" msgid="103" start="33" end="40"/>
+    </segments>
+    <spans>
+        <span id="4" msgid="103"/>
+        <span id="5" msgid="103"/>
+    </spans>
+    <relations>
+        <hypRelation relname="Cause">
+            <spannode idref="{:s}"/>
+            <nucleus idref="{:s}"/>
+            <satellite idref="1"/>
+        </hypRelation>
+        <hypRelation relname="Evaluation-s">
+            <spannode idref="{:s}"/>
+            <nucleus idref="{:s}"/>
+            <satellite idref="3"/>
+        </hypRelation>
+    </relations>
+</annotation>
+"""
+
+
+##################################################################
+# Methods
+def _reverse_relations(a_fname):
+    """
+    Return annotation with relations in reverse order.
+
+    @param a_fname - name of the annotation file
+
+    @return string with the annotation
+    """
+    idoc = ET.parse(a_fname).getroot()
+    irels = idoc.find("relations")
+    irels[:] = list(reversed(irels))
+    return ET.tostring(idoc)
+
+
+##################################################################
+# Classes
+class TestParseval(unittest.TestCase):
+    """
+    Tests of RSTParseval.
+    """
+
+    def test_identical(self):
+        """
+        Check that forrests get perfect scores against themselves.
+        """
+        parseval = RSTParseval()
+        forrest = None
+        for src_fname, anno_fname in get_corpus_files():
+            msgid2txt, msgid2discid = read_basedata(src_fname)
+            forrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+            forrest.parse(anno_fname)
+            if not forrest.trees:
+                continue
+            gold = parseval.get_constituents(forrest)
+            self.assertEqual(parseval.update(gold, forrest),
+                             dict((imetric, (1., 1., 1.))
+                                  for imetric in METRICS))
+        for imacro in (False, True):
+            self.assertEqual(parseval.get_scores(imacro),
+                             dict((imetric, (1., 1., 1.))
+                                  for imetric in METRICS))
+
+    def test_relabeled(self):
+        """
+        Check that a relabeled relation only affects labeled metrics.
+        """
+        parseval = RSTParseval()
+        scores = parseval.update(
+            parse_forrest(ANNO_XML),
+            parse_forrest(ANNO_XML.replace('"Cause"', '"Reason"')))
+        self.assertEqual(scores[SPAN], (1., 1., 1.))
+        self.assertEqual(scores[NUCLEARITY], (1., 1., 1.))
+        for imetric in (RELATION, FULL):
+            self.assertEqual(scores[imetric], (6. / 7, 6. / 7, 6. / 7))
+
+    def test_moved_satellite(self):
+        """
+        Check that a moved satellite only affects the spans it moves between.
+        """
+        # ((1 2) 3) vs. (1 (2 3))
+        gold = parse_forrest(ANNO_XML3.format("4", "2", "5", "4"),
+                             a_msgid2txt=MSGID2TXT,
+                             a_msgid2discid=MSGID2DISCID)
+        pred = parse_forrest(ANNO_XML3.format("5", "4", "4", "2"),
+                             a_msgid2txt=MSGID2TXT,
+                             a_msgid2discid=MSGID2DISCID)
+        scores = RSTParseval().update(gold, pred)
+        for imetric in METRICS:
+            for iscore in scores[imetric]:
+                self.assertAlmostEqual(iscore, 4. / 5)
+
+    def test_order(self):
+        """
+        Check that constituents do not depend on the order of relations.
+        """
+        parseval = RSTParseval()
+        reordered = None
+        n_moved = 0
+        for src_fname, anno_fname in get_corpus_files():
+            msgid2txt, msgid2discid = read_basedata(src_fname)
+            forrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+            forrest.parse(anno_fname)
+            if not forrest.trees:
+                continue
+            ostream = StringIO()
+            forrest.write(ostream)
+            self.assertEqual(
+                parseval.update(forrest,
+                                parse_forrest(ostream.getvalue(), XML_FMT,
+                                              msgid2txt, msgid2discid)),
+                dict((imetric, (1., 1., 1.)) for imetric in METRICS))
+            # offsets of spans change, but their EDUs do not (unless nodes
+            # linked by several relations keep another role)
+            reordered = parse_forrest(_reverse_relations(anno_fname),
+                                      XML_FMT, msgid2txt, msgid2discid)
+            if get_structure(reordered) != get_structure(forrest):
+                continue
+            n_moved += dump_forrest(reordered) != dump_forrest(forrest)
+            self.assertEqual(parseval.update(forrest, reordered),
+                             dict((imetric, (1., 1., 1.))
+                                  for imetric in METRICS), anno_fname)
+        self.assertTrue(n_moved)
+
+
+class TestScript(unittest.TestCase):
+    """
+    Tests of evaluate_rst_parses.py.
+    """
+
+    def setUp(self):
+        """
+        Capture output and suppress progress messages.
+        """
+        self.stdout = sys.stdout
+        self.stderr = sys.stderr
+        sys.stdout = StringIO()
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        """
+        Restore standard output and standard error.
+        """
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+
+    def test_main(self):
+        """
+        Check that scores of the script match those of RSTParseval.
+        """
+        self.assertEqual(erp.main(["-m", os.path.join(CORPUS_DIR,
+                                                      "basedata")] +
+                                  ANNO_DIRS), 0)
+        lines = [iline.split("\t") for iline in
+                 sys.stdout.getvalue().splitlines()]
+        self.assertEqual([iline[:2] for iline in lines],
+                         [[iavg, imetric] for iavg in ("micro", "macro")
+                          for imetric in METRICS])
+        parseval = RSTParseval()
+        forrests = None
+        for src_fname, gold_fname, pred_fname in get_corpus_pairs():
+            msgid2txt, msgid2discid = read_basedata(src_fname)
+            forrests = [RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+                        for _ in xrange(2)]
+            forrests[0].parse(gold_fname)
+            forrests[1].parse(pred_fname)
+            parseval.update(*forrests)
+        self.assertEqual(
+            [iline[2:] for iline in lines[:len(METRICS)]],
+            [["{:.4f}".format(iscore) for iscore in
+              parseval.get_scores()[imetric]] for imetric in METRICS])
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for RST project files.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_XML
+from rst import RSTBadFormat, RSTProject, RELATIONS
+
+##################################################################
+# Constants
+BASEDATA_XML = """<basedata>
+  <thread id="1">
+    <msg id="101">
+      <text>Es regnet. Wir bleiben zu Hause.</text>
+      <msg id="102">
+        <text>Schade! Viel Spass.</text>
+      </msg>
+    </msg>
+  </thread>
+</basedata>
+"""
+# relations which are not defined by the default schemes
+RELSCHEME_XML = """<relations>
+    <relation name="Prj-Cause" type="hyp"/>
+    <relation name="Joint" type="par"/>
+</relations>
+"""
+ERELSCHEME_XML = """<relations>
+    <relation name="r-Prj-OTHER" type="hyp"/>
+</relations>
+"""
+PRJ_XML = """<rstprj>
+  {:s}
+  <relscheme>relscheme.xml</relscheme>
+  <erelscheme>erelscheme.xml</erelscheme>
+  <basedata>basedata.xml</basedata>
+  <annotation>anno.xml</annotation>
+</rstprj>
+"""
+
+
+##################################################################
+# Classes
+class TestProject(unittest.TestCase):
+    """
+    Tests of RSTProject.
+    """
+
+    def setUp(self):
+        """
+        Create directory with project files.
+        """
+        self.prj_dir = tempfile.mkdtemp()
+        for fname, content in (
+                ("basedata.xml", BASEDATA_XML),
+                ("relscheme.xml", RELSCHEME_XML),
+                ("erelscheme.xml", ERELSCHEME_XML),
+                ("anno.xml",
+                 ANNO_XML.replace('"Cause"', '"Prj-Cause"').replace(
+                     '"r-OTHER"', '"r-Prj-OTHER"'))):
+            with open(os.path.join(self.prj_dir, fname), "w") as ofile:
+                ofile.write(content)
+
+    def tearDown(self):
+        """
+        Remove directory with project files.
+        """
+        shutil.rmtree(self.prj_dir)
+
+    def _write_project(self, a_fmt=""):
+        """
+        Write project file.
+
+        @param a_fmt - format element of the project
+
+        @return name of the project file
+        """
+        fname = os.path.join(self.prj_dir, "anno.rstprj.xml")
+        with open(fname, "w") as ofile:
+            ofile.write(PRJ_XML.format(a_fmt))
+        return fname
+
+    def test_schemes(self):
+        """
+        Check that relations of project schemes are known.
+        """
+        project = RSTProject(self._write_project('<format type="pc3m"/>'))
+        self.assertEqual(project.relscheme["Prj-Cause"], "hyp")
+        forrest = project.forrest
+        self.assertEqual(forrest.unknown_relnames, set())
+        self.assertTrue(RELATIONS.is_hyp(RELATIONS.get_code("Prj-Cause")))
+        self.assertTrue(RELATIONS.is_external(
+            RELATIONS.get_code("r-Prj-OTHER")))
+        self.assertEqual(forrest.get_tree("1").relname, "Prj-Cause")
+
+    def test_format(self):
+        """
+        Check that formats without parser are rejected.
+        """
+        with self.assertRaises(RSTBadFormat):
+            RSTProject(self._write_project('<format type="lisp"/>'))
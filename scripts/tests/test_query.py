@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for structural queries over RST forrests.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_XML, make_edu, parse_forrest
+from rst import RSTForrest, RSTForrestArrays, RSTNodeIndex, RSTQuery, \
+    RSTTree, XML_FMT
+from rst.forrestarrays import np
+
+
+##################################################################
+# Classes
+class TestQuery(unittest.TestCase):
+    """
+    Tests of RSTQuery and RSTNodeIndex.
+    """
+
+    def setUp(self):
+        """
+        Build a span of the first message dominating EDUs of three messages.
+        """
+        self.edus = [make_edu("1", "m1", 0, 0, 10),
+                     make_edu("2", "m2", 1, 0, 12),
+                     make_edu("3", "m3", 2, 0, 7)]
+        self.span = RSTTree("-1", type="span", msgid="m1", discid=0,
+                            relname="Contrast", nucleus=True)
+        self.span.add_children(*self.edus)
+        self.forrest = RSTForrest(XML_FMT, None)
+        self.forrest.trees.add(self.span)
+
+    def _match(self, a_query):
+        """
+        Return ids of nodes matched by query.
+
+        @param a_query - query string
+
+        @return sorted list of node ids
+        """
+        return sorted(itree.id for itree in RSTQuery(a_query).match(
+            RSTNodeIndex(self.forrest)))
+
+    def test_messages_multi_message_span(self):
+        # offsets of the span do not cover the EDUs of other messages
+        self.assertNotEqual(self.span.end[0], 2)
+        self.assertEqual(self._match("Contrast[messages=3]"), ["-1"])
+        self.assertEqual(self._match("Contrast[nucleus][messages>=2]"),
+                         ["-1"])
+
+    def test_messages_terminal(self):
+        self.assertEqual(self._match("[terminal][messages=1]"),
+                         ["1", "2", "3"])
+        self.assertEqual(self._match("[messages>3]"), [])
+
+    def test_links(self):
+        self.assertEqual(self._match("* < Contrast"), [])
+        self.assertEqual(self._match("Contrast < [msgid=m2]"), ["-1"])
+        self.assertEqual(self._match("[terminal] > Contrast"),
+                         ["1", "2", "3"])
+
+    def test_external(self):
+        # external EDUs are not external spans
+        self.forrest = parse_forrest(ANNO_XML.replace(
+            '<segment id="4" msgid="102"',
+            '<segment id="4" msgid="102" external="1" etype="text"'))
+        self.assertTrue(self.forrest.get_tree("4").external)
+        self.assertEqual(self._match("[external]"), ["7"])
+        if np is None:
+            return
+        arrays = RSTForrestArrays(self.forrest)
+        self.assertEqual(sorted(itree.id for itree in arrays.get_trees(
+            arrays.select(a_external=True))), ["7"])
+
+
+##################################################################
+# Main
+if __name__ == "__main__":
+    unittest.main()
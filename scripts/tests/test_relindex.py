@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for the inverted index of RST relations.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_XML, parse_forrest
+from rst import RSTRelIndex
+
+import pickle
+
+
+##################################################################
+# Classes
+class TestRelIndex(unittest.TestCase):
+    """
+    Tests of RSTRelIndex.
+    """
+
+    def test_texts(self):
+        """
+        Check that texts are only rendered for requested relations.
+        """
+        forrest = parse_forrest(ANNO_XML)
+        index = RSTRelIndex()
+        index.add_forrest(forrest, "a.xml")
+        # records do not keep any texts
+        index = pickle.loads(pickle.dumps(index, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(index.get_relnames(("J*", "Cause")),
+                         ["Cause", "Joint"])
+        self.assertEqual(index.get_records("Cause"),
+                         [("a.xml", "101", (0, 0), (0, 10), "2", "1")])
+        requested = []
+
+        def get_forrest(a_fname):
+            requested.append(a_fname)
+            return forrest
+
+        self.assertEqual(index.get_texts("Joint", get_forrest),
+                         [(forrest.get_tree("6").str_min(),
+                           forrest.get_tree(inuc).str_min())
+                          for inuc in ("4", "5")])
+        self.assertEqual(requested, ["a.xml"])
+        self.assertEqual(index.get_texts("Contrast", get_forrest), [])
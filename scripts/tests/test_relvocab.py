@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for the vocabulary of RST relations.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from rst import RSTRelVocab, NO_REL
+from rst.relvocab import SPAN_CODE, SPAN_REL
+
+##################################################################
+# Constants
+SCHEME_XML = """<relations>
+    <relation name="Joint" type="par"/>
+    <relation name="Cause" type="hyp"/>
+</relations>
+"""
+
+
+##################################################################
+# Classes
+class TestRelVocab(unittest.TestCase):
+    """
+    Tests of RSTRelVocab.
+    """
+
+    def setUp(self):
+        """
+        Create directory for scheme files.
+        """
+        self.scheme_dir = tempfile.mkdtemp()
+        self.scheme_fname = os.path.join(self.scheme_dir, "scheme.xml")
+
+    def tearDown(self):
+        """
+        Remove directory of scheme files.
+        """
+        shutil.rmtree(self.scheme_dir)
+
+    def test_lazy(self):
+        """
+        Check that scheme files are only read on the first lookup.
+        """
+        vocab = RSTRelVocab(self.scheme_fname)
+        with open(self.scheme_fname, "w") as ofile:
+            ofile.write(SCHEME_XML)
+        self.assertEqual(vocab.get_code(SPAN_REL), SPAN_CODE)
+        self.assertEqual(vocab.relnames, [SPAN_REL, "Cause", "Joint"])
+        self.assertTrue(vocab.is_hyp(vocab.get_code("Cause")))
+        self.assertTrue(vocab.is_par(vocab.get_code("Joint")))
+        self.assertTrue(vocab.is_nuc(vocab.get_code("Joint")))
+        self.assertFalse(vocab.is_nuc(vocab.get_code("Cause")))
+        # missing scheme files are skipped
+        vocab = RSTRelVocab(os.path.join(self.scheme_dir, "missing.xml"))
+        self.assertEqual(len(vocab), 1)
+
+    def test_add_scheme(self):
+        """
+        Check that added schemes make unknown relations known.
+        """
+        vocab = RSTRelVocab()
+        code = vocab.intern("r-Joint")
+        self.assertFalse(vocab.is_known(code))
+        self.assertTrue(vocab.is_external(code))
+        self.assertIsNone(vocab.get_type(code))
+        vocab.add_scheme({"r-Joint": "par", "r-Cause": "hyp"}, True)
+        self.assertEqual(vocab.intern("r-Joint"), code)
+        self.assertTrue(vocab.is_known(code))
+        self.assertTrue(vocab.is_par(code))
+        self.assertTrue(vocab.is_external(vocab.get_code("r-Cause")))
+        self.assertFalse(vocab.is_known(NO_REL))
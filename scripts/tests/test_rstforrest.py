@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for RST forrests.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_XML, NODE_ATTRS, dump_forrest, get_corpus_files, \
+    parse_forrest
+from rst import RSTForrest, FIELD_SEP, VALUE_SEP, TSV_FMT, XML_FMT, \
+    read_basedata
+
+##################################################################
+# Methods
+def _make_tsv_node(a_id, a_msgids, a_type, a_parent="", a_relname="",
+                   a_offsets=(), a_text=""):
+    """
+    Create line of RSTTool raw file describing a single node.
+
+    @param a_id - id of the node
+    @param a_msgids - ids of the messages of the node
+    @param a_type - type of the node (`text', `span', or `multinuc')
+    @param a_parent - id of the parent node
+    @param a_relname - name of the relation to the parent node
+    @param a_offsets - start and end offset of a terminal node
+    @param a_text - text of a terminal node
+
+    @return line of the file
+    """
+    return FIELD_SEP.join(["nid", a_id, VALUE_SEP.join(a_msgids),
+                           "text" + VALUE_SEP + a_text,
+                           "type" + VALUE_SEP + a_type,
+                           "relname" + VALUE_SEP + a_relname,
+                           "parent" + VALUE_SEP + a_parent,
+                           VALUE_SEP.join(("offsets",) + a_offsets)]) + '\n'
+
+
+##################################################################
+# Constants
+# RSTTool raw file equivalent to ANNO_XML
+ANNO_TSV = "".join([
+    _make_tsv_node("1", ["101"], "text", "2", "Cause", ("0", "11"),
+                   "Es regnet. "),
+    _make_tsv_node("2", ["101"], "text", "3", "span", ("11", "32"),
+                   "Wir bleiben zu Hause."),
+    _make_tsv_node("3", ["101"], "span"),
+    _make_tsv_node("4", ["102"], "text", "6", "Joint", ("0", "8"),
+                   "Schade! "),
+    _make_tsv_node("5", ["102"], "text", "6", "Joint", ("8", "19"),
+                   "Viel Spass."),
+    _make_tsv_node("6", ["102"], "multinuc"),
+    _make_tsv_node("7", ["101", "102"], "span"),
+    FIELD_SEP.join(["msgs2extnid", "101,102",
+                    VALUE_SEP.join(["7", "3", "span", "3", "6",
+                                    "r-OTHER"])]) + '\n'])
+
+
+##################################################################
+# Classes
+class TestParse(unittest.TestCase):
+    """
+    Tests of the parsers of RST forrests.
+    """
+
+    def test_stream(self):
+        """
+        Check that incremental parsing yields the same forrests.
+        """
+        n_nodes = 0
+        for src_fname, anno_fname in get_corpus_files():
+            msgid2txt, msgid2discid = read_basedata(src_fname)
+            forrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+            forrest.parse(anno_fname)
+            sforrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid, True)
+            sforrest.parse(anno_fname)
+            nodes, iroots = dump_forrest(forrest)
+            n_nodes += len(nodes)
+            self.assertEqual((nodes, iroots), dump_forrest(sforrest),
+                             anno_fname)
+        self.assertTrue(n_nodes)
+
+    def test_tsv(self):
+        """
+        Check nodes and relations read from RSTTool raw files.
+        """
+        nodes, iroots = dump_forrest(parse_forrest(ANNO_TSV, TSV_FMT))
+        relname = NODE_ATTRS.index("relname")
+        nucleus = NODE_ATTRS.index("nucleus")
+        t_start = NODE_ATTRS.index("t_start")
+        self.assertEqual([(nodes[nid][relname], nodes[nid][nucleus])
+                          + nodes[nid][-3:] for nid in "1234567"],
+                         [("Cause", False, "2", [], []),
+                          ("span", True, "3", ["1"], []),
+                          ("span", True, "7", ["2"], ["6"]),
+                          ("Joint", True, "6", [], []),
+                          ("Joint", True, "6", [], []),
+                          ("r-OTHER", False, "3", ["4", "5"], []),
+                          (None, False, None, ["3"], [])])
+        # offsets of spans are computed from their children
+        self.assertEqual(nodes["6"][t_start:t_start + 2], ((1, 0), (1, 19)))
+        self.assertEqual(nodes["7"][t_start:t_start + 2], ((0, 0), (1, 19)))
+        self.assertEqual(nodes["5"][NODE_ATTRS.index("text")], "Viel Spass.")
+        self.assertEqual(iroots, [("101", "3"), ("102", "6")])
+
+    def test_tsv_xml(self):
+        """
+        Check that RSTTool raw files yield the same forrests as XML files.
+        """
+        self.assertEqual(dump_forrest(parse_forrest(ANNO_TSV, TSV_FMT)),
+                         dump_forrest(parse_forrest(ANNO_XML)))
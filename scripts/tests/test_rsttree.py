@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for RST trees.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import make_edu
+from rst import RSTTree
+from rst.constants import TREE_ALL
+
+
+##################################################################
+# Classes
+class TestEDUCache(unittest.TestCase):
+    """
+    Tests of cached EDUs of RST trees.
+    """
+
+    def setUp(self):
+        """
+        Link a span as a child of two other spans.
+        """
+        self.edu1 = make_edu("1", "m1", 1, 0, 10)
+        self.edu2 = make_edu("2", "m2", 2, 0, 10)
+        self.node = RSTTree("-1", type="span", msgid="m0", discid=0)
+        self.node.add_children(self.edu1)
+        self.span1 = RSTTree("-2", type="span", msgid="m0", discid=0)
+        self.span2 = RSTTree("-3", type="span", msgid="m0", discid=0)
+        self.node.parent = self.span1
+        self.span1.add_children(self.node)
+        self.span2.add_children(self.node)
+
+    def _get_ids(self, a_tree):
+        """
+        Return ids of all EDUs of a tree.
+
+        @param a_tree - RST tree
+
+        @return list of node ids
+        """
+        return [iedu.id for iedu in a_tree.get_edus(TREE_ALL)]
+
+    def test_invalidate_parent(self):
+        self.assertEqual(self._get_ids(self.span1), ["1"])
+        self.node.add_children(self.edu2)
+        self.assertEqual(self._get_ids(self.span1), ["1", "2"])
+
+    def test_invalidate_other_parent(self):
+        self.assertEqual(self._get_ids(self.span2), ["1"])
+        self.node.add_children(self.edu2)
+        self.assertEqual(self._get_ids(self.span2), ["1", "2"])
+
+    def test_invalidate_replaced_children(self):
+        self.assertEqual(self._get_ids(self.span2), ["1"])
+        self.node.echildren = [self.edu2]
+        self.assertEqual(self._get_ids(self.span2), ["2"])
+
+
+##################################################################
+# Main
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+Unit tests for the writers of RST forrests.
+
+USAGE:
+python -m unittest discover -s scripts/tests
+"""
+
+##################################################################
+# Libraries
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from helpers import ANNO_XML, dump_forrest, get_corpus_files, \
+    get_structure, parse_forrest
+from rst import RSTForrest, XMLWriter, LSP_FMT, PC3_FMT, XML_FMT, \
+    read_basedata
+
+from cStringIO import StringIO
+
+##################################################################
+# Methods
+def _write(a_forrest, a_fmt):
+    """
+    Output RST forrest to string.
+
+    @param a_forrest - RST forrest to be written
+    @param a_fmt - output format
+
+    @return string with the output
+    """
+    ostream = StringIO()
+    a_forrest.write(ostream, a_fmt)
+    return ostream.getvalue()
+
+
+##################################################################
+# Classes
+class TestWriters(unittest.TestCase):
+    """
+    Tests of the writers of RST forrests.
+    """
+
+    def test_lsp(self):
+        """
+        Check s-expressions of a forrest.
+        """
+        self.assertEqual(_write(parse_forrest(ANNO_XML), LSP_FMT), "\n".join([
+            '(7 (msgid "101") (type "span") (start (0, 0)) (end (1, 19))'
+            ' (text "")',
+            '\t(3 (type "span") (relname "span") (start (0, 0))'
+            ' (end (0, 32)) (text "")',
+            '\t\t(2 (type "text") (relname "span") (start (0, 11))'
+            ' (end (0, 32)) (text "Wir bleiben zu Hause.")',
+            '\t\t\t(1 (type "text") (relname "Cause") (start (0, 0))'
+            ' (end (0, 10)) (text "Es regnet.")))',
+            '\t\t(6 (msgid "102") (type "span") (relname "r-OTHER")'
+            ' (start (1, 0)) (end (1, 19)) (text "")',
+            '\t\t\t(4 (type "text") (relname "Joint") (start (1, 0))'
+            ' (end (1, 7)) (text "Schade!"))',
+            '\t\t\t(5 (type "text") (relname "Joint") (start (1, 8))'
+            ' (end (1, 19)) (text "Viel Spass.")))))']))
+
+    def test_pc3(self):
+        """
+        Check relations, segments, and groups of an RSTTool document.
+        """
+        pc3 = _write(parse_forrest(ANNO_XML), PC3_FMT)
+        self.assertIn('<rel name="Cause" type="rst"/>\n'
+                      '      <rel name="Joint" type="multinuc"/>\n'
+                      '      <rel name="r-OTHER" type="rst"/>\n', pc3)
+        self.assertIn('<segment id="1" parent="2" relname="Cause"'
+                      ' msgid="101">Es regnet.</segment>', pc3)
+        self.assertIn('<group id="6" type="multinuc" parent="3"'
+                      ' relname="r-OTHER" msgid="102"/>', pc3)
+        self.assertEqual(pc3.count("<segment "), 4)
+        self.assertEqual(pc3.count("<group "), 3)
+
+    def test_xml(self):
+        """
+        Check that written XML yields the same nodes when parsed.
+        """
+        forrest = parse_forrest(ANNO_XML)
+        self.assertEqual(dump_forrest(parse_forrest(_write(forrest,
+                                                           XML_FMT))),
+                         dump_forrest(forrest))
+        for src_fname, anno_fname in get_corpus_files():
+            msgid2txt, msgid2discid = read_basedata(src_fname)
+            forrest = RSTForrest(XML_FMT, msgid2txt, msgid2discid)
+            forrest.parse(anno_fname)
+            self.assertEqual(
+                dump_forrest(parse_forrest(_write(forrest, XML_FMT),
+                                           XML_FMT, msgid2txt,
+                                           msgid2discid)),
+                dump_forrest(forrest), anno_fname)
+
+    def test_xml_tree(self):
+        """
+        Check that relations of single trees are reconstructed from links.
+        """
+        forrest = parse_forrest(ANNO_XML)
+        ostream = StringIO()
+        XMLWriter(ostream).write_tree(forrest.get_tree("7"))
+        self.assertEqual(get_structure(parse_forrest(ostream.getvalue())),
+                         get_structure(forrest))